@@ -0,0 +1,170 @@
+import os
+import pathlib
+import json
+import threading
+import pandas as pd
+from contextlib import contextmanager
+from typing import List
+from pandas import DataFrame
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# file extension for each format in which tables can be cached. parquet and feather need pyarrow and preserve dtypes,
+# csv is the fallback
+CACHE_FORMATS = {'parquet': '.parquet', 'feather': '.feather', 'csv': '.csv'}
+METADATA_EXTENSION = '.json'
+LOCK_FILE = '.lock'
+
+
+def available_format(cache_format: str) -> str:
+    return cache_format if pyarrow is not None else 'csv'
+
+
+def parse_dates(df: DataFrame) -> DataFrame:
+    # dates read from text are cast as datetime date, as elsewhere
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'], format='%Y-%m-%d').dt.date
+    return df
+
+
+def read_cache_file(full_path: str, cache_format: str, columns: List[str] = None) -> DataFrame:
+    if cache_format == 'parquet':
+        return pd.read_parquet(full_path, columns=columns)
+    if cache_format == 'feather':
+        return pd.read_feather(full_path, columns=columns)
+    df = pd.read_csv(full_path, encoding='utf-8',
+                     usecols=None if columns is None else lambda column: column in columns)
+    return parse_dates(df)
+
+
+def write_cache_file(df: DataFrame, full_path: str, cache_format: str):
+    if cache_format == 'parquet':
+        df.to_parquet(full_path, index=False)
+    elif cache_format == 'feather':
+        df.reset_index(drop=True).to_feather(full_path)
+    else:
+        df.to_csv(full_path, encoding='utf-8')
+
+
+class CacheStore:
+    def __init__(self, path: str, max_bytes: int = None):
+        # each version of a table is stored as <name>-<key> in one of CACHE_FORMATS, alongside a json file of metadata.
+        # When the files in path exceed max_bytes, the least recently used versions are removed
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def cache_file(self, file_name: str, key: str, cache_format: str) -> str:
+        return os.path.join(self.path, file_name + '-' + key + CACHE_FORMATS[cache_format])
+
+    def metadata_file(self, file_name: str, key: str) -> str:
+        return os.path.join(self.path, file_name + '-' + key + METADATA_EXTENSION)
+
+    @contextmanager
+    def lock(self, exclusive: bool):
+        '''
+        LOCK THE CACHE DIRECTORY AGAINST OTHER PROCESSES AND THREADS
+        '''
+        # readers share the lock, while writes and evictions hold it alone, so that no file is removed while read
+        pathlib.Path(self.path).mkdir(parents=True, exist_ok=True)
+        with open(os.path.join(self.path, LOCK_FILE), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read_metadata(self, file_name: str, key: str) -> dict:
+        # the metadata is written after the table, so a table without metadata is incomplete
+        try:
+            with open(self.metadata_file(file_name, key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def read(self, file_name: str, key: str, cache_formats: List[str], columns: List[str] = None):
+        '''
+        LOAD A VERSION OF A TABLE
+        '''
+        # returns the table and its metadata, or None and None if this version is not stored in any of cache_formats
+        with self.lock(exclusive=False):
+            metadata = self.read_metadata(file_name, key)
+            if metadata is None:
+                return None, None
+            for cache_format in cache_formats:
+                full_path = self.cache_file(file_name, key, cache_format)
+                if os.path.exists(full_path):
+                    print(f'Loading data from cache file: {full_path}')
+                    df = read_cache_file(full_path, cache_format, columns)
+                    # the modification time of the metadata records when the version was last used
+                    os.utime(self.metadata_file(file_name, key))
+                    return df, metadata
+        return None, None
+
+    def write(self, df: DataFrame, file_name: str, key: str, cache_format: str, metadata: dict) -> str:
+        '''
+        STORE A VERSION OF A TABLE
+        '''
+        # returns the format in which the table was stored
+        pathlib.Path(self.path).mkdir(parents=True, exist_ok=True)
+        full_path = self.cache_file(file_name, key, cache_format)
+        print(f'Saving data to cache: {full_path}')
+        # the table is written to a temporary file which is then renamed, so a partly written file is never read
+        temp_suffix = f'.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            write_cache_file(df, full_path + temp_suffix, cache_format)
+        except (ValueError, TypeError, NotImplementedError) as e:
+            # pyarrow cannot store columns of mixed types
+            print(f'Unable to save {file_name} as {cache_format} ({e}), saving as csv')
+            if os.path.exists(full_path + temp_suffix):
+                os.remove(full_path + temp_suffix)
+            cache_format = 'csv'
+            full_path = self.cache_file(file_name, key, cache_format)
+            write_cache_file(df, full_path + temp_suffix, cache_format)
+        with open(self.metadata_file(file_name, key) + temp_suffix, 'w') as f:
+            json.dump(metadata, f)
+
+        with self.lock(exclusive=True):
+            os.replace(full_path + temp_suffix, full_path)
+            # remove copies in other formats, which would otherwise be loaded in preference or become stale
+            for other_format in CACHE_FORMATS:
+                if other_format != cache_format and os.path.exists(self.cache_file(file_name, key, other_format)):
+                    os.remove(self.cache_file(file_name, key, other_format))
+            os.replace(self.metadata_file(file_name, key) + temp_suffix, self.metadata_file(file_name, key))
+            self.evict(keep=file_name + '-' + key)
+        return cache_format
+
+    def evict(self, keep: str = None):
+        '''
+        REMOVE THE LEAST RECENTLY USED VERSIONS OVER THE SIZE LIMIT
+        '''
+        # must be called holding the exclusive lock. The version named keep is never removed
+        if self.max_bytes is None:
+            return
+        versions = dict()
+        for entry in os.scandir(self.path):
+            stem, extension = os.path.splitext(entry.name)
+            if extension not in list(CACHE_FORMATS.values()) + [METADATA_EXTENSION]:
+                continue
+            stat = entry.stat()
+            size, last_used, paths = versions.get(stem, (0, 0, []))
+            versions[stem] = (size + stat.st_size, max(last_used, stat.st_mtime), paths + [entry.path])
+        total = sum(size for size, _, _ in versions.values())
+        for stem, (size, _, paths) in sorted(versions.items(), key=lambda version: version[1][1]):
+            if total <= self.max_bytes:
+                break
+            if stem == keep:
+                continue
+            print(f'Removing {stem} from the cache')
+            for path in paths:
+                os.remove(path)
+            total -= size
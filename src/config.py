@@ -25,8 +25,13 @@ class Config:
     class_1_threshold_dead = 5
     debug_death_lag = 9  # death lag for case-death ascertainment
     debug_countries_of_interest = ['USA', 'GBR', 'BRA', 'IND', 'ESP', 'FRA', 'ZAF']
+    table_1_quantiles = [0.25, 0.5, 0.75]  # quantiles of each metric reported for each class in table 1
+    bootstrap_samples = 0  # resamples for confidence intervals of the medians in table 1, none if 0
+    bootstrap_confidence = 0.95  # coverage of the confidence intervals of the medians
 
     # for storage
+    cache_format = 'parquet'  # parquet, feather or csv. parquet and feather need pyarrow, otherwise csv is used
+    cache_max_bytes = 5 * 1024 ** 3  # disk budget for the cache, beyond which the least recently used tables are removed
     base_path: str = None
     plot_path: str = field(init=False)
     data_path: str = field(init=False)
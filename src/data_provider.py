@@ -1,15 +1,67 @@
-import os
-import pathlib
 import numpy as np
 import pandas as pd
 import datetime
+import io
 import psycopg2
+import psycopg2.pool
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from tqdm import tqdm
 from csaps import csaps
 from typing import List
 import scipy.interpolate as interp
 import json
+import hashlib
 from pandas import DataFrame
+from cache_store import CacheStore, available_format, parse_dates
+
+# the columns of the Our World in Data file which are used, and the types they are read as
+OWID_COLUMNS = {'iso_code': str, 'date': str, 'total_tests': np.float64, 'new_tests': np.float64,
+                'new_tests_smoothed': np.float64, 'positive_rate': np.float64}
+
+
+def read_owid_csv(source: str, end_date: datetime.date, chunksize: int = 100000) -> DataFrame:
+    '''
+    STREAM THE TESTING COLUMNS OF THE OUR WORLD IN DATA FILE
+    '''
+    # source is a url or a local path. The file is read in chunks of only the columns used, and each chunk is filtered
+    # to countries with a 3 letter iso code (dropping aggregates such as OWID_WRL) up to end_date before the next is
+    # read, so memory use does not grow with the size of the file
+    chunks = [pd.DataFrame(columns=list(OWID_COLUMNS)).astype(OWID_COLUMNS)]
+    for chunk in pd.read_csv(source, usecols=list(OWID_COLUMNS), dtype=OWID_COLUMNS, chunksize=chunksize):
+        # iso dates compare in the same order as strings
+        chunks.append(chunk[(chunk['date'] <= end_date.strftime('%Y-%m-%d')) & (chunk['iso_code'].str.len() == 3)])
+    tst_table = pd.concat(chunks, ignore_index=True)[list(OWID_COLUMNS)].rename(columns={'iso_code': 'countrycode'})
+    return parse_dates(tst_table)
+
+
+def first_crossings(values: np.ndarray, group_starts: np.ndarray, thresholds: List[float]) -> np.ndarray:
+    '''
+    FIND THE FIRST ROW IN EACH GROUP AT WHICH VALUES REACH EACH THRESHOLD
+    '''
+    # values is made up of contiguous groups starting at group_starts. Returns an array with a row for each group and a
+    # column for each threshold, holding the position of the first value >= the threshold, or -1 if there is none
+    n_groups, n_thresholds = len(group_starts), len(thresholds)
+    group_ends = np.append(group_starts[1:], len(values))
+    group = np.repeat(np.arange(n_groups), group_ends - group_starts)
+    # the first value >= k is the first point at which the running maximum is >= k. Cumulative counts may be revised
+    # down, so take the running maximum within each group, treating nan as never reaching a threshold
+    running_max = pd.Series(np.where(np.isnan(values), -np.inf, values)).groupby(group).cummax().values
+    # the number of thresholds reached by each row never decreases within a group, so offsetting it by the group makes
+    # a single sorted key which can be searched for every group and threshold at once
+    order = np.argsort(thresholds, kind='stable')
+    reached = np.searchsorted(np.asarray(thresholds, dtype=np.float64)[order], running_max, side='right')
+    key = group * (n_thresholds + 1) + reached
+    targets = np.arange(n_groups)[:, None] * (n_thresholds + 1) + np.arange(1, n_thresholds + 1)[None, :]
+    crossings = np.searchsorted(key, targets, side='left')
+    crossings[crossings >= group_ends[:, None]] = -1
+    result = np.empty_like(crossings)
+    result[:, order] = crossings
+    return result
 
 
 class DataProvider:
@@ -19,6 +71,9 @@ class DataProvider:
         self.ma_window = 14
         self.use_splines = False
         self.smooth = 0.001
+        # days before the last cached date of each country which are pulled again in an incremental sync, to catch
+        # revisions to recent data
+        self.sync_overlap = 7
         self.flags = {
             'c1_school_closing': 3,
             'c2_workplace_closing': 3,
@@ -38,52 +93,91 @@ class DataProvider:
             'SM.POP.NETM': 'net_migration'
         }
         self.config = config
+        # a single connection used for every query if set, e.g. an sqlite stand-in for the server. Otherwise queries
+        # take a connection from a pool of up to db_connections, so that the tables can be pulled concurrently
         self.conn = None
-
-    def validation(self, file_name, mode):
-        '''
-        CHECK CACHE CREATED UNDER SAME STATE
-        '''
-        parameters = {"abs_t0_threshold": self.config.abs_t0_threshold,
-                      "rel_to_constant": self.config.rel_to_constant,
-                      "rel_t0_threshold": self.config.rel_t0_threshold,
-                      "end_date": self.end_date.strftime('%Y-%m-%d'),
-                      "ma_window": self.ma_window,
-                      "use_splines": self.use_splines,
-                      "smooth": self.smooth,
-                      "flags": self.flags,
-                      "wb_codes": self.wb_codes}
-        metadata_filename = file_name + '.json'
-        metadata_path = os.path.join(self.config.cache_path, metadata_filename)
-
-        # when saving cache, store the parameters in a json file
-        if mode == 'save':
-            metadata_filename = file_name + '.json'
-            metadata_path = os.path.join(self.config.cache_path, metadata_filename)
-            with open(metadata_path, 'w') as f:
-                json.dump(parameters, f)
-            return None
-
-        # when loading cache, check that the parameters match the json file
-        elif mode == 'load':
-            try:
-                with open(metadata_path) as f:
-                    old_parameters = json.load(f)
-            except:
-                print('The cache could not be validated. The data will be reloaded')
-                return False
-            if parameters != old_parameters:
-                print('The parameters used to generate this cache may have changed. The data will be reloaded')
-            return parameters == old_parameters
-
-        else:
-            raise Exception
+        self.pool = None
+        self.pool_lock = threading.Lock()
+        # the pool raises an error rather than waiting when all of its connections are in use, so borrowers wait for
+        # one of db_connections slots first
+        self.pool_slots = None
+        self.db_connections = 3
+        # 'copy' streams query results from the server as csv, 'read_sql' fetches them row by row through pandas
+        self.sql_loader = 'copy'
+        # url or local path of the Our World in Data file
+        self.owid_source = 'https://raw.githubusercontent.com/owid/covid-19-data/master/public/data/owid-covid-data.csv'
+        self.cache_format = available_format(config.cache_format)
+        self.series_fields = None
+        # row offsets of each country in epidemiology_series and the row of each country in wbi_table
+        self.series_rows = dict()
+        self.wbi_rows = dict()
+        self.t0_table = None
+        self.incremental = False
+        # seconds taken to load each source in fetch_data
+        self.timings = dict()
+        # the parameters and the upstream cached tables on which each cached table depends. Tables not listed depend on
+        # every parameter
+        self.cache_dependencies = {
+            'epidemiology_raw_table': (['source', 'end_date'], []),
+            'epidemiology_table': ([], ['epidemiology_raw_table']),
+            'testing_table': (['end_date', 'owid_source'], []),
+            'world_bank_table': (['wb_codes'], []),
+            'government_response_table': (['flags'], []),
+            'epidemiology_series': (['abs_t0_threshold', 'rel_to_constant', 'rel_t0_threshold', 'ma_window',
+                                     'use_splines', 'smooth'],
+                                    ['epidemiology_table', 'testing_table', 'world_bank_table'])}
+        # digest of the contents of each version of a cached table, by name and key, as last loaded or saved
+        self.digests = dict()
+
+    def cache_parameters(self) -> dict:
+        '''
+        PARAMETERS ON WHICH CACHED TABLES MAY DEPEND
+        '''
+        return {"abs_t0_threshold": self.config.abs_t0_threshold,
+                "rel_to_constant": self.config.rel_to_constant,
+                "rel_t0_threshold": self.config.rel_t0_threshold,
+                "source": self.source,
+                "end_date": self.end_date.strftime('%Y-%m-%d'),
+                "owid_source": self.owid_source,
+                "ma_window": self.ma_window,
+                "use_splines": self.use_splines,
+                "smooth": self.smooth,
+                "flags": self.flags,
+                "wb_codes": self.wb_codes}
+
+    def cache_inputs(self, file_name: str) -> dict:
+        # the parameters a table depends on and the digests of the upstream tables it is built from
+        parameters = self.cache_parameters()
+        parameter_names, upstream = self.cache_dependencies.get(file_name, (list(parameters.keys()), []))
+        return {'parameters': {name: parameters[name] for name in parameter_names},
+                'upstream': {name: self.cache_digest(name) for name in upstream}}
+
+    def cache_key(self, file_name: str) -> str:
+        '''
+        CONTENT ADDRESS OF A CACHED TABLE
+        '''
+        # a change to a parameter or to the contents of an upstream table gives a new key, so only the tables downstream
+        # of a change are rebuilt, and tables built under different parameters are kept side by side
+        inputs = json.dumps(self.cache_inputs(file_name), sort_keys=True)
+        return hashlib.sha256(inputs.encode('utf-8')).hexdigest()[:16]
+
+    def cache_digest(self, file_name: str) -> str:
+        # the digest of the version of the table for the current parameters, which differ between versions
+        key = self.cache_key(file_name)
+        if (file_name, key) not in self.digests:
+            metadata = self.cache_store().read_metadata(file_name, key)
+            self.digests[(file_name, key)] = None if metadata is None else metadata['digest']
+        return self.digests[(file_name, key)]
+
+    def cache_store(self) -> CacheStore:
+        return CacheStore(self.config.cache_path, self.config.cache_max_bytes)
 
     def open_db_connection(self):
         '''
-        INITIALISE SERVER CONNECTION
+        INITIALISE SERVER CONNECTION POOL
         '''
-        self.conn = psycopg2.connect(
+        self.pool = psycopg2.pool.ThreadedConnectionPool(
+            1, self.db_connections,
             host='covid19db.org',
             port=5432,
             dbname='covid19',
@@ -91,29 +185,218 @@ class DataProvider:
             password='covid19')
         return None
 
-    def fetch_data(self, use_cache: bool = True):
+    @contextmanager
+    def connection(self):
+        '''
+        BORROW A SERVER CONNECTION
+        '''
+        if self.conn is not None:
+            yield self.conn
+            return
+        with self.pool_lock:
+            if self.pool is None:
+                self.open_db_connection()
+                self.pool_slots = threading.BoundedSemaphore(self.db_connections)
+        with self.pool_slots:
+            conn = self.pool.getconn()
+            try:
+                yield conn
+            finally:
+                self.pool.putconn(conn)
+
+    def read_sql(self, sql_command: str, params: dict = None, dtypes: dict = None) -> DataFrame:
+        '''
+        RUN A QUERY AGAINST THE SERVER
+        '''
+        # dtypes maps numeric columns to the type they are read as, so that every loader gives the same frame
+        params = dict() if params is None else params
+        with self.connection() as conn:
+            if isinstance(conn, sqlite3.Connection):
+                df = self.read_sqlite(conn, sql_command, params)
+            elif self.sql_loader == 'copy':
+                return self.copy_sql(conn, sql_command, params, dtypes)
+            else:
+                df = pd.read_sql(sql_command, conn, params=params)
+        return df if dtypes is None else df.astype(dtypes)
+
+    def copy_sql(self, conn, sql_command: str, params: dict = None, dtypes: dict = None) -> DataFrame:
+        '''
+        STREAM A QUERY FROM THE SERVER AS CSV
+        '''
+        # COPY sends the result as a single block of text, which is parsed straight into typed columns instead of
+        # building a python tuple for each row. COPY does not take parameters, so they are bound by the client
+        buffer = io.StringIO()
+        with conn.cursor() as cursor:
+            query = cursor.mogrify(sql_command, params).decode('utf-8')
+            cursor.copy_expert('COPY (' + query + ') TO STDOUT WITH (FORMAT csv, HEADER)', buffer)
+        buffer.seek(0)
+        return parse_dates(pd.read_csv(buffer, dtype=dtypes))
+
+    def read_sqlite(self, conn, sql_command: str, params: dict) -> DataFrame:
+        '''
+        RUN A QUERY AGAINST AN SQLITE STAND-IN FOR THE SERVER
+        '''
+        # sqlite uses the named paramstyle, without adaptation of tuples for IN, and stores dates as text
+        sqlite_params = dict()
+
+        def placeholder(match):
+            name = match.group(1)
+            if not isinstance(params[name], tuple):
+                sqlite_params[name] = params[name]
+                return ':' + name
+            sqlite_params.update({f'{name}_{i}': value for i, value in enumerate(params[name])})
+            return '(' + ', '.join(f':{name}_{i}' for i in range(len(params[name]))) + ')'
+
+        df = pd.read_sql(re.sub(r'%\((\w+)\)s', placeholder, sql_command), conn, params=sqlite_params)
+        return parse_dates(df)
+
+    def sync_table(self, table: DataFrame, sql_command: str, params: dict = None, dtypes: dict = None):
+        '''
+        PULL A TABLE, OR ONLY THE ROWS ADDED OR REVISED SINCE IT WAS CACHED
+        '''
+        # returns the table sorted by countrycode and date, and the countries whose rows changed, or None if table was
+        # None and the whole table was pulled
+        params = dict() if params is None else params
+        if table is None or len(table) == 0:
+            table = self.read_sql(sql_command, params, dtypes) \
+                .sort_values(by=['countrycode', 'date']).reset_index(drop=True)
+            return table, None
+
+        # rows from sync_overlap days before the last date held for each country are pulled again, and replace the
+        # cached rows from the same dates. Countries which are not in the cache are pulled in full. The countries are
+        # grouped by cutoff date, so that a country which stopped reporting early does not pull the rows of the others
+        # from its cutoff
+        cutoffs = pd.to_datetime(table.groupby('countrycode')['date'].max()) - pd.Timedelta(days=self.sync_overlap)
+        conditions, params = [], dict(params, countries=tuple(cutoffs.index))
+        for i, (cutoff, countries) in enumerate(cutoffs.groupby(cutoffs)):
+            conditions.append(f'(countrycode IN %(countries_{i})s AND date >= %(since_{i})s)')
+            params.update({f'countries_{i}': tuple(countries.index), f'since_{i}': cutoff.date()})
+        sql_command += (' AND ' if ' WHERE ' in sql_command else ' WHERE ') + \
+            '(' + ' OR '.join(conditions + ['countrycode NOT IN %(countries)s']) + ')'
+        delta = self.read_sql(sql_command, params, dtypes)
+        # csv caches hold an extra index column
+        table = table.filter(items=delta.columns)
+        replaced = table['countrycode'].isin(delta['countrycode'].unique()) & \
+            (pd.to_datetime(table['date']) >= pd.to_datetime(table['countrycode'].map(cutoffs)))
+
+        # rows which appear in only one of the cached and pulled copies are new, revised or removed. Tables are
+        # deduplicated on countrycode and date after they are pulled, so only the first of each duplicate is compared
+        differences = pd.concat([table[replaced], delta.drop_duplicates(subset=['countrycode', 'date'])]) \
+            .drop_duplicates(keep=False)
+        changed = sorted(differences['countrycode'].unique())
+        if len(changed) == 0:
+            return table, changed
+        table = pd.concat([table[~replaced], delta]) \
+            .sort_values(by=['countrycode', 'date']).reset_index(drop=True)
+        return table, changed
+
+    def fetch_data(self, use_cache: bool = True, series_fields: List[str] = None, incremental: bool = False):
         self.use_cache = use_cache
+        # if incremental is set, cached database tables are updated with only the rows added or revised since they
+        # were cached, rather than pulled again in full
+        self.incremental = incremental
+        # if series_fields is set, only these fields of epidemiology_series are loaded, along with countrycode and date
+        self.series_fields = series_fields
         '''
         PULL/PROCESS DATA 
         '''
-        self.epidemiology = self.get_epi_table()
-        self.testing = self.get_tst_table()
-        self.wbi_table = self.get_wbi_table()
-        self.gsi_table = self.get_gsi_table()
-        self.epidemiology_series = self.get_epi_series(
+        self.timings = dict()
+        # the source tables are independent of each other, so they are loaded concurrently. Database queries each use a
+        # connection from the pool, and the testing data is downloaded at the same time
+        sources = {'epidemiology': self.get_epi_table,
+                   'testing': self.get_tst_table,
+                   'wbi_table': self.get_wbi_table,
+                   'gsi_table': self.get_gsi_table}
+        with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+            futures = {name: executor.submit(self.timed, name, load) for name, load in sources.items()}
+            for name, future in futures.items():
+                setattr(self, name, future.result())
+        self.t0_table = self.timed('t0_table', self.get_t0_table, self.epidemiology, self.wbi_table)
+        self.epidemiology_series = self.timed(
+            'epidemiology_series', self.get_epi_series,
             epidemiology=self.epidemiology,
             testing=self.testing,
-            wbi_table=self.wbi_table)
+            wbi_table=self.wbi_table,
+            t0_table=self.t0_table)
+        self.build_index()
+        for name, seconds in self.timings.items():
+            print(f'Loaded {name} in {seconds:.1f}s')
+
+    def timed(self, name: str, load, *args, **kwargs):
+        # runs load, recording the time taken in timings
+        start = time.perf_counter()
+        result = load(*args, **kwargs)
+        self.timings[name] = time.perf_counter() - start
+        return result
+
+    def build_index(self):
+        '''
+        INDEX ROWS BY COUNTRY
+        '''
+        # epidemiology_series is built country by country, so each country should occupy a contiguous block of rows
+        codes = np.asarray(self.epidemiology_series['countrycode'], dtype=object)
+        change = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        if len(change) + 1 > len(set(codes)):
+            self.epidemiology_series = self.epidemiology_series.iloc[
+                np.argsort(codes, kind='stable')].reset_index(drop=True)
+            codes = np.asarray(self.epidemiology_series['countrycode'], dtype=object)
+            change = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        starts = np.concatenate(([0], change)) if len(codes) > 0 else np.empty(0, dtype=int)
+        ends = np.append(starts[1:], len(codes))
+        self.series_rows = {codes[start]: (start, end) for start, end in zip(starts, ends)}
+        # keep the first row for each country, as get_wbi_data did
+        self.wbi_rows = self.wbi_table.drop_duplicates(subset=['countrycode']).set_index('countrycode').to_dict('index')
+
+    def get_t0_table(self, epidemiology: DataFrame, wbi_table: DataFrame) -> DataFrame:
+        '''
+        FIRST DATES AT WHICH EACH COUNTRY REACHES THE T0 THRESHOLDS
+        '''
+        epi_data = epidemiology.iloc[np.argsort(epidemiology['countrycode'].values, kind='stable')]
+        codes = epi_data['countrycode'].values
+        group_starts = np.flatnonzero(np.concatenate(([True], codes[1:] != codes[:-1]))) if len(codes) > 0 else \
+            np.empty(0, dtype=np.int64)
+        countries = codes[group_starts]
+        dates = epi_data['date'].values
+        confirmed = epi_data['confirmed'].values.astype(np.float64)
+        dead = epi_data['dead'].values.astype(np.float64)
+        populations = wbi_table.drop_duplicates(subset=['countrycode']).set_index('countrycode')['value']
+        population = np.repeat(populations.reindex(countries).values.astype(np.float64),
+                               np.diff(np.append(group_starts, len(codes))))
+
+        def first_dates(rows):
+            first = np.full(len(rows), np.nan, dtype=object)
+            first[rows >= 0] = dates[rows[rows >= 0]]
+            return first
+
+        # two definitions of t0 use where appropriate
+        # t0 absolute ~= 1000 total cases or t0 relative = 0.05 per rel_to_constant
+        confirmed_rows = first_crossings(confirmed, group_starts, [self.config.abs_t0_threshold, 1])
+        relative_rows = first_crossings((confirmed / population) * self.config.rel_to_constant, group_starts,
+                                        [self.config.rel_t0_threshold])
+        # t0_k_dead represents day first k total dead was reported
+        dead_rows = first_crossings(dead, group_starts, [1, 5, 10])
+        t0_table = pd.DataFrame({'population': populations.reindex(countries).values,
+                                 't0': first_dates(confirmed_rows[:, 0]),
+                                 't0_relative': first_dates(relative_rows[:, 0]),
+                                 't0_1_dead': first_dates(dead_rows[:, 0]),
+                                 't0_5_dead': first_dates(dead_rows[:, 1]),
+                                 't0_10_dead': first_dates(dead_rows[:, 2]),
+                                 # the day the first case was reported
+                                 't0_1_confirmed': first_dates(confirmed_rows[:, 1])},
+                                index=pd.Index(countries, name='countrycode'))
+        return t0_table
 
     def get_series(self, country: str, field: str) -> DataFrame:
-        return self.epidemiology_series[self.epidemiology_series['countrycode'] == country][
-            ['date', field]].dropna().reset_index(drop=True)
+        if country not in self.series_rows:
+            return self.epidemiology_series.iloc[0:0][['date', field]].reset_index(drop=True)
+        start, end = self.series_rows[country]
+        return self.epidemiology_series.iloc[start:end][['date', field]].dropna().reset_index(drop=True)
 
     def get_wbi_data(self, country: str, field: str):
-        if len(self.wbi_table[self.wbi_table['countrycode'] == country]) == 0:
+        if country not in self.wbi_rows:
             return np.nan
 
-        return self.wbi_table[self.wbi_table['countrycode'] == country][field].values[0]
+        return self.wbi_rows[country][field]
 
     def get_population(self, country: str):
         return self.get_wbi_data(country, 'value')
@@ -121,26 +404,28 @@ class DataProvider:
     def get_countries(self):
         return self.epidemiology['countrycode'].unique()
 
-    def load_from_cache(self, file_name: str) -> DataFrame:
-        cache_name = file_name + '.csv'
-        full_path = os.path.join(self.config.cache_path, cache_name)
-        if self.use_cache and os.path.exists(full_path) and self.validation(file_name, 'load'):
-            print(f'Loading data from cache file: {full_path}')
-            df = pd.read_csv(full_path, encoding='utf-8')
-            if 'date' in df.columns:
-                df['date'] = pd.to_datetime(df['date'], format='%Y-%m-%d').dt.date
-            return df
-        return None
+    def load_from_cache(self, file_name: str, columns: List[str] = None) -> DataFrame:
+        if not self.use_cache:
+            return None
+        # fall back to a csv cache, e.g. one written before the cache format was changed
+        key = self.cache_key(file_name)
+        df, metadata = self.cache_store().read(file_name, key, list(dict.fromkeys([self.cache_format, 'csv'])),
+                                               columns)
+        if metadata is None:
+            print(f'No cache of {file_name} for the current parameters. The data will be reloaded')
+            return None
+        self.digests[(file_name, key)] = metadata['digest']
+        return df
 
     def save_to_cache(self, df: DataFrame, file_name: str):
         if self.use_cache:
-            cache_name = file_name + '.csv'
-            full_path = os.path.join(self.config.cache_path, cache_name)
-            print(f'Saving data to cache: {full_path}')
-            pathlib.Path(os.path.dirname(full_path)).mkdir(parents=True, exist_ok=True)
-            df.to_csv(full_path, encoding='utf-8')
-            # also save the config parameters that were used for validating future loads
-            self.validation(file_name, 'save')
+            # also save what the table was built from, and a digest of its contents which forms part of the key of the
+            # tables built from it
+            digest = hashlib.sha256(pd.util.hash_pandas_object(df, index=False).values.tobytes()).hexdigest()[:16]
+            key = self.cache_key(file_name)
+            self.cache_store().write(df, file_name, key, self.cache_format,
+                                     dict(self.cache_inputs(file_name), digest=digest))
+            self.digests[(file_name, key)] = digest
 
     def get_epi_table(self) -> DataFrame:
         '''
@@ -148,236 +433,255 @@ class DataProvider:
         '''
         print('Fetching epidemiology data')
         cache_filename = "epidemiology_table"
+        raw_cache_filename = "epidemiology_raw_table"
 
         epidemiology = self.load_from_cache(cache_filename)
-        if epidemiology is not None:
+        if epidemiology is not None and not self.incremental:
             return epidemiology
 
-        if not self.conn:
-            self.open_db_connection()
         cols = 'countrycode, country, date, confirmed, dead'
         sql_command = 'SELECT ' + cols + \
-                      ' FROM epidemiology WHERE adm_area_1 IS NULL AND source = %(source)s AND gid IS NOT NULL'
-        epi_table = pd.read_sql(sql_command, self.conn, params={'source': self.source}) \
-            .sort_values(by=['countrycode', 'date'])
+                      ' FROM epidemiology WHERE adm_area_1 IS NULL AND source = %(source)s AND gid IS NOT NULL' + \
+                      ' AND date <= %(end_date)s'
+        # the table as pulled is cached alongside the preprocessed table so that it can be updated incrementally
+        epi_table = self.load_from_cache(raw_cache_filename) if epidemiology is not None else None
+        epi_table, changed = self.sync_table(epi_table, sql_command,
+                                             params={'source': self.source, 'end_date': self.end_date},
+                                             dtypes={'confirmed': np.float64, 'dead': np.float64})
         epi_table = epi_table[epi_table['date'] <= self.end_date] \
             .reset_index(drop=True)
         # checks for any duplication/conflicts in the timeseries
         assert not epi_table[['countrycode', 'date']].duplicated().any()
-        epidemiology = pd.DataFrame(columns=[
-            'countrycode', 'country', 'date', 'confirmed', 'new_per_day', 'dead_per_day'])
-        # suppress pandas errors in this loop, where we generate ChainedAssignment warnings
-        pd.options.mode.chained_assignment = None
-        for country in tqdm(epi_table['countrycode'].unique(), desc='Pre-processing Epidemiological Data'):
-            data = epi_table[epi_table['countrycode'] == country].set_index('date')
-            # cast all dates as datetime date to omit ambiguity
-            data = data.reindex([x.date() for x in pd.date_range(data.index.values[0], data.index.values[-1])])
-            # fill gaps in countrycode
-            data[['countrycode', 'country']] = data[['countrycode', 'country']].fillna(method='backfill')
-            # linearly interpolate gaps in confirmed data
-            data['confirmed'] = data['confirmed'].interpolate(method='linear')
-            # diff on interpolated data is equivalent to attributing the rise in new cases over two days
-            data['new_per_day'] = data['confirmed'].diff(periods=1)
-            data.reset_index(inplace=True)
-            # for negative values of new cases per day (inaccuracies caused by consolidation) replace with last
-            data['new_per_day'].iloc[np.array(data[data['new_per_day'] < 0].index)] = \
-                data['new_per_day'].iloc[np.array(data[data['new_per_day'] < 0].index) - 1]
-            # fill na with last acceptable value
-            data['new_per_day'] = data['new_per_day'].fillna(method='bfill')
-            # similarly interpolate death
-            data['dead'] = data['dead'].interpolate(method='linear')
-            data['dead_per_day'] = data['dead'].diff()
-            # data.reset_index(inplace=True)
-            data['dead_per_day'].iloc[np.array(data[data['dead_per_day'] < 0].index)] = \
-                data['dead_per_day'].iloc[np.array(data[data['dead_per_day'] < 0].index) - 1]
-            data['dead_per_day'] = data['dead_per_day'].fillna(method='bfill')
-            epidemiology = pd.concat((epidemiology, data)).reset_index(drop=True)
-        pd.options.mode.chained_assignment = 'warn'
+        if changed is None:
+            epidemiology = self.preprocess_epi_table(epi_table)
+        elif len(changed) > 0:
+            # only the countries with new or revised rows are preprocessed again
+            updated = self.preprocess_epi_table(epi_table[epi_table['countrycode'].isin(changed)])
+            epidemiology = pd.concat([epidemiology.loc[~epidemiology['countrycode'].isin(changed), updated.columns],
+                                      updated])
+            epidemiology = epidemiology.iloc[np.argsort(epidemiology['countrycode'].values, kind='stable')] \
+                .reset_index(drop=True)
+        else:
+            return epidemiology
 
+        self.save_to_cache(epi_table, raw_cache_filename)
         self.save_to_cache(epidemiology, cache_filename)
         return epidemiology
 
-    def get_epi_series(self, epidemiology: DataFrame, testing: DataFrame, wbi_table: DataFrame) -> DataFrame:
+    @staticmethod
+    def preprocess_epi_table(epi_table: DataFrame) -> DataFrame:
+        '''
+        FILL GAPS AND COMPUTE DAILY CHANGES FOR EACH COUNTRY
+        '''
+        # epi_table is sorted by countrycode and date, so each country is a contiguous block of rows. Reindex every
+        # country at once to a daily range from its first to its last date
+        epi_table = epi_table.reset_index(drop=True)
+        dates = pd.to_datetime(epi_table['date']).values.astype('datetime64[D]')
+        codes = epi_table['countrycode'].values
+        group_starts = np.flatnonzero(np.concatenate(([True], codes[1:] != codes[:-1])))
+        first_dates = dates[group_starts]
+        last_dates = np.append(dates[group_starts[1:] - 1], dates[-1:])
+        lengths = (last_dates - first_dates).astype(np.int64) + 1
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        group = np.repeat(np.arange(len(group_starts)), lengths)
+        days = np.arange(lengths.sum()) - offsets[group]
+        # position of each original row in the daily index
+        row_group = np.repeat(np.arange(len(group_starts)), np.diff(np.append(group_starts, len(epi_table))))
+        rows = offsets[row_group] + (dates - first_dates[row_group]).astype(np.int64)
+
+        def reindexed(column):
+            values = np.full(len(group), np.nan, dtype=object if epi_table[column].dtype == object else np.float64)
+            values[rows] = epi_table[column].values
+            return values
+
+        # cast all dates as datetime date to omit ambiguity
+        data = pd.DataFrame({'date': (first_dates[group] + days).astype(object),
+                             'countrycode': reindexed('countrycode'),
+                             'country': reindexed('country')})
+        by_country = pd.Series(group)
+        # fill gaps in countrycode
+        data[['countrycode', 'country']] = data[['countrycode', 'country']].groupby(by_country).bfill()
+
+        def interpolate(values):
+            # linear interpolation within each country, as Series.interpolate(method='linear'): gaps after the last
+            # value are filled with the last value, gaps before the first are left
+            positions = np.arange(len(values), dtype=np.float64)
+            valid = ~np.isnan(values)
+            previous_position = pd.Series(np.where(valid, positions, np.nan)).groupby(by_country).ffill().values
+            next_position = pd.Series(np.where(valid, positions, np.nan)).groupby(by_country).bfill().values
+            previous_value = pd.Series(values).groupby(by_country).ffill().values
+            next_value = pd.Series(values).groupby(by_country).bfill().values
+            result = values.copy()
+            interior = ~valid & ~np.isnan(previous_position) & ~np.isnan(next_position)
+            slope = (next_value[interior] - previous_value[interior]) / \
+                    (next_position[interior] - previous_position[interior])
+            result[interior] = slope * (positions[interior] - previous_position[interior]) + previous_value[interior]
+            trailing = ~valid & ~np.isnan(previous_position) & np.isnan(next_position)
+            result[trailing] = previous_value[trailing]
+            return result
+
+        def daily_change(values):
+            # diff on interpolated data is equivalent to attributing the rise in new cases over two days
+            change = np.full(len(values), np.nan)
+            change[1:] = values[1:] - values[:-1]
+            change[days == 0] = np.nan
+            # for negative values (inaccuracies caused by consolidation) replace with the previous day's value. The
+            # first day of a country is never negative, so the previous day is always in the same country
+            negative = np.flatnonzero(change < 0)
+            change[negative] = change[negative - 1]
+            # fill na with next acceptable value
+            return pd.Series(change).groupby(by_country).bfill().values
+
+        # linearly interpolate gaps in confirmed data
+        data['confirmed'] = interpolate(reindexed('confirmed'))
+        data['new_per_day'] = daily_change(data['confirmed'].values)
+        # similarly interpolate death
+        data['dead'] = interpolate(reindexed('dead'))
+        data['dead_per_day'] = daily_change(data['dead'].values)
+
+        return data[['countrycode', 'country', 'date', 'confirmed', 'new_per_day', 'dead_per_day', 'dead']]
+
+    def get_epi_series(self, epidemiology: DataFrame, testing: DataFrame, wbi_table: DataFrame,
+                       t0_table: DataFrame = None) -> DataFrame:
         print('Processing Epidemiological Time Series Data')
         cache_filename = "epidemiology_series"
 
-        epidemiology_series = self.load_from_cache(cache_filename)
+        series_columns = None if self.series_fields is None else ['countrycode', 'date'] + [
+            field for field in self.series_fields if field not in ['countrycode', 'date']]
+        # the cache key depends on the contents of epidemiology, testing and wbi_table, so cached series built from
+        # other versions of these tables are not loaded
+        epidemiology_series = self.load_from_cache(cache_filename, columns=series_columns)
         if epidemiology_series is not None:
             return epidemiology_series
 
-        # initialise epidemiology time-series data
-        epidemiology_series = {
-            'countrycode': np.empty(0),
-            'country': np.empty(0),
-            'date': np.empty(0),
-            'confirmed': np.empty(0),
-            'new_per_day': np.empty(0),
-            'new_per_day_smooth': np.empty(0),
-            'dead': np.empty(0),
-            'days_since_t0': np.empty(0),
-            'new_cases_per_rel_constant': np.empty(0),
-            'dead_per_day': np.empty(0),
-            'dead_per_day_smooth': np.empty(0),
-            'new_deaths_per_rel_constant': np.empty(0),
-            'tests': np.empty(0),
-            'new_tests': np.empty(0),
-            'new_tests_smooth': np.empty(0),
-            'positive_rate': np.empty(0),
-            'positive_rate_smooth': np.empty(0),
-            'days_since_t0_pop': np.empty(0),
-            'days_since_t0_1_dead': np.empty(0),
-            'days_since_t0_5_dead': np.empty(0),
-            'days_since_t0_10_dead': np.empty(0),
-            'case_death_ascertainment': np.empty(0)
-        }
-
-        for country in tqdm(np.sort(epidemiology['countrycode'].unique()),
-                            desc='Processing Epidemiological Time Series Data'):
-            epi_data = epidemiology[epidemiology['countrycode'] == country]
-            tst_data = testing[testing['countrycode'] == country]
-            # we want a master spreadsheet
-            tests = np.repeat(np.nan, len(epi_data))
-            new_tests = np.repeat(np.nan, len(epi_data))
-            new_tests_smooth = np.repeat(np.nan, len(epi_data))
-            positive_rate = np.repeat(np.nan, len(epi_data))
-            positive_rate_smooth = np.repeat(np.nan, len(epi_data))
-            # if we want to run our analysis through a 7d moving average or a spline fit
-            if self.use_splines:
-                x = np.arange(len(epi_data['date']))
-                y = epi_data['new_per_day'].values
-                ys = csaps(x, y, x, smooth=self.smooth)
-                z = epi_data['dead_per_day'].values
-                zs = csaps(x, z, x, smooth=self.smooth)
-            else:
-                ys = epi_data[['new_per_day', 'date']].rolling(window=self.ma_window, on='date').mean()['new_per_day']
-                zs = epi_data[['dead_per_day', 'date']].rolling(window=self.ma_window, on='date').mean()['dead_per_day']
-            # preparing testing data based metrics
-            if len(tst_data) > 1:
-                tests = epi_data[['date']].merge(
-                    tst_data[['date', 'total_tests']], how='left', on='date')['total_tests'].values
-                # if testing data has new_tests_smoothed, use this
-                if sum(~pd.isnull(tst_data['new_tests_smoothed'])) > 0:
-                    new_tests_smooth = epi_data[['date']].merge(
-                        tst_data[['date', 'new_tests_smoothed']], how='left', on='date')['new_tests_smoothed'].values
-                if sum(~pd.isnull(tst_data['new_tests'])) > 0:
-                    new_tests = epi_data[['date']].merge(
-                        tst_data[['date', 'new_tests']], how='left', on='date')['new_tests'].values
-                else:
-                    new_tests = new_tests_smooth
-
-                if sum(~pd.isnull(tst_data['new_tests_smoothed'])) == 0 and sum(~pd.isnull(tst_data['new_tests'])) > 0:
-                    # if there is no data in new_tests_smoothed, compute 7 day moving average
-                    new_tests_smooth = epi_data[['date']] \
-                        .merge(tst_data[['date', 'new_tests']], how='left', on='date')[['new_tests', 'date']] \
-                        .rolling(window=7, on='date').mean()['new_tests']
-                positive_rate[~np.isnan(new_tests)] = epi_data['new_per_day'][~np.isnan(new_tests)] / new_tests[
-                    ~np.isnan(new_tests)]
-                positive_rate[positive_rate > 1] = np.nan
-                positive_rate_smooth = np.array(pd.Series(positive_rate).rolling(window=7).mean())
-            # accessing population data from wbi_table
-            population = np.nan if len(wbi_table[wbi_table['countrycode'] == country]['value']) == 0 else \
-                wbi_table[wbi_table['countrycode'] == country]['value'].iloc[0]
-            # two definitions of t0 use where appropriate
-            # t0 absolute ~= 1000 total cases or t0 relative = 0.05 per rel_to_constant
-            t0 = np.nan if len(epi_data[epi_data['confirmed'] >= self.config.abs_t0_threshold]['date']) == 0 else \
-                epi_data[epi_data['confirmed'] >= self.config.abs_t0_threshold]['date'].iloc[0]
-            t0_relative = np.nan if \
-                len(epi_data[((epi_data['confirmed'] / population) * self.config.rel_to_constant)
-                             >= self.config.rel_t0_threshold]) == 0 else \
-                epi_data[((epi_data['confirmed'] / population) * self.config.rel_to_constant) >=
-                         self.config.rel_t0_threshold]['date'].iloc[0]
-            # t0_k_dead represents day first k total dead was reported
-            t0_1_dead = np.nan if len(epi_data[epi_data['dead'] >= 1]['date']) == 0 else \
-                epi_data[epi_data['dead'] >= 1]['date'].iloc[0]
-            t0_5_dead = np.nan if len(epi_data[epi_data['dead'] >= 5]['date']) == 0 else \
-                epi_data[epi_data['dead'] >= 5]['date'].iloc[0]
-            t0_10_dead = np.nan if len(epi_data[epi_data['dead'] >= 10]['date']) == 0 else \
-                epi_data[epi_data['dead'] >= 10]['date'].iloc[0]
-            # index days since absolute t0, relative t0, k deaths
-            days_since_t0 = np.repeat(np.nan, len(epi_data)) if pd.isnull(t0) else \
-                np.array([(date - t0).days for date in epi_data['date'].values])
-            days_since_t0_relative = np.repeat(np.nan, len(epi_data)) if pd.isnull(t0_relative) else \
-                np.array([(date - t0_relative).days for date in epi_data['date'].values])
-            days_since_t0_1_dead = np.repeat(np.nan, len(epi_data)) if pd.isnull(t0_1_dead) else \
-                np.array([(date - t0_1_dead).days for date in epi_data['date'].values])
-            days_since_t0_5_dead = np.repeat(np.nan, len(epi_data)) if pd.isnull(t0_5_dead) else \
-                np.array([(date - t0_5_dead).days for date in epi_data['date'].values])
-            days_since_t0_10_dead = np.repeat(np.nan, len(epi_data)) if pd.isnull(t0_10_dead) else \
-                np.array([(date - t0_10_dead).days for date in epi_data['date'].values])
-            # again rel constant represents a population threhsold - 10,000 in the default case
-            new_cases_per_rel_constant = self.config.rel_to_constant * (ys / population)
-            new_deaths_per_rel_constant = self.config.rel_to_constant * (zs / population)
-            # compute case-death ascertaintment
-            case_death_ascertainment = (epi_data['confirmed'].astype(int) /
-                                        epi_data['dead'].astype(int).shift(-9).replace(0, np.nan)).values
-            # upsert processed data
-            epidemiology_series['countrycode'] = np.concatenate((
-                epidemiology_series['countrycode'], epi_data['countrycode'].values))
-            epidemiology_series['country'] = np.concatenate(
-                (epidemiology_series['country'], epi_data['country'].values))
-            epidemiology_series['date'] = np.concatenate(
-                (epidemiology_series['date'], epi_data['date'].values))
-            epidemiology_series['confirmed'] = np.concatenate(
-                (epidemiology_series['confirmed'], epi_data['confirmed'].values))
-            epidemiology_series['new_per_day'] = np.concatenate(
-                (epidemiology_series['new_per_day'], epi_data['new_per_day'].values))
-            epidemiology_series['new_per_day_smooth'] = np.concatenate(
-                (epidemiology_series['new_per_day_smooth'], ys))
-            epidemiology_series['dead'] = np.concatenate(
-                (epidemiology_series['dead'], epi_data['dead'].values))
-            epidemiology_series['dead_per_day'] = np.concatenate(
-                (epidemiology_series['dead_per_day'], epi_data['dead_per_day'].values))
-            epidemiology_series['dead_per_day_smooth'] = np.concatenate(
-                (epidemiology_series['dead_per_day_smooth'], zs))
-            epidemiology_series['days_since_t0'] = np.concatenate(
-                (epidemiology_series['days_since_t0'], days_since_t0))
-            epidemiology_series['new_cases_per_rel_constant'] = np.concatenate(
-                (epidemiology_series['new_cases_per_rel_constant'], new_cases_per_rel_constant))
-            epidemiology_series['new_deaths_per_rel_constant'] = np.concatenate(
-                (epidemiology_series['new_deaths_per_rel_constant'], new_deaths_per_rel_constant))
-            epidemiology_series['tests'] = np.concatenate(
-                (epidemiology_series['tests'], tests))
-            epidemiology_series['new_tests'] = np.concatenate(
-                (epidemiology_series['new_tests'], new_tests))
-            epidemiology_series['new_tests_smooth'] = np.concatenate(
-                (epidemiology_series['new_tests_smooth'], new_tests_smooth))
-            epidemiology_series['positive_rate'] = np.concatenate(
-                (epidemiology_series['positive_rate'], positive_rate))
-            epidemiology_series['positive_rate_smooth'] = np.concatenate(
-                (epidemiology_series['positive_rate_smooth'], positive_rate_smooth))
-            epidemiology_series['days_since_t0_pop'] = np.concatenate(
-                (epidemiology_series['days_since_t0_pop'], days_since_t0_relative))
-            epidemiology_series['days_since_t0_1_dead'] = np.concatenate(
-                (epidemiology_series['days_since_t0_1_dead'], days_since_t0_1_dead))
-            epidemiology_series['days_since_t0_5_dead'] = np.concatenate(
-                (epidemiology_series['days_since_t0_5_dead'], days_since_t0_5_dead))
-            epidemiology_series['days_since_t0_10_dead'] = np.concatenate(
-                (epidemiology_series['days_since_t0_10_dead'], days_since_t0_10_dead))
-            epidemiology_series['case_death_ascertainment'] = np.concatenate(
-                (epidemiology_series['case_death_ascertainment'], case_death_ascertainment))
-            continue
-
-        epidemiology_series = pd.DataFrame.from_dict(epidemiology_series)
+        epidemiology_series = self.build_epi_series(epidemiology, testing, wbi_table, t0_table)
         self.save_to_cache(epidemiology_series, cache_filename)
+        if series_columns is not None:
+            epidemiology_series = epidemiology_series[series_columns]
         return epidemiology_series
 
+    def build_epi_series(self, epidemiology: DataFrame, testing: DataFrame, wbi_table: DataFrame,
+                         t0_table: DataFrame = None) -> DataFrame:
+        '''
+        BUILD THE TIME SERIES FOR ALL COUNTRIES IN ONE PASS
+        '''
+        # t0_table is the table of get_t0_table for epidemiology and wbi_table, which is built here if not given
+        # each country is a contiguous block of rows, in order of countrycode
+        epi_data = epidemiology.iloc[np.argsort(epidemiology['countrycode'].values, kind='stable')] \
+            .reset_index(drop=True)
+        countries, group = np.unique(epi_data['countrycode'].values, return_inverse=True)
+        by_country = pd.Series(group)
+        n = len(epi_data)
+
+        def grouped_rolling_mean(values, window):
+            return pd.Series(values).groupby(by_country).rolling(window=window).mean().values
+
+        def t0_dates(column):
+            return pd.to_datetime(column).values.astype('datetime64[D]')
+
+        def days_since(t0):
+            # index days since t0, or nan if t0 was never reached
+            days = dates - t0[group]
+            return np.where(np.isnat(days), np.nan, days.astype(np.int64))
+
+        dates = pd.to_datetime(epi_data['date']).values.astype('datetime64[D]')
+        confirmed = epi_data['confirmed'].values.astype(np.float64)
+        dead = epi_data['dead'].values.astype(np.float64)
+        new_per_day = epi_data['new_per_day'].values.astype(np.float64)
+
+        # if we want to run our analysis through a 7d moving average or a spline fit
+        if self.use_splines:
+            ys, zs = np.empty(n), np.empty(n)
+            for rows in np.split(np.arange(n), np.flatnonzero(np.diff(group)) + 1):
+                x = np.arange(len(rows))
+                ys[rows] = csaps(x, new_per_day[rows], x, smooth=self.smooth)
+                zs[rows] = csaps(x, epi_data['dead_per_day'].values[rows], x, smooth=self.smooth)
+        else:
+            ys = grouped_rolling_mean(new_per_day, self.ma_window)
+            zs = grouped_rolling_mean(epi_data['dead_per_day'].values.astype(np.float64), self.ma_window)
+
+        # preparing testing data based metrics, for countries with more than one day of testing data
+        tst_data = testing[testing['countrycode'].isin(countries)]
+        tst_counts = tst_data.groupby('countrycode').agg(
+            rows=('countrycode', 'size'), new_tests=('new_tests', 'count'),
+            new_tests_smoothed=('new_tests_smoothed', 'count')).reindex(countries).fillna(0)
+        has_tests = (tst_counts['rows'].values > 1)[group]
+        has_new_tests = has_tests & (tst_counts['new_tests'].values > 0)[group]
+        has_new_tests_smoothed = has_tests & (tst_counts['new_tests_smoothed'].values > 0)[group]
+        merged = epi_data[['countrycode', 'date']].merge(
+            tst_data[['countrycode', 'date', 'total_tests', 'new_tests', 'new_tests_smoothed']],
+            how='left', on=['countrycode', 'date'])
+        merged_new_tests = merged['new_tests'].values.astype(np.float64)
+        tests = np.where(has_tests, merged['total_tests'].values.astype(np.float64), np.nan)
+        # if testing data has new_tests_smoothed, use this, otherwise compute 7 day moving average
+        new_tests_smooth = np.where(has_new_tests_smoothed, merged['new_tests_smoothed'].values.astype(np.float64),
+                                    np.where(has_new_tests, grouped_rolling_mean(merged_new_tests, 7), np.nan))
+        new_tests = np.where(has_new_tests, merged_new_tests,
+                             np.where(has_new_tests_smoothed, new_tests_smooth, np.nan))
+        positive_rate = np.full(n, np.nan)
+        measured = has_tests & ~np.isnan(new_tests)
+        positive_rate[measured] = new_per_day[measured] / new_tests[measured]
+        positive_rate[positive_rate > 1] = np.nan
+        positive_rate_smooth = grouped_rolling_mean(positive_rate, 7)
+
+        # accessing population data and the t0 dates from the table shared with WaveAnalysisPanel
+        t0_table = self.get_t0_table(epi_data, wbi_table) if t0_table is None else t0_table.reindex(countries)
+        population = t0_table['population'].values.astype(np.float64)[group]
+        t0 = t0_dates(t0_table['t0'])
+        t0_relative = t0_dates(t0_table['t0_relative'])
+        t0_1_dead = t0_dates(t0_table['t0_1_dead'])
+        t0_5_dead = t0_dates(t0_table['t0_5_dead'])
+        t0_10_dead = t0_dates(t0_table['t0_10_dead'])
+
+        # compute case-death ascertaintment
+        lagged_dead = epi_data['dead'].astype(int).groupby(by_country).shift(-9).replace(0, np.nan)
+        case_death_ascertainment = (epi_data['confirmed'].astype(int) / lagged_dead).values
+
+        # again rel constant represents a population threhsold - 10,000 in the default case
+        return pd.DataFrame({
+            'countrycode': epi_data['countrycode'].values.astype(object),
+            'country': epi_data['country'].values.astype(object),
+            'date': epi_data['date'].values.astype(object),
+            'confirmed': confirmed,
+            'new_per_day': new_per_day,
+            'new_per_day_smooth': ys,
+            'dead': dead,
+            'days_since_t0': days_since(t0),
+            'new_cases_per_rel_constant': self.config.rel_to_constant * (ys / population),
+            'dead_per_day': epi_data['dead_per_day'].values.astype(np.float64),
+            'dead_per_day_smooth': zs,
+            'new_deaths_per_rel_constant': self.config.rel_to_constant * (zs / population),
+            'tests': tests,
+            'new_tests': new_tests,
+            'new_tests_smooth': new_tests_smooth,
+            'positive_rate': positive_rate,
+            'positive_rate_smooth': positive_rate_smooth,
+            'days_since_t0_pop': days_since(t0_relative),
+            'days_since_t0_1_dead': days_since(t0_1_dead),
+            'days_since_t0_5_dead': days_since(t0_5_dead),
+            'days_since_t0_10_dead': days_since(t0_10_dead),
+            'case_death_ascertainment': case_death_ascertainment})
+
     def get_gsi_table(self) -> DataFrame:
         print('Fetching government_response data')
         cache_filename = "government_response_table"
 
         government_response = self.load_from_cache(cache_filename)
-        if government_response is not None:
+        if government_response is not None and not self.incremental:
             return government_response
 
         '''
         PREPARE GOVERNMENT RESPONSE TABLE
         '''
-        if not self.conn:
-            self.open_db_connection()
         cols = 'countrycode, country, date, stringency_index, ' + ', '.join(list(self.flags.keys()))
         sql_command = """SELECT """ + cols + """ FROM government_response"""
-        gsi_table = pd.read_sql(sql_command, self.conn) \
-            .sort_values(by=['countrycode', 'date']) \
+        # only duplicated rows are removed, so the cached table can be updated incrementally in place of the raw table
+        gsi_table, changed = self.sync_table(
+            government_response, sql_command,
+            dtypes={column: np.float64 for column in ['stringency_index'] + list(self.flags.keys())})
+        if changed is not None and len(changed) == 0:
+            return government_response
+        gsi_table = gsi_table \
             .filter(items=['countrycode', 'country', 'date', 'stringency_index'] +
                           list(self.flags.keys())) \
             .reset_index(drop=True)
@@ -398,28 +702,20 @@ class DataProvider:
         '''
         PREPARE WORLD BANK STATISTICS
         '''
-        if not self.conn:
-            self.open_db_connection()
         sql_command = """SELECT countrycode, indicator_code, value 
                          FROM world_bank 
-                         WHERE adm_area_1 IS NULL AND indicator_code IN %(indicator_code)s"""
-        raw_wbi_table = pd.read_sql(sql_command, self.conn,
-                                    params={'indicator_code': tuple(self.wb_codes.keys())}).dropna()
-        raw_wbi_table = raw_wbi_table.sort_values(by=['countrycode'], ascending=[True]).reset_index(drop=True)
+                         WHERE adm_area_1 IS NULL AND indicator_code IN %(indicator_code)s AND value IS NOT NULL"""
+        raw_wbi_table = self.read_sql(sql_command,
+                                      params={'indicator_code': tuple(self.wb_codes.keys())},
+                                      dtypes={'value': np.float64}).dropna()
         assert not raw_wbi_table[['countrycode', 'indicator_code']].duplicated().any()
 
-        wbi_table = pd.DataFrame()
-        for country in raw_wbi_table['countrycode'].unique():
-            data = dict()
-            data['countrycode'] = country
-            for indicator in self.wb_codes.keys():
-                if len(raw_wbi_table[(raw_wbi_table['countrycode'] == country) &
-                                     (raw_wbi_table['indicator_code'] == indicator)]['value']) == 0:
-                    continue
-                data[self.wb_codes[indicator]] = raw_wbi_table[
-                    (raw_wbi_table['countrycode'] == country) &
-                    (raw_wbi_table['indicator_code'] == indicator)]['value'].iloc[0]
-            wbi_table = wbi_table.append(data, ignore_index=True)
+        # one row for each country, with a column for each indicator
+        wbi_table = raw_wbi_table.pivot(index='countrycode', columns='indicator_code', values='value') \
+            .reindex(columns=list(self.wb_codes.keys())) \
+            .rename(columns=self.wb_codes) \
+            .rename_axis(columns=None) \
+            .reset_index()
         wbi_table['net_migration'] = wbi_table['net_migration'].abs()
 
         self.save_to_cache(wbi_table, cache_filename)
@@ -435,20 +731,14 @@ class DataProvider:
         if testing is not None:
             return testing
 
-        owid_source = 'https://raw.githubusercontent.com/owid/covid-19-data/master/public/data/owid-covid-data.csv'
-        tst_table = pd.read_csv(owid_source, parse_dates=['date'])[
-            ['iso_code', 'date', 'total_tests', 'new_tests', 'new_tests_smoothed', 'positive_rate']] \
-            .rename(columns={'iso_code': 'countrycode'})
-        tst_table['date'] = tst_table['date'].apply(lambda x: x.date())
-        tst_table = tst_table[tst_table['date'] <= self.end_date].reset_index(drop=True)
-        # filters out some odd columns in the countrycode column
-        countries = [country for country in tst_table['countrycode'].unique()
-                     if not (pd.isnull(country)) and (len(country) == 3)]
+        # odd entries in the countrycode column are filtered out as the file is read
+        tst_table = read_owid_csv(self.owid_source, self.end_date)
         # initialise results dataframe
         testing = pd.DataFrame(
             columns=['countrycode', 'date', 'total_tests', 'new_tests', 'new_tests_smoothed', 'positive_rate'])
-        for country in tqdm(countries, desc='Pre-processing Testing Data'):
-            data = tst_table[tst_table['countrycode'] == country].reset_index(drop=True)
+        countries = tst_table.groupby('countrycode', sort=False)
+        for country, data in tqdm(countries, total=countries.ngroups, desc='Pre-processing Testing Data'):
+            data = data.reset_index(drop=True)
             # filter out countries without any testing data
             if len(data['new_tests'].dropna()) == 0:
                 continue
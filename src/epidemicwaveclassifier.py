@@ -2,7 +2,9 @@ import os
 import shutil
 from pathlib import Path
 
+from concurrent.futures import ProcessPoolExecutor
 from pandas import DataFrame
+from tqdm import tqdm
 import json
 
 import wavefinder as wf
@@ -11,6 +13,52 @@ from data_provider import DataProvider
 from config import Config
 
 
+def make_wavelist(data: DataFrame, field: str, t_sep_a: int, thresholds: tuple) -> wf.WaveList:
+    # thresholds are the prominence threshold and the prominence height threshold for the field in the country
+    series_name = 'Cases' if field == 'new_per_day_smooth' else 'Deaths'
+    return wf.WaveList(data[field], series_name, t_sep_a, *thresholds)
+
+
+def find_country_peaks(country: str, cases: DataFrame, deaths: DataFrame, t_sep_a: int, case_thresholds: tuple,
+                       death_thresholds: tuple, plot: bool, save: bool, plot_path: str) -> (DataFrame, list):
+    # finds the case and death waves of a country and cross-validates them, returning the cross-validated case peaks
+    # and their summary. Takes the data rather than the data provider, so that it can be run in a worker process, and
+    # raises ValueError if the country has no cases or deaths
+    if len(cases) == 0:
+        raise ValueError('no cases')
+    case_wavelist = make_wavelist(cases, 'new_per_day_smooth', t_sep_a, case_thresholds)
+
+    if len(deaths) == 0:
+        raise ValueError('no deaths')
+    deaths_wavelist = make_wavelist(deaths, 'dead_per_day_smooth', t_sep_a, death_thresholds)
+
+    # run cross-validation (Sub Algorithm E) to find additional case waves from deaths waves
+    cross_validated_cases = case_wavelist.cross_validate(
+        deaths_wavelist, plot=plot, plot_path=plot_path, title=country)
+
+    # compute plots
+    if plot:
+        wf.plot_peaks([case_wavelist, deaths_wavelist], country, save, plot_path)
+
+    # summarise the output of cross-validation
+    summary = []
+    for row, peak in cross_validated_cases.iterrows():
+        peak_data = dict({"index": row, "location": peak.location, "date": cases.iloc[int(peak.location)].date,
+                          "peak_ind": peak.peak_ind, "y_position": peak.y_position})
+        summary.append(peak_data)
+
+    return cross_validated_cases, summary
+
+
+def _find_country_peaks_summary(task: tuple) -> (str, list, str):
+    # runs in a worker process, so only the summary is returned. A country without data is returned in place of the
+    # summary rather than raised, so that it is skipped as in epi_find_peaks, any other error ends the run
+    try:
+        return task[0], find_country_peaks(*task)[1], None
+    except ValueError as e:
+        return task[0], None, str(e)
+
+
 class EpidemicWaveClassifier:
     def __init__(self, config: Config, data_provider: DataProvider):
         self.config = config
@@ -27,52 +75,99 @@ class EpidemicWaveClassifier:
             print(f"Error: {path}: {e.strerror}")
         Path(path).mkdir(parents=True, exist_ok=True)
 
-    def find_peaks(self, country: str, field: str) -> wf.WaveList:
-
-        data = self.data_provider.get_series(country=country, field=field)
-        data = data[field]
-        params = self.config.prominence_thresholds(field)
-        params['rel_to_constant'] = self.config.rel_to_constant
+    def get_prominence_thresholds(self, country: str, field: str, config: Config = None) -> (float, float):
+        config = self.config if config is None else config
+        params = config.prominence_thresholds(field)
         population = self.data_provider.get_population(country)
         prominence_threshold = max(params['abs_prominence_threshold'],
-                                   min(params['rel_prominence_threshold'] * population / params['rel_to_constant'],
+                                   min(params['rel_prominence_threshold'] * population / config.rel_to_constant,
                                        params['rel_prominence_max_threshold']))
-        series_name = 'Cases' if field == 'new_per_day_smooth' else 'Deaths'
-
-        wavelist = wf.WaveList(data, series_name, self.config.t_sep_a, prominence_threshold,
-                               params['prominence_height_threshold'])
+        return prominence_threshold, params['prominence_height_threshold']
 
-        return wavelist
+    def find_peaks(self, country: str, field: str) -> wf.WaveList:
 
-    def epi_find_peaks(self, country: str, plot: bool = False, save: bool = False) -> DataFrame:
+        data = self.data_provider.get_series(country=country, field=field)
+        return make_wavelist(data, field, self.config.t_sep_a, self.get_prominence_thresholds(country, field))
+
+    def sweep_parameters(self, configs: list, countries: list = None, workers: int = 1) -> DataFrame:
+        # count the case and death waves in each country for each Config, sharing the work which does not depend on the
+        # prominence thresholds
+        countries = self.data_provider.get_countries() if countries is None else countries
+        cases, deaths = dict(), dict()
+        for country in countries:
+            country_cases = self.data_provider.get_series(country=country, field='new_per_day_smooth')
+            country_deaths = self.data_provider.get_series(country=country, field='dead_per_day_smooth')
+            if len(country_cases) == 0 or len(country_deaths) == 0:
+                continue
+            cases[country] = country_cases['new_per_day_smooth']
+            deaths[country] = country_deaths['dead_per_day_smooth']
+
+        parameter_sets = []
+        for config in configs:
+            case_thresholds = {country: self.get_prominence_thresholds(country, 'new_per_day_smooth', config)
+                               for country in cases}
+            death_thresholds = {country: self.get_prominence_thresholds(country, 'dead_per_day_smooth', config)
+                                for country in cases}
+            parameter_sets.append({
+                't_sep_a': config.t_sep_a,
+                'prominence_threshold': {country: value[0] for country, value in case_thresholds.items()},
+                'prominence_height_threshold': {country: value[1] for country, value in case_thresholds.items()},
+                'reference_prominence_threshold': {country: value[0] for country, value in death_thresholds.items()},
+                'reference_prominence_height_threshold': {country: value[1]
+                                                          for country, value in death_thresholds.items()}})
+
+        return wf.sweep(cases, parameter_sets, deaths, workers=workers, key_name='countrycode')
+
+    def country_task(self, country: str, plot: bool = False, save: bool = False) -> tuple:
+        # collect everything needed to find the peaks for a country, so that it can be sent to a worker process
+        # without the data provider
         cases = self.data_provider.get_series(country=country, field='new_per_day_smooth')
-        if len(cases) == 0:
-            raise ValueError
-        case_wavelist = self.find_peaks(country, field='new_per_day_smooth')
-
         deaths = self.data_provider.get_series(country=country, field='dead_per_day_smooth')
-        if len(deaths) == 0:
-            raise ValueError
-        deaths_wavelist = self.find_peaks(country, field='dead_per_day_smooth')
-
-        # run cross-validation (Sub Algorithm E) to find additional case waves from deaths waves
-        cross_validated_cases = case_wavelist.cross_validate(
-            deaths_wavelist, plot=plot, plot_path=self.config.plot_path, title=country)
-
-        # compute plots
-        if plot:
-            wf.plot_peaks([case_wavelist, deaths_wavelist], country, save, self.config.plot_path)
-
-        # store output of cross-validation to self.summary_output
-        summary = []
-        for row, peak in cross_validated_cases.iterrows():
-            peak_data = dict({"index": row, "location": peak.location, "date": cases.iloc[int(peak.location)].date,
-                              "peak_ind": peak.peak_ind, "y_position": peak.y_position})
-            summary.append(peak_data)
-        self.summary_output[country] = summary
+        return (country, cases, deaths, self.config.t_sep_a,
+                self.get_prominence_thresholds(country, 'new_per_day_smooth'),
+                self.get_prominence_thresholds(country, 'dead_per_day_smooth'),
+                plot, save, self.config.plot_path)
 
+    def epi_find_peaks(self, country: str, plot: bool = False, save: bool = False) -> DataFrame:
+        cross_validated_cases, summary = find_country_peaks(*self.country_task(country, plot, save))
+        self.summary_output[country] = summary
         return cross_validated_cases
 
+    def epi_find_peaks_all(self, countries: list = None, workers: int = 1, chunksize: int = None,
+                           plot: bool = False, save: bool = False) -> list:
+        # find the peaks for each country across a pool of worker processes, returning the countries for which the
+        # peaks could not be found
+        countries = self.data_provider.get_countries() if countries is None else countries
+        tasks = [self.country_task(country, plot, save) for country in countries]
+
+        if workers == 1:
+            failed = self.store_summaries(map(_find_country_peaks_summary, tasks), len(tasks))
+        else:
+            # several countries are sent to a worker at a time so that small countries are not dominated by the cost
+            # of communicating with the worker
+            if chunksize is None:
+                chunksize = max(1, len(tasks) // (4 * workers))
+            executor = ProcessPoolExecutor(max_workers=workers)
+            try:
+                failed = self.store_summaries(executor.map(_find_country_peaks_summary, tasks, chunksize=chunksize),
+                                               len(tasks))
+            finally:
+                # on an interrupt the countries not yet started are cancelled rather than waited for
+                executor.shutdown(wait=True, cancel_futures=True)
+        return failed
+
+    def store_summaries(self, results, total: int) -> list:
+        # the results arrive in the order of the countries, so summary_output does not depend on scheduling. Returns
+        # the countries for which the peaks could not be found, which are skipped
+        failed = []
+        for country, summary, error in tqdm(results, total=total, desc='Finding peaks for all countries'):
+            if error is not None:
+                print(f'Unable to find peaks for: {country} ({error})')
+                failed.append(country)
+                continue
+            self.summary_output[country] = summary
+        return failed
+
     def save_summary(self):
         json_data = dict({'data': []})
         for country, summary in self.summary_output.items():
@@ -1,5 +1,4 @@
 import os
-from tqdm import tqdm
 from epidemicwaveclassifier import EpidemicWaveClassifier
 from data_provider import DataProvider
 from config import Config
@@ -15,16 +14,11 @@ if __name__ == '__main__':
 
     epidemic_wave_classifier = EpidemicWaveClassifier(config, data_provider)
 
-    t = tqdm(countries, desc='Finding peaks for all countries')
-    for country in t:
-        t.set_description(f"Finding peaks for: {country}")
-        t.refresh()
-        try:
-            epidemic_wave_classifier.epi_find_peaks(country, plot=True, save=True)
-        except ValueError:
-            print(f'Unable to find peaks for: {country}')
-        except KeyboardInterrupt:
-            exit()
+    # the countries for which the peaks cannot be found are reported and skipped
+    try:
+        epidemic_wave_classifier.epi_find_peaks_all(countries, workers=os.cpu_count(), plot=True, save=True)
+    except KeyboardInterrupt:
+        exit()
 
     wave_analysis_panel = WaveAnalysisPanel(config, data_provider, epidemic_wave_classifier.summary_output).get_epi_panel()
 
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+from typing import List
+from pandas import DataFrame
+
+
+def day_numbers(dates) -> np.ndarray:
+    # days since the epoch of each date, with missing dates as nan
+    days = pd.to_datetime(pd.Series(np.asarray(dates, dtype=object))).values.astype('datetime64[D]')
+    return np.where(np.isnat(days), np.nan, days.astype(np.int64).astype(np.float64))
+
+
+class PrefixSumStore:
+    def __init__(self, table: DataFrame, fields: List[str]):
+        # the values of fields in a long table with a row for each country and date are laid out on a daily grid for
+        # each country, stored one country after another in flat arrays. Each field is held with its running sum and
+        # running trapezoidal integral, so that the sum, change or integral over any window of days is read from the
+        # two ends of the window
+        table = table[table['date'].notna()]
+        days = day_numbers(table['date'].values).astype(np.int64)
+        order = np.lexsort((days, table['countrycode'].values))
+        codes, days = table['countrycode'].values[order], days[order]
+
+        self.countries = pd.Index(pd.unique(codes))
+        country = self.countries.get_indexer(codes)
+        self.first_day = np.full(len(self.countries), np.iinfo(np.int64).max)
+        self.last_day = np.full(len(self.countries), np.iinfo(np.int64).min)
+        np.minimum.at(self.first_day, country, days)
+        np.maximum.at(self.last_day, country, days)
+        lengths = self.last_day - self.first_day + 1
+        self.offset = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+        size = int(lengths.sum())
+        positions = self.offset[country] + days - self.first_day[country]
+
+        # number of rows up to each day, to tell windows with no rows from windows with no valid values
+        observed = np.zeros(size)
+        observed[positions] = 1.0
+        self.rows = np.concatenate([[0.0], np.cumsum(observed)])
+
+        self.values, self.sums, self.integrals, self.next_valid, self.previous_valid = {}, {}, {}, {}, {}
+        grid_days = np.arange(size) - np.repeat(self.offset, lengths)
+        same_country = np.repeat(np.arange(len(self.countries)), lengths)
+        for field in fields:
+            # where a country has several rows for a day the last is kept, as in a merge on date
+            values = np.full(size, np.nan)
+            values[positions] = table[field].values.astype(np.float64)[order]
+            self.values[field] = values
+            valid = ~np.isnan(values)
+            self.sums[field] = np.concatenate([[0.0], np.cumsum(np.where(valid, values, 0.0))])
+
+            # the integral up to each valid day, from the first valid day of the country, by the trapezoidal rule
+            x, y, c = grid_days[valid], values[valid], same_country[valid]
+            areas = np.where(c[1:] == c[:-1], (x[1:] - x[:-1]) * (y[1:] + y[:-1]) / 2.0, 0.0)
+            integrals = np.full(size, np.nan)
+            integrals[valid] = np.concatenate([[0.0], np.cumsum(areas)])
+            self.integrals[field] = integrals
+
+            # nearest valid day at or after, and at or before, each day, or -1 if there is none
+            valid_positions = np.flatnonzero(valid)
+            following = np.searchsorted(valid_positions, np.arange(size))
+            self.next_valid[field] = np.where(following < len(valid_positions),
+                                              np.append(valid_positions, -1)[following], -1)
+            self.previous_valid[field] = np.where(following + valid - 1 >= 0,
+                                                  np.append(valid_positions, -1)[following + valid - 1], -1)
+
+    def _window(self, countries, start=None, end=None):
+        # the first and last position of the window from start to end for each country, clipped to the days of the
+        # country, and whether the window holds any days. A missing start or end is the first or last day
+        country = self.countries.get_indexer(np.asarray(countries, dtype=object))
+        known = country >= 0
+        country = np.where(known, country, 0)
+        first, last = self.first_day[country].astype(np.float64), self.last_day[country].astype(np.float64)
+        start = first if start is None else np.fmax(day_numbers(start), first)
+        end = last if end is None else np.fmin(day_numbers(end), last)
+        exists = known & ~np.isnan(start) & ~np.isnan(end) & (start <= end)
+        offset = self.offset[country] - self.first_day[country]
+        lo = np.where(exists, offset + np.nan_to_num(start), 0).astype(np.int64)
+        hi = np.where(exists, offset + np.nan_to_num(end), 0).astype(np.int64)
+        return lo, hi, exists
+
+    def value(self, field: str, countries, dates) -> np.ndarray:
+        '''
+        VALUE OF FIELD ON EACH DATE
+        '''
+        # nan if the country has no row for the date
+        lo, _, exists = self._window(countries, dates, dates)
+        return np.where(exists, self.values[field][lo], np.nan)
+
+    def delta(self, field: str, countries, start, end) -> np.ndarray:
+        '''
+        CHANGE IN FIELD FROM START TO END
+        '''
+        # e.g. the deaths during a wave from the cumulative deaths at its start and end
+        return self.value(field, countries, end) - self.value(field, countries, start)
+
+    def window_sum(self, field: str, countries, start=None, end=None) -> np.ndarray:
+        '''
+        SUM OF FIELD FROM START TO END INCLUSIVE
+        '''
+        # missing values are skipped, and the sum is nan if the country has no rows in the window
+        lo, hi, exists = self._window(countries, start, end)
+        has_rows = exists & (self.rows[hi + 1] > self.rows[lo])
+        return np.where(has_rows, self.sums[field][hi + 1] - self.sums[field][lo], np.nan)
+
+    def integral(self, field: str, countries, start=None, end=None) -> np.ndarray:
+        '''
+        INTEGRAL OF FIELD OVER DAYS FROM START TO END
+        '''
+        # by the trapezoidal rule over the days with values, as np.trapz of the values against their days. The
+        # integral is 0 if there is at most one valid value, and nan if the country has no rows in the window
+        lo, hi, exists = self._window(countries, start, end)
+        has_rows = exists & (self.rows[hi + 1] > self.rows[lo])
+        first_valid = self.next_valid[field][lo]
+        last_valid = self.previous_valid[field][hi]
+        spans = has_rows & (first_valid >= 0) & (last_valid >= first_valid)
+        integrals = self.integrals[field]
+        return np.where(spans, integrals[last_valid] - integrals[first_valid], np.where(has_rows, 0.0, np.nan))
@@ -1,9 +1,16 @@
 import os
 
+import numpy as np
 import pandas as pd
 import pingouin as pg
 from config import Config
 
+# metrics of the epidemiological panel summarised for each class in table 1
+TABLE_1_METRICS = ['mortality_rate', 'case_rate', 'peak_case_rate', 'stringency_response_time', 'total_stringency',
+                   'testing_response_time', 'population_density', 'gni_per_capita']
+# name of the column holding each quantile in table 1, other quantiles are named quantile_<q>
+QUANTILE_NAMES = {0.25: 'quartile_1', 0.5: 'median', 0.75: 'quartile_3'}
+
 
 class Table1:
     def __init__(self, config: Config, epi_panel: pd.core.frame.DataFrame):
@@ -18,37 +25,61 @@ class Table1:
         y = data[~(data['class_coarse'] == 1)][field].dropna().values
         return pg.mwu(x, y, tail='one-sided')
 
+    @staticmethod
+    def _quantiles(data: pd.DataFrame, quantiles: list) -> pd.DataFrame:
+        # every quantile of every metric for each class in a single grouped reduction, with a row for each metric and
+        # a column for each quantile and class
+        summary = data.groupby(by=['class_coarse'])[TABLE_1_METRICS].quantile(quantiles).T
+        return summary.rename(columns=lambda q: QUANTILE_NAMES.get(q, f'quantile_{q}'), level=1) \
+            .swaplevel(axis=1).rename_axis(columns=[None, 'class_coarse'])
+
+    @staticmethod
+    def _bootstrap_medians(data: pd.DataFrame, samples: int, confidence: float, seed: int = 0) -> pd.DataFrame:
+        '''
+        BOOTSTRAP CONFIDENCE INTERVALS FOR THE MEDIAN OF EACH METRIC IN EACH CLASS
+        '''
+        # the values of each class are padded to the size of the largest class, so that all classes are resampled at
+        # once. Draws are made within the values of each class and the padding is ignored by nanmedian
+        rng = np.random.default_rng(seed)
+        bounds = [(1 - confidence) / 2, (1 + confidence) / 2]
+        classes = pd.Index(np.sort(data['class_coarse'].dropna().unique()), name='class_coarse')
+        intervals = dict()
+        for metric in TABLE_1_METRICS:
+            values = data[['class_coarse', metric]].dropna()
+            sizes = values.groupby('class_coarse').size().reindex(classes, fill_value=0).values
+            width = sizes.max(initial=0)
+            padded = np.full((len(classes), width), np.nan)
+            padded[classes.get_indexer(values['class_coarse']), values.groupby('class_coarse').cumcount().values] = \
+                values[metric].values
+            draws = (rng.random((len(classes), samples, width)) * sizes[:, None, None]).astype(np.int64)
+            resampled = padded[np.arange(len(classes))[:, None, None], draws]
+            resampled = np.where(np.arange(width) < sizes[:, None, None], resampled, np.nan)
+            # classes without values for the metric have no interval
+            interval = np.full((len(classes), 2), np.nan)
+            sampled = sizes > 0
+            interval[sampled] = np.quantile(np.nanmedian(resampled[sampled], axis=2), bounds, axis=1).T
+            intervals[metric] = interval
+        return pd.DataFrame({(statistic, class_coarse): [intervals[metric][i, j] for metric in TABLE_1_METRICS]
+                             for i, class_coarse in enumerate(classes)
+                             for j, statistic in enumerate(['median_ci_lower', 'median_ci_upper'])},
+                            index=TABLE_1_METRICS).rename_axis(columns=[None, 'class_coarse'])
+
     # waiting implementation 'country', 'countrycode',
     def table_1(self):
         print('Generating Table 1')
 
         epidemiology_panel = self.epi_panel
-        median = epidemiology_panel[
-            ['class_coarse', 'mortality_rate', 'case_rate', 'peak_case_rate',
-             'stringency_response_time', 'total_stringency', 'testing_response_time',
-             'population_density', 'gni_per_capita']].groupby(by=['class_coarse']).median().T
-        quartile_1 = epidemiology_panel[
-            ['class_coarse', 'mortality_rate', 'case_rate', 'peak_case_rate',
-             'stringency_response_time', 'total_stringency', 'testing_response_time',
-             'population_density', 'gni_per_capita']].groupby(by=['class_coarse']).quantile(0.25).T
-        quartile_3 = epidemiology_panel[
-            ['class_coarse', 'mortality_rate', 'case_rate', 'peak_case_rate',
-             'stringency_response_time', 'total_stringency', 'testing_response_time',
-             'population_density', 'gni_per_capita']].groupby(by=['class_coarse']).quantile(0.75).T
-        data = pd.concat(
-            [quartile_1, median, quartile_3], keys=['quartile_1', 'median', 'quartile_3'], axis=1).sort_values(
-            by=['class_coarse'], axis=1)
+        data = self._quantiles(epidemiology_panel, self.config.table_1_quantiles)
+        if self.config.bootstrap_samples > 0:
+            intervals = self._bootstrap_medians(epidemiology_panel, self.config.bootstrap_samples,
+                                                self.config.bootstrap_confidence)
+            data = pd.concat([data, intervals], axis=1)
+        # the statistics are grouped by class, in the order of the quantiles followed by the confidence intervals
+        data = data.iloc[:, np.argsort(data.columns.get_level_values('class_coarse'), kind='stable')]
         data.to_csv(os.path.join(self.config.data_path, 'table_1_v1.csv'))
-        self._mann_whitney(epidemiology_panel[
-                               ['class_coarse', 'mortality_rate', 'case_rate', 'peak_case_rate',
-                                'stringency_response_time', 'total_stringency', 'testing_response_time',
-                                'population_density', 'gni_per_capita']].copy(), field='gni_per_capita').to_csv(
+        self._mann_whitney(epidemiology_panel, field='gni_per_capita').to_csv(
             os.path.join(self.config.data_path, 'mann_whitney_gni.csv'))
-        self._mann_whitney(epidemiology_panel[
-                               ['class_coarse', 'mortality_rate', 'case_rate', 'peak_case_rate',
-                                'stringency_response_time', 'total_stringency', 'testing_response_time',
-                                'population_density', 'gni_per_capita']].copy(),
-                           field='stringency_response_time').to_csv(
+        self._mann_whitney(epidemiology_panel, field='stringency_response_time').to_csv(
             os.path.join(self.config.data_path, 'mann_whitney_si.csv'))
         print('Done')
         return data
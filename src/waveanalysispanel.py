@@ -1,17 +1,51 @@
 import os
-from tqdm import tqdm
 import numpy as np
 import pandas as pd
 from typing import Dict
 from data_provider import DataProvider
+from cache_store import CACHE_FORMATS, available_format, write_cache_file
+from prefix_sum_store import PrefixSumStore
 from config import Config
 
+# the type of each column of the table of waves, which has a row for each wave of each country
+WAVE_DTYPES = {'countrycode': object, 'wave_no': np.int64, 'wave_start': 'datetime64[ns]',
+               'date_peak': 'datetime64[ns]', 'wave_end': 'datetime64[ns]', 'peak': np.float64,
+               'peak_per_rel_to': np.float64, 'wave_duration': 'Int64', 'wave_cfr': np.float64,
+               'dead_during_wave': np.float64, 'tests_during_wave': np.float64, 'si_integral_during_wave': np.float64}
+
+# wave characteristics in the results table, with the name of the column holding each for wave i. The other columns
+# of the table of waves are only written to the table of waves
+WAVE_COLUMNS = {'peak': 'peak_{}', 'peak_per_rel_to': 'peak_{}_per_rel_to', 'date_peak': 'date_peak_{}',
+                'wave_start': 'wave_start_{}', 'wave_end': 'wave_end_{}', 'wave_duration': 'wave_duration_{}',
+                'wave_cfr': 'wave_cfr_{}'}
+
+
+def wide_waves(waves: pd.DataFrame, countries: pd.Index = None) -> pd.DataFrame:
+    # the table of waves with a row for each country and a column for each characteristic of each wave, for the
+    # results table read by Table1 and the R scripts. Dates are given as datetime date, as in the rest of the panel, and
+    # durations as floats, which are missing for countries without the wave
+    countries = pd.Index(waves['countrycode'].unique()) if countries is None else countries
+    wave_numbers = range(1, max(waves['wave_no'].max() if len(waves) > 0 else 1, 1) + 1)
+    columns = [(field, i) for i in wave_numbers for field in WAVE_COLUMNS.keys()]
+    wide = waves.assign(**{field: waves[field].dt.date for field in ['wave_start', 'date_peak', 'wave_end']},
+                        wave_duration=waves['wave_duration'].astype(np.float64)) \
+        .set_index(['countrycode', 'wave_no'])[list(WAVE_COLUMNS.keys())].unstack('wave_no') \
+        .reindex(index=countries, columns=pd.MultiIndex.from_tuples(columns))
+    wide.columns = [WAVE_COLUMNS[field].format(i) for field, i in columns]
+    return wide.rename_axis('countrycode')
+
+
+# the column holding the response time to each government response flag, named by the flag code, e.g. c1
+RESPONSE_TIME_COLUMN = '{}_response_time'
+
 
 class WaveAnalysisPanel:
     def __init__(self, config: Config, data_provider: DataProvider, peaks_and_troughs: Dict):
         self.config = config
         self.peaks_and_troughs = peaks_and_troughs
         self.data_provider = data_provider
+        self.waves = None
+        self.response_times = None
 
     def _classify(self, country):
         if country not in self.config.exclude_countries:
@@ -26,184 +60,161 @@ class WaveAnalysisPanel:
             return 0, None
         return peak_class, peaks_and_troughs
 
-    # waiting implementation
+    @staticmethod
+    def _first_per_country(table: pd.DataFrame, field: str, countries: pd.Index, keep: str = 'first') -> pd.Series:
+        # the first (or last) value of field for each country, in the order of table, or nan if the country has no rows
+        return table.drop_duplicates(subset=['countrycode'], keep=keep).set_index('countrycode')[field] \
+            .reindex(countries)
+
+    @staticmethod
+    def _days_between(end: pd.Series, start: pd.Series) -> pd.Series:
+        # days from start to end for each country, or nan if either date is missing
+        return (pd.to_datetime(end) - pd.to_datetime(start)).dt.days
+
+    def _get_waves(self, panel: pd.DataFrame, peaks_and_troughs: Dict, series: pd.DataFrame,
+                   epidemiology: PrefixSumStore, stringency: PrefixSumStore) -> pd.DataFrame:
+        '''
+        ONE ROW FOR EACH WAVE OF EACH COUNTRY
+        '''
+        # the peaks and troughs of every country in panel, from the lists of dicts in summary_output
+        extrema = pd.DataFrame(
+            [(country, extremum['index'], extremum['peak_ind'], extremum['date'], extremum['y_position'])
+             for country in panel.index if type(peaks_and_troughs[country]) == list
+             for extremum in peaks_and_troughs[country]],
+            columns=['countrycode', 'index', 'peak_ind', 'date', 'y_position'])
+        extrema['date'] = pd.to_datetime(extrema['date'])
+        # each peak is a wave, which starts at the preceding trough and ends at the following trough
+        waves = extrema[extrema['peak_ind'] == 1].reset_index(drop=True)
+        dates = extrema.set_index(['countrycode', 'index'])['date']
+        dates = dates[~dates.index.duplicated(keep='last')]
+        wave_start = dates.reindex(pd.MultiIndex.from_arrays([waves['countrycode'], waves['index'] - 1])).values
+        wave_end = dates.reindex(pd.MultiIndex.from_arrays([waves['countrycode'], waves['index'] + 1])).values
+
+        # a first wave without a preceding trough starts with the first case, and a wave without a following trough
+        # ends with the last day on which there had been a case
+        wave_no = ((waves['index'].values + 2) // 2).astype(np.int64)
+        first_case = pd.to_datetime(self.data_provider.t0_table['t0_1_confirmed'].reindex(waves['countrycode'])).values
+        last_case = pd.to_datetime(self._first_per_country(
+            series[series['confirmed'] >= 1], 'date', panel.index, keep='last').reindex(waves['countrycode'])).values
+        wave_start = np.where(np.isnat(wave_start) & (wave_no == 1), first_case, wave_start)
+        wave_end = np.where(np.isnat(wave_end), last_case, wave_end)
+
+        waves = pd.DataFrame({'countrycode': waves['countrycode'].values, 'wave_no': wave_no,
+                              'wave_start': wave_start, 'date_peak': waves['date'].values, 'wave_end': wave_end,
+                              'peak': waves['y_position'].values.astype(np.float64)}) \
+            .drop_duplicates(subset=['countrycode', 'wave_no'], keep='last')
+
+        # calculate information relating to each wave
+        waves['peak_per_rel_to'] = \
+            (waves['peak'] / panel['population'].reindex(waves['countrycode']).values) * self.config.rel_to_constant
+        waves['wave_duration'] = self._days_between(waves['wave_end'], waves['wave_start'])
+        # changes and integrals over each wave are read from the ends of the wave
+        countries, wave_start, wave_end = waves['countrycode'], waves['wave_start'], waves['wave_end']
+        dead_during_wave = epidemiology.delta('dead', countries, wave_start, wave_end)
+        waves['wave_cfr'] = dead_during_wave / epidemiology.delta('confirmed', countries, wave_start, wave_end)
+        waves['dead_during_wave'] = dead_during_wave
+        waves['tests_during_wave'] = epidemiology.delta('tests', countries, wave_start, wave_end)
+        waves['si_integral_during_wave'] = stringency.integral('stringency_index', countries, wave_start, wave_end)
+        return waves.astype(WAVE_DTYPES).reset_index(drop=True)
+
+    def get_response_times(self, countries: pd.Index = None, reference: str = 't0_10_dead', thresholds: Dict = None,
+                           long: bool = False) -> pd.DataFrame:
+        '''
+        DAYS FROM T0 UNTIL EACH GOVERNMENT RESPONSE FLAG FIRST REACHES ITS THRESHOLD
+        '''
+        # thresholds maps each flag to the level it must reach, by default DataProvider.flags, and reference is the
+        # column of the t0 table from which the days are counted. The first dates of all flags are found in a single
+        # grouped pass over the government response table. Returns a table indexed by countrycode with a column for
+        # each flag, or if long a row for each country and flag with the threshold and first date
+        thresholds = self.data_provider.flags if thresholds is None else thresholds
+        countries = self.data_provider.t0_table.index if countries is None else countries
+        flags = list(thresholds.keys())
+        gsi_table = self.data_provider.gsi_table
+        dates = pd.to_datetime(gsi_table['date']).values
+        # missing values never reach the threshold
+        reached = gsi_table[flags].values.astype(np.float64) >= np.array(list(thresholds.values()), dtype=np.float64)
+        first_dates = pd.DataFrame(np.where(reached, dates[:, None], np.datetime64('NaT')), columns=flags) \
+            .groupby(gsi_table['countrycode'].values).min().reindex(countries)
+        t0 = pd.to_datetime(self.data_provider.t0_table[reference].reindex(countries))
+        response_times = first_dates.sub(t0, axis=0) / np.timedelta64(1, 'D')
+        if not long:
+            return response_times.rename(columns={flag: RESPONSE_TIME_COLUMN.format(flag[0:2]) for flag in flags}) \
+                .rename_axis('countrycode')
+        long_table = pd.DataFrame({
+            'countrycode': np.repeat(countries.values, len(flags)),
+            'flag': np.tile(flags, len(countries)),
+            'threshold': np.tile(list(thresholds.values()), len(countries)),
+            'first_date': first_dates.stack(dropna=False).dt.date.values,
+            'response_time': response_times.values.ravel()})
+        return long_table
+
     def get_epi_panel(self):
         print('Preparing Epidemiological Results Table')
-        '''epidemiology_static = pd.DataFrame(
-            columns=['countrycode', 'country', 'class', 'population',
-                     't0', 't0_relative', 't0_1_dead','t0_5_dead',
-                     't0_10_dead', 'peak_1', 'peak_2', 'date_peak_1',
-                     'date_peak_2', 'first_wave_start', 'first_wave_end', 'duration_first_wave',
-                     'second_wave_start', 'second_wave_end','last_confirmed', 'last_dead',
-                     'testing_available','peak_1_cfr','peak_2_cfr', 'dead_class','tests_class'])'''
-        epidemiology_panel = pd.DataFrame()
-        # wave parameters marked a w
-        for country in tqdm(np.sort(self.data_provider.epidemiology_series['countrycode'].unique()),
-                            desc='Preparing Epidemiological Results Table'):
-            data = dict()
-            data['countrycode'] = country
-            data['country'] = np.nan
-            data['class'] = np.nan
-            data['class_coarse'] = np.nan  # one, two, three or more waves
-            data['population'] = np.nan
-            data['population_density'] = np.nan
-            data['gni_per_capita'] = np.nan
-            data['total_confirmed'] = np.nan
-            data['total_dead'] = np.nan
-            data['mortality_rate'] = np.nan
-            data['case_rate'] = np.nan
-            data['peak_case_rate'] = np.nan
-            data['stringency_response_time'] = np.nan
-            data['total_stringency'] = np.nan
-            data['testing_response_time'] = np.nan  # days to reach 10 tests per rel_to
-            data['t0'] = np.nan
-            data['t0_relative'] = np.nan
-            data['t0_1_dead'] = np.nan
-            data['t0_5_dead'] = np.nan
-            data['t0_10_dead'] = np.nan
-            data['testing_available'] = np.nan
-            data['rel_to_constant'] = self.config.rel_to_constant
-            data['peak_1'] = np.nan  # w
-            data['peak_1_per_rel_to'] = np.nan  # w
-            data['date_peak_1'] = np.nan  # w
-            data['wave_start_1'] = np.nan  # w
-            data['wave_end_1'] = np.nan  # w
-            data['wave_duration_1'] = np.nan  # w
-            data['wave_cfr_1'] = np.nan  # w
-
-            country_series = self.data_provider.epidemiology_series[
-                self.data_provider.epidemiology_series['countrycode'] == country].reset_index(drop=True)
-            gsi_series = self.data_provider.gsi_table[
-                self.data_provider.gsi_table['countrycode'] == country].reset_index(
-                drop=True)
-            testing_series = self.data_provider.testing[
-                self.data_provider.testing['countrycode'] == country].reset_index(
-                drop=True)
-            # skip country if number of observed days is less than the minimum number of days for a wave
-            if len(country_series) < self.config.t_sep_a:
-                continue
-            # first populate non-wave characteristics
-            data['country'] = country_series['country'].iloc[0]
-            data['class'], peaks_and_troughs = self._classify(country)
-            data['class_coarse'] = 1 if data['class'] <= 2 else (2 if data['class'] <= 4 else 3)
-            data['population'] = self.data_provider.get_wbi_data(country, 'value')
-            data['population_density'] = self.data_provider.get_wbi_data(country, 'population_density')
-            data['gni_per_capita'] = self.data_provider.get_wbi_data(country, 'gni_per_capita')
-            data['total_confirmed'] = country_series['confirmed'].iloc[-1]
-            data['total_dead'] = country_series['dead'].iloc[-1]
-            data['mortality_rate'] = (data['total_dead'] / data['population']) * data['rel_to_constant']
-            data['case_rate'] = (data['total_confirmed'] / data['population']) * data['rel_to_constant']
-            data['peak_case_rate'] = \
-                (country_series['new_per_day_smooth'].max() / data['population']) * data['rel_to_constant']
-            data['total_stringency'] = np.nan if len(gsi_series) == 0 else np.trapz(
-                y=gsi_series['stringency_index'].dropna(),
-                x=[(a - gsi_series['date'].values[0]).days
-                   for a in gsi_series['date'][~np.isnan(gsi_series['stringency_index'])]])
-            data['t0'] = np.nan if len(
-                country_series[country_series['confirmed'] >= self.config.abs_t0_threshold]['date']) == 0 else \
-                country_series[country_series['confirmed'] >= self.config.abs_t0_threshold]['date'].iloc[0]
-            data['t0_relative'] = np.nan if len(
-                country_series[((country_series['confirmed'] /
-                                 data[
-                                     'population']) * self.config.rel_to_constant >= self.config.rel_t0_threshold)][
-                    'date']) == 0 else \
-                country_series[((country_series['confirmed'] /
-                                 data[
-                                     'population']) * self.config.rel_to_constant >= self.config.rel_t0_threshold)][
-                    'date'].iloc[
-                    0]
-            data['t0_1_dead'] = np.nan if len(country_series[country_series['dead'] >= 1]['date']) == 0 else \
-                country_series[country_series['dead'] >= 1]['date'].iloc[0]
-            data['t0_5_dead'] = np.nan if len(country_series[country_series['dead'] >= 5]['date']) == 0 else \
-                country_series[country_series['dead'] >= 5]['date'].iloc[0]
-            data['t0_10_dead'] = np.nan if len(country_series[country_series['dead'] >= 10]['date']) == 0 else \
-                country_series[country_series['dead'] >= 10]['date'].iloc[0]
-            data['testing_available'] = True if len(country_series['new_tests'].dropna()) > 0 else False
-            # if t0 not defined all other metrics make no sense
-            if pd.isnull(data['t0_10_dead']):
-                continue
-
-            '''
-            # response time is only defined for the first wave
-            if (len(gsi_series) > 0) and (type(peaks_and_troughs) == pd.core.frame.DataFrame) and len(peaks_and_troughs) 
-            >= 1:
-                sorted_bases = np.sort(
-                    np.concatenate((peaks_and_troughs['left_base'].values, peaks_and_troughs[
-                    'right_base'].values))).astype(int)
-                peak_start = country_series.dropna(
-                        subset=['new_per_day_smooth'])['date'].iloc[
-                        sorted_bases[np.where(sorted_bases <= int(peaks_and_troughs['location'].iloc[0]))][-1]]
-                peak_end = country_series.dropna(
-                        subset=['new_per_day_smooth'])['date'].iloc[
-                        sorted_bases[np.where(sorted_bases >= int(peaks_and_troughs['location'].iloc[0]))][0]]
-                gsi_first_wave = gsi_series[(gsi_series['date'] <= peak_end) & (gsi_series['date'] >= peak_start)]\
-                    .reset_index(drop=True)
-                data['stringency_response_time'] = \
-                    (gsi_first_wave.iloc[gsi_first_wave['stringency_index'].argmax()]['date'] -  data['t0_1_dead']).days
-            elif (len(gsi_series) > 0) and (type(peaks_and_troughs) == pd.core.frame.DataFrame):
-                data['stringency_response_time'] = (gsi_series.iloc[gsi_series['stringency_index'].argmax()]['date']
-                                                   -  data['t0_1_dead']).days
-            else:
-                pass
-            '''
-            if (len(gsi_series) > 0) and (len(gsi_series[gsi_series['c3_cancel_public_events'] == 2]) > 0):
-                data['stringency_response_time'] = \
-                    (gsi_series[gsi_series['c3_cancel_public_events'] == 2]['date'].iloc[0] - data[
-                        't0_10_dead']).days
-
-            if data['testing_available']:
-                data['testing_response_time'] = np.nan if \
-                    len(testing_series[(testing_series['total_tests'] / data['population']) *
-                                       data['rel_to_constant'] >= 10]) == 0 \
-                    else \
-                    (testing_series[(testing_series['total_tests'] / data['population']) *
-                                    data['rel_to_constant'] >= 10]['date'].iloc[0] - data['t0_1_dead']).days
-
-            # for each wave we add characteristics
-            if (type(peaks_and_troughs) == list) and len(peaks_and_troughs) > 0:
-                for peak in peaks_and_troughs:
-                    # only run this for peaks
-                    if peak['peak_ind'] == 0:
-                        continue
-                    end_of_wave_found = False
-                    # wave number
-                    i = int((peak['index'] + 2) / 2)
-                    # data relating to the peak
-                    data['peak_{}'.format(str(i))] = peak['y_position']
-                    data['peak_{}_per_rel_to'.format(str(i))] = \
-                        (peak['y_position'] / data['population']) * data['rel_to_constant']
-                    data['date_peak_{}'.format(str(i))] = peak['date']
-                    # find preceding and following troughs
-                    if i == 1:
-                        wave_start = np.nan if len(country_series[country_series['confirmed'] >= 1]['date']) == 0 \
-                            else \
-                            country_series[country_series['confirmed'] >= 1]['date'].iloc[0]
-                        data['wave_start_{}'.format(str(i))] = wave_start
-                    for trough in peaks_and_troughs:
-                        if trough['index'] == peak['index'] - 1:
-                            data['wave_start_{}'.format(str(i))] = trough['date']
-                        elif trough['index'] == peak['index'] + 1:
-                            data['wave_end_{}'.format(str(i))] = trough['date']
-                            end_of_wave_found = True
-                    if not end_of_wave_found:
-                        wave_end = np.nan if len(country_series[country_series['confirmed'] >= 1]['date']) == 0 \
-                            else \
-                            country_series[country_series['confirmed'] >= 1]['date'].iloc[-1]
-                        data['wave_end_{}'.format(str(i))] = wave_end
-                    # calculate information relating to the wave
-                    data['wave_duration_{}'.format(str(i))] = (data['wave_end_{}'.format(str(i))] -
-                                                               data['wave_start_{}'.format(str(i))]).days
-                    data['wave_cfr_{}'.format(str(i))] = \
-                        (country_series[country_series['date'] ==
-                                        data['wave_end_{}'.format(str(i))]]['dead'].iloc[0] -
-                         country_series[country_series['date'] ==
-                                        data['wave_start_{}'.format(str(i))]]['dead'].iloc[0]) / \
-                        (country_series[country_series['date'] ==
-                                        data['wave_end_{}'.format(str(i))]]['confirmed'].iloc[0] -
-                         country_series[country_series['date'] ==
-                                        data['wave_start_{}'.format(str(i))]]['confirmed'].iloc[0])
-                    continue
-            epidemiology_panel = epidemiology_panel.append(data, ignore_index=True)
-            continue
+        rel_to_constant = self.config.rel_to_constant
+        # each country is a contiguous block of rows, in order of countrycode
+        series = self.data_provider.epidemiology_series
+        series = series.iloc[np.argsort(series['countrycode'].values, kind='stable')].reset_index(drop=True)
+        by_country = series.groupby('countrycode')
+        # skip country if number of observed days is less than the minimum number of days for a wave
+        observed_days = by_country.size()
+        countries = observed_days.index[observed_days >= self.config.t_sep_a]
+
+        # first populate non-wave characteristics
+        wbi_data = self.data_provider.wbi_table.drop_duplicates(subset=['countrycode']).set_index('countrycode') \
+            .reindex(countries)
+        # the t0 dates are read from the table shared with DataProvider.get_epi_series
+        t0_dates = self.data_provider.t0_table.reindex(countries)
+        classes = {country: self._classify(country) for country in countries}
+        peaks_and_troughs = {country: country_peaks_and_troughs
+                             for country, (_, country_peaks_and_troughs) in classes.items()}
+        panel = pd.DataFrame({'country': self._first_per_country(series, 'country', countries),
+                              'class': [peak_class for peak_class, _ in classes.values()]}, index=countries)
+        panel['class_coarse'] = np.where(panel['class'] <= 2, 1, np.where(panel['class'] <= 4, 2, 3))
+        panel['population'] = wbi_data['value']
+        panel['population_density'] = wbi_data['population_density']
+        panel['gni_per_capita'] = wbi_data['gni_per_capita']
+        panel['total_confirmed'] = self._first_per_country(series, 'confirmed', countries, keep='last')
+        panel['total_dead'] = self._first_per_country(series, 'dead', countries, keep='last')
+        panel['mortality_rate'] = (panel['total_dead'] / panel['population']) * rel_to_constant
+        panel['case_rate'] = (panel['total_confirmed'] / panel['population']) * rel_to_constant
+        panel['peak_case_rate'] = \
+            (by_country['new_per_day_smooth'].max().reindex(countries) / panel['population']) * rel_to_constant
+        panel['stringency_response_time'] = np.nan
+        # cumulative values and integrals of each country are read from prefix sums over its days
+        epidemiology = PrefixSumStore(series, ['confirmed', 'dead', 'tests'])
+        stringency = PrefixSumStore(self.data_provider.gsi_table, ['stringency_index'])
+        panel['total_stringency'] = stringency.integral('stringency_index', countries)
+        panel['testing_response_time'] = np.nan  # days to reach 10 tests per rel_to
+        for t0 in ['t0', 't0_relative', 't0_1_dead', 't0_5_dead', 't0_10_dead']:
+            panel[t0] = t0_dates[t0]
+        panel['testing_available'] = by_country['new_tests'].count().reindex(countries) > 0
+        panel['rel_to_constant'] = rel_to_constant
+        # if t0 not defined all other metrics make no sense
+        panel = panel[panel['t0_10_dead'].notnull()]
+        countries = panel.index
+
+        # the threshold of c3_cancel_public_events in DataProvider.flags is 2, the cancellation of all public events
+        self.response_times = self.get_response_times(countries, reference='t0_10_dead')
+        panel['stringency_response_time'] = self.response_times[RESPONSE_TIME_COLUMN.format('c3')]
+
+        testing = self.data_provider.testing
+        testing = testing[testing['countrycode'].isin(countries[panel['testing_available']])]
+        tests_per_rel_to = (testing['total_tests'] / panel['population'].reindex(testing['countrycode']).values) * \
+            rel_to_constant
+        panel['testing_response_time'] = self._days_between(
+            self._first_per_country(testing[tests_per_rel_to >= 10], 'date', countries), panel['t0_1_dead'])
+
+        # the response times to every flag are written alongside the results table, which keeps its columns
+        self.response_times.reset_index().to_csv(
+            os.path.join(self.config.data_path, 'table_of_response_times.csv'), index=False)
+
+        # for each wave we add characteristics
+        self.waves = self._get_waves(panel, peaks_and_troughs, series, epidemiology, stringency)
+        # the table of waves is stored in a columnar format if possible, which keeps the types of its columns
+        waves_file = os.path.join(self.config.data_path, 'table_of_waves')
+        waves_format = available_format(self.config.cache_format)
+        write_cache_file(self.waves, waves_file + CACHE_FORMATS[waves_format], waves_format)
+        epidemiology_panel = pd.concat([panel, wide_waves(self.waves, countries)], axis=1) \
+            .rename_axis('countrycode').reset_index()
         epidemiology_panel.to_csv(os.path.join(self.config.data_path, 'table_of_results.csv'), index=False)
         return epidemiology_panel
@@ -6,18 +6,23 @@ DESCRIPTION
     A Python package to identify waves in time series.
     ==================================================
 
-    wavefinder provides two classes and two associated plotting functions. WaveList implements an algorithm to
-    identify the waves in time series, which can be plotted using plot_peaks. It also implements an
+    wavefinder provides two classes, a parameter sweep and two associated plotting functions. WaveList implements an
+    algorithm to identify the waves in time series, which can be plotted using plot_peaks. It also implements an
     algorithm to impute additional waves from a reference WaveList object,
-    which plot_cross_validator plots.
+    which plot_cross_validator plots. WaveBatch runs the algorithm of WaveList on each of many time series and
+    returns their waves in a single DataFrame. sweep counts the waves in many time series over a grid of parameters.
 
 PACKAGE CONTENTS
     WaveList
+    WaveBatch
+    sweep
     plot_peaks
     plot_cross_validator
 """
 
 from wavefinder.wavelist import WaveList
+from wavefinder.wavebatch import WaveBatch
+from wavefinder.wavesweep import sweep
 from wavefinder.waveplotter import plot_peaks, plot_cross_validator
 
-__all__ = ['WaveList', 'plot_peaks', 'plot_cross_validator']
+__all__ = ['WaveList', 'WaveBatch', 'sweep', 'plot_peaks', 'plot_cross_validator']
@@ -7,69 +7,119 @@ DESCRIPTION
 
 FUNCTIONS
     run
+    run_extrema
+    to_frame
     delete_pairs
 """
 
+import heapq
+
 import numpy as np
 from pandas import DataFrame
 
+import wavefinder.utils.extrema as extrema_utils
 from wavefinder.utils.prominence_updater import ProminenceUpdater
+from wavefinder.utils.prominence_engine import ProminenceEngine
 
 
-def delete_pairs(data: DataFrame, t_sep_a: int) -> DataFrame:
-    """ Merges the least prominent wave in data which has duration < t_sep_a """
+def delete_pairs(engine: ProminenceEngine, i: int) -> set:
+    """ Merges the wave at node i of engine, returning the nodes whose prominence or duration may have changed """
 
-    if np.nanmin(data['duration']) < t_sep_a and len(data) >= 3:
-        # extract waves of low duration
-        df1 = data[data['duration'] < t_sep_a]
-        # extract those of least prominence
-        df2 = df1[df1['prominence'] == min(df1['prominence'])]
-        # find the shortest
-        i = df2.idxmin()['duration']
-        is_peak = data.loc[i, 'peak_ind'] - 0.5
-        data.drop(index=i, inplace=True)
-        # remove whichever adjacent candidate is a greater minimum, or a lesser maximum. If tied, remove the
-        # earlier.
-        if is_peak * (data.loc[i + 1, 'y_position'] - data.loc[i - 1, 'y_position']) >= 0:
-            data.drop(index=i + 1, inplace=True)
-        else:
-            data.drop(index=i - 1, inplace=True)
-    return data
+    is_peak = engine.peak_ind[i] - 0.5
+    prev_node, next_node = engine.prev[i], engine.next[i]
+    # remove whichever adjacent candidate is a greater minimum, or a lesser maximum. If tied, remove the
+    # earlier.
+    if is_peak * (engine.y_position[next_node] - engine.y_position[prev_node]) >= 0:
+        return engine.delete_pair(i, next_node)
+    else:
+        return engine.delete_pair(prev_node, i)
 
 
-def run(input_data_df: DataFrame, prominence_updater: ProminenceUpdater, t_sep_a: int) -> DataFrame:
+def _push(heap: list, engine: ProminenceEngine, i: int, t_sep_a: int, version: list):
+    """ Adds node i to the heap if its duration is less than t_sep_a, invalidating any earlier entry for i """
+    version[i] += 1
+    duration = engine.duration(i)
+    if duration < t_sep_a:
+        # among the waves of low duration, merge the least prominent, then the shortest, then the earliest
+        heapq.heappush(heap, (engine.prominence[i], duration, i, version[i]))
+
+
+def run_extrema(extrema: np.ndarray, prominence_updater: ProminenceUpdater, t_sep_a: int) -> np.ndarray:
     """
     Merges waves of duration less than t_sep_a until none remain.
 
     Parameters:
-        input_data_df (DataFrame): The list of peaks and troughs to be merged.
+        extrema (ndarray): The extrema array of peaks and troughs to be merged.
         prominence_updater (ProminenceUpdater): An object to recalculate prominence of peaks and troughs after each
         deletion.
         t_sep_a (int): Threshold specifying minimum wave duration.
 
     Returns:
-        run(input_data_df, prominence_updater, t_sep_a): The list of peaks and troughs after merging.
+        run_extrema(extrema, prominence_updater, t_sep_a): The extrema array of peaks and troughs after merging.
     """
 
-    df = input_data_df.copy()
     # if there are fewer than 3 points, the algorithm cannot be run, return list unchanged
-    if len(df) < 3:
-        return df
+    if len(extrema) < 3:
+        return extrema.copy()
 
-    else:
-        # calculate the duration of extremum i as the distance between the extrema to the left and to the right of i
-        df['duration'] = df['location'].diff(periods=1) - df['location'].diff(periods=-1)
+    # the extrema are held in a linked list, and only the prominences affected by each deletion are recalculated
+    engine = ProminenceEngine(extrema, prominence_updater)
+    version = [0] * len(engine.location)
+    heap = []
+    for i in engine.nodes():
+        _push(heap, engine, i, t_sep_a, version)
 
-    while np.nanmin(df['duration']) < t_sep_a and len(df) >= 3:
+    first_deletion = True
+    while heap:
+        prominence, duration, i, i_version = heapq.heappop(heap)
+        if not engine.alive[i] or i_version != version[i]:
+            continue
         # remove peaks and troughs until the smallest duration meets T_SEP
-        df = delete_pairs(df, t_sep_a)
-        # update prominence
-        df = prominence_updater.run(df)
-        # recalculate duration
-        if len(df) >= 3:
-            df['duration'] = df['location'].diff(periods=1) - df['location'].diff(periods=-1)
-        else:
+        affected = delete_pairs(engine, i)
+        if first_deletion:
+            # the initial prominences were calculated against raw_data, so bring them all into line once
+            first_deletion = False
+            affected = engine.recalculate_all()
+        if engine.size < 3:
             break
+        for j in affected:
+            _push(heap, engine, j, t_sep_a, version)
 
-    # df is a set of peaks and troughs which are at least a minimum distance apart
+    # the result is a set of peaks and troughs which are at least a minimum distance apart
+    return engine.to_extrema()
+
+
+def run(input_data_df: DataFrame, prominence_updater: ProminenceUpdater, t_sep_a: int) -> DataFrame:
+    """
+    Merges waves of duration less than t_sep_a until none remain.
+
+    Parameters:
+        input_data_df (DataFrame): The list of peaks and troughs to be merged.
+        prominence_updater (ProminenceUpdater): An object to recalculate prominence of peaks and troughs after each
+        deletion.
+        t_sep_a (int): Threshold specifying minimum wave duration.
+
+    Returns:
+        run(input_data_df, prominence_updater, t_sep_a): The list of peaks and troughs after merging.
+    """
+
+    extrema = run_extrema(extrema_utils.from_frame(input_data_df), prominence_updater, t_sep_a)
+    return to_frame(extrema)
+
+
+def to_frame(extrema: np.ndarray) -> DataFrame:
+    """
+    Converts the peaks and troughs after merging into a DataFrame, as for extrema.to_frame, with the column duration
+    holding the distance between the neighbours of each peak or trough if there are at least three of them.
+
+    Parameters:
+        extrema (ndarray): The extrema array of peaks and troughs after merging.
+
+    Returns:
+        to_frame(extrema): The list of peaks and troughs after merging.
+    """
+
+    df = extrema_utils.to_frame(extrema)
+    if len(df) >= 3:
+        df['duration'] = df['location'].diff(periods=1) - df['location'].diff(periods=-1)
     return df
@@ -7,76 +7,181 @@ DESCRIPTION
 
 FUNCTIONS
     run
+    run_extrema
 """
 
+import heapq
+
 import numpy as np
 from pandas import DataFrame, Series
+from scipy.signal import find_peaks
 
+import wavefinder.utils.extrema as extrema_utils
 from wavefinder.utils.prominence_updater import ProminenceUpdater
 
 
-def run(raw_data: Series, input_data_df: DataFrame,
-        prominence_updater: ProminenceUpdater, t_sep_a: int) -> DataFrame:
+def run_extrema(raw_data: Series, extrema: np.ndarray,
+                prominence_updater: ProminenceUpdater, t_sep_a: int) -> np.ndarray:
     """
     Identifies pairs of minima and maxima separated by less than t_sep_a/2 and merges them if they are transient
 
+    The pairs are merged in ascending order of vertical distance, and pairs with equal vertical distance in ascending
+    order of the location of their first member. This is the order in which the pairs were merged when they were
+    re-sorted by vertical distance after each merge with a stable sort.
+
     Parameters:
         raw_data (Series): The original data from which the peaks and troughs are identified
-        input_data_df (DataFrame): The list of peaks and troughs to be merged.
+        extrema (ndarray): The extrema array of peaks and troughs to be merged.
         prominence_updater (ProminenceUpdater): An object to recalculate prominence of peaks and troughs after each
         deletion.
         t_sep_a (int): Threshold specifying which features should be investigated.
 
     Returns:
-        run(raw_data, input_data_df, prominence_updater, t_sep_a): The list of peaks and troughs after merging.
+        run_extrema(raw_data, extrema, prominence_updater, t_sep_a): The extrema array of peaks and troughs after
+        merging.
     """
 
-    # flag will be dropped once no pair is found
-    sub_b_flag = True
-    # avoid overwriting sub_a when values replaced by t0 and t1
-    df = input_data_df.copy()
+    if len(extrema) < 2:
+        return prominence_updater.run_extrema(extrema)
+
+    # the peaks and troughs are held in a linked list between the two endpoints of the time series, so that sub_a is
+    # not overwritten when values are replaced by t0 and t1
+    data = np.concatenate([prominence_updater.endpoints[:1], extrema, prominence_updater.endpoints[1:]])
+    location = data['location'].tolist()
+    y_position = data['y_position'].tolist()
+    first, last = 0, len(location) - 1
+    prev_node = list(range(-1, last))
+    next_node = list(range(1, last + 2))
+    alive = [True] * len(location)
+    version = [0] * len(location)
+    size = len(extrema)
+
+    # heap of neighbouring pairs with separation S_i < t_sep_a / 2, in ascending order of vertical distance V_i
+    heap = []
+
+    def push_pair(i):
+        j = next_node[i]
+        if i == first or j == last:
+            return
+        if location[j] - location[i] < t_sep_a / 2:
+            heapq.heappush(heap, (abs(y_position[j] - y_position[i]), location[i], i, j, version[i], version[j]))
+
+    def unlink(i):
+        next_node[prev_node[i]] = next_node[i]
+        prev_node[next_node[i]] = prev_node[i]
+
+    def link_after(i, j):
+        # insert i immediately after j
+        prev_node[i], next_node[i] = j, next_node[j]
+        prev_node[next_node[j]] = i
+        next_node[j] = i
+
+    def walk(i, steps, pointers):
+        for _ in range(steps):
+            if pointers[i] in (-1, len(location)):
+                break
+            i = pointers[i]
+        return i
+
+    for i in range(first + 1, last):
+        push_pair(i)
+
     # dictionary to hold boundaries for peak-trough pairs too close to each other
     original_data = dict()
-    while sub_b_flag:
-        if len(df) < 2:
-            break
-        # separation here refers to temporal distance S_i
-        df.loc[0:len(df) - 2, 'separation'] = np.diff(df['location'])
-        # compute vertical distance V_i
-        df.loc[0:len(df) - 2, 'y_distance'] = [abs(x) for x in np.diff(df['y_position'])]
-        # sort in ascending order of height
-        df = df.sort_values(by='y_distance').reset_index(drop=False)
-        # set to false until we find an instance where S_i < t_sep_a / 2
-        sub_b_flag = False
-        for x in df.index:
-            if df.loc[x, 'separation'] < t_sep_a / 2:
-                sub_b_flag = True
-                i = df.loc[x, 'index']
-                # store the original locations and values to restore them at the end
-                original_t_0 = df.loc[df['index'] == i, 'location'].values[0]
-                original_t_1 = df.loc[df['index'] == i + 1, 'location'].values[0]
-                y_0 = df.loc[df['index'] == i, 'y_position'].values[0]
-                y_1 = df.loc[df['index'] == i + 1, 'y_position'].values[0]
-                # create boundaries t_0 and t_1 around the peak-trough pair
-                t_0 = max(np.floor((original_t_0 + original_t_1 - t_sep_a) / 2), 0)
-                t_1 = min(np.floor((original_t_0 + original_t_1 + t_sep_a) / 2), raw_data.index[-1])
-                # add original locations and value to dictionary
-                original_data[t_0] = {'location': original_t_0, 'y_position': y_0}
-                original_data[t_1] = {'location': original_t_1, 'y_position': y_1}
-                # reset the peak locations to the boundaries to be rechecked
-                df.loc[df['index'] == i, 'location'] = t_0
-                df.loc[df['index'] == i + 1, 'location'] = t_1
-                df.loc[df['index'] == i, 'y_position'] = raw_data.iloc[int(t_0)]
-                df.loc[df['index'] == i + 1, 'y_position'] = raw_data.values[int(t_1)]
-                # run the resulting peaks for a prominence check
-                df = prominence_updater.run(df)
-                break
+    full_update = True
+    while heap and size >= 2:
+        _, _, i, j, version_i, version_j = heapq.heappop(heap)
+        if not (alive[i] and alive[j] and next_node[i] == j and version[i] == version_i and version[j] == version_j):
+            continue
+        # store the original locations and values to restore them at the end
+        original_t_0, original_t_1 = location[i], location[j]
+        y_0, y_1 = y_position[i], y_position[j]
+        # create boundaries t_0 and t_1 around the peak-trough pair
+        t_0 = max(np.floor((original_t_0 + original_t_1 - t_sep_a) / 2), 0)
+        t_1 = min(np.floor((original_t_0 + original_t_1 + t_sep_a) / 2), raw_data.index[-1])
+        # add original locations and value to dictionary
+        original_data[t_0] = {'location': original_t_0, 'y_position': y_0}
+        original_data[t_1] = {'location': original_t_1, 'y_position': y_1}
+        # reset the peak locations to the boundaries to be rechecked, moving them outwards through the list
+        left, right = prev_node[i], next_node[j]
+        unlink(i)
+        unlink(j)
+        while left != first and location[left] > t_0:
+            left = prev_node[left]
+        link_after(i, left)
+        while right != last and location[right] < t_1:
+            right = next_node[right]
+        link_after(j, prev_node[right])
+        location[i], location[j] = t_0, t_1
+        y_position[i], y_position[j] = raw_data.iloc[int(t_0)], raw_data.values[int(t_1)]
+        version[i] += 1
+        version[j] += 1
+
+        # run the resulting peaks for a prominence check, dropping any which are no longer peaks or troughs.
+        # Away from the moved pair the list is unchanged and already alternates, so only the stretch around the
+        # pair needs to be rechecked after the first pass
+        if full_update:
+            window_start, window_end = first, last
+        else:
+            window_start, window_end = walk(i, 2, prev_node), walk(j, 2, next_node)
+        window = [window_start]
+        while window[-1] != window_end:
+            window.append(next_node[window[-1]])
+        window_values = np.array([y_position[k] for k in window], dtype=float)
+        kept = set(find_peaks(window_values, prominence=0, distance=1)[0]) | \
+               set(find_peaks(-window_values, prominence=0, distance=1)[0])
+        for position, k in enumerate(window[1:-1], start=1):
+            if position not in kept:
+                alive[k] = False
+                unlink(k)
+                size -= 1
+
+        if full_update:
+            heap = []
+            full_update = False
+        k = window_start
+        while k != window_end and k != last:
+            push_pair(k)
+            k = next_node[k]
+
+    if not original_data:
+        # recalculate prominence
+        return prominence_updater.run_extrema(extrema)
+
+    nodes = []
+    k = next_node[first]
+    while k != last:
+        nodes.append(k)
+        k = next_node[k]
+    result = data[nodes]
+    result['location'] = [location[k] for k in nodes]
+    result['y_position'] = [y_position[k] for k in nodes]
 
     # restore old locations and heights
     for key, val in original_data.items():
-        df.loc[df['location'] == key, ['y_position', 'location']] = [val['y_position'], val['location']]
+        restore = result['location'] == key
+        result['y_position'][restore] = val['y_position']
+        result['location'][restore] = val['location']
 
     # recalculate prominence
-    df = prominence_updater.run(df)
+    return prominence_updater.run_extrema(result)
+
+
+def run(raw_data: Series, input_data_df: DataFrame,
+        prominence_updater: ProminenceUpdater, t_sep_a: int) -> DataFrame:
+    """
+    Identifies pairs of minima and maxima separated by less than t_sep_a/2 and merges them if they are transient
+
+    Parameters:
+        raw_data (Series): The original data from which the peaks and troughs are identified
+        input_data_df (DataFrame): The list of peaks and troughs to be merged.
+        prominence_updater (ProminenceUpdater): An object to recalculate prominence of peaks and troughs after each
+        deletion.
+        t_sep_a (int): Threshold specifying which features should be investigated.
+
+    Returns:
+        run(raw_data, input_data_df, prominence_updater, t_sep_a): The list of peaks and troughs after merging.
+    """
 
-    return df
+    extrema = run_extrema(raw_data, extrema_utils.from_frame(input_data_df), prominence_updater, t_sep_a)
+    return extrema_utils.to_frame(extrema)
@@ -0,0 +1,61 @@
+"""
+NAME
+    algorithm_e
+
+DESCRIPTION
+    This module provides Sub-Algorithm E to WaveList in order to impute additional waves from a reference series.
+
+FUNCTIONS
+    run_extrema
+"""
+
+import numpy as np
+from pandas import Series
+
+import wavefinder.utils.trough_finder as trough_finder
+
+
+def run_extrema(raw_data: Series, input_sub_b: np.ndarray, input_sub_c: np.ndarray, reference_sub_c: np.ndarray,
+                prominence_threshold: float, proportional_prominence_threshold: float) -> np.ndarray:
+    """
+    Imputes the presence of additional waves in a series from the waves in a reference series.
+
+    Parameters:
+        raw_data (Series): The original data from which the peaks and troughs are identified
+        input_sub_b (ndarray): The extrema array after Sub-Algorithm B for raw_data, from which peaks may be recovered.
+        input_sub_c (ndarray): The extrema array after Sub-Algorithms C and D for raw_data.
+        reference_sub_c (ndarray): The extrema array after Sub-Algorithms C and D for the reference series.
+        prominence_threshold (float): The minimum prominence which a wave must have.
+        proportional_prominence_threshold (float): The minimum prominence which a peak must have, as a ratio of the
+        value at the peak.
+
+    Returns:
+        run_extrema(raw_data, input_sub_b, input_sub_c, reference_sub_c, prominence_threshold,
+        proportional_prominence_threshold): The extrema array of peaks and troughs after cross-validation.
+    """
+
+    reference_peaks = reference_sub_c['location'][reference_sub_c['peak_ind'] == 1]
+    reference_troughs = reference_sub_c['location'][reference_sub_c['peak_ind'] == 0]
+
+    input_peaks = input_sub_c['location'][input_sub_c['peak_ind'] == 1]
+    sub_b_peaks = input_sub_b[input_sub_b['peak_ind'] == 1]
+    results = [input_sub_c[input_sub_c['peak_ind'] == 1]]
+
+    # iterate through the waves in the reference time series
+    for i in range(len(reference_peaks)):
+        # identify the start and end of the wave
+        window_start = reference_troughs[i - 1] if i > 0 else 0
+        window_end = reference_troughs[i] if i < len(reference_troughs) else raw_data.index[-1]
+        # check if a peak in the first series already exists during the wave - if it does then continue
+        if np.any((input_peaks >= window_start) & (input_peaks <= window_end)):
+            continue
+        # if there is peak in input_sub_b during the wave, use the highest one
+        candidates = sub_b_peaks[(sub_b_peaks['location'] >= window_start) &
+                                 (sub_b_peaks['location'] <= window_end)]
+        if len(candidates) > 0:
+            results.append(candidates[[np.argmax(candidates['y_position'])]])
+
+    # next add back any troughs between peaks
+    result_troughs = input_sub_b[input_sub_b['peak_ind'] == 0]
+    return trough_finder.run_extrema(np.concatenate(results), result_troughs, raw_data, prominence_threshold,
+                                     proportional_prominence_threshold)
@@ -7,6 +7,7 @@ DESCRIPTION
 
 FUNCTIONS
     run
+    find_extrema
     init_peaks_and_troughs
 """
 
@@ -14,9 +15,34 @@ import numpy as np
 from pandas import Series, DataFrame
 from scipy.signal import find_peaks
 
+import wavefinder.utils.extrema as extrema_utils
 from wavefinder.utils.prominence_updater import ProminenceUpdater
 
 
+def find_extrema(data: Series) -> np.ndarray:
+    """
+    Identifies an initial list of peaks and troughs using scipy.signal.find_peaks.
+
+    Parameters:
+        data (Series): The original data from which the peaks and troughs are to be identified.
+
+    Returns:
+        find_extrema(data): An extrema array of all peaks and troughs in data, with their location, prominence and
+        value.
+    """
+
+    values = data.values.astype(np.float64)
+    peak = find_peaks(values, prominence=0, distance=1)
+    trough = find_peaks(-values, prominence=0, distance=1)
+
+    # collect into a single array
+    extrema = extrema_utils.make(np.append(data.index[peak[0]], data.index[trough[0]]),
+                                 np.append(peak[1]['prominences'], trough[1]['prominences']),
+                                 np.append(values[peak[0]], values[trough[0]]),
+                                 np.append([1] * len(peak[0]), [0] * len(trough[0])))
+    return extrema_utils.sort(extrema)
+
+
 def init_peaks_and_troughs(data: Series) -> DataFrame:
     """
     Identifies an initial list of peaks and troughs using scipy.signal.find_peaks.
@@ -29,20 +55,10 @@ def init_peaks_and_troughs(data: Series) -> DataFrame:
         value.
     """
 
-    peak = find_peaks(data.values, prominence=0, distance=1)
-    trough = find_peaks([-x for x in data.values], prominence=0, distance=1)
-
-    # collect into a single dataframe
-    df = DataFrame(data=np.transpose([np.append(data.index[peak[0]], data.index[trough[0]]),
-                                      np.append(peak[1]['prominences'], trough[1]['prominences'])]),
-                   columns=['location', 'prominence'])
-    df['peak_ind'] = np.append([1] * len(peak[0]), [0] * len(trough[0]))
-    df.loc[:, 'y_position'] = data[df['location']].values
-    df = df.sort_values(by='location').reset_index(drop=True)
-    return df
+    return extrema_utils.to_frame(find_extrema(data))
 
 
-def run(data) -> (DataFrame, ProminenceUpdater):
+def run(data: Series) -> (np.ndarray, ProminenceUpdater):
     """
     Identifies the peaks and troughs and initialises the ProminenceUpdater.
 
@@ -50,11 +66,11 @@ def run(data) -> (DataFrame, ProminenceUpdater):
         data (Series): The original data from which the peaks and troughs are to be identified.
 
     Returns:
-        run(data): A tuple made up of the DataFrame of peaks and troughs and the ProminenceUpdater for data.
+        run(data): A tuple made up of the extrema array of peaks and troughs and the ProminenceUpdater for data.
     """
 
     if len(data) == 0:
-        return data, None, None
-    pre_algo = init_peaks_and_troughs(data)
+        return extrema_utils.empty(), None
+    pre_algo = find_extrema(data)
     prominence_updater = ProminenceUpdater(data)
     return pre_algo, prominence_updater
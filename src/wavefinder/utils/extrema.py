@@ -0,0 +1,66 @@
+"""
+NAME
+    extrema
+
+DESCRIPTION
+    This module provides the array representation of a list of peaks and troughs which is passed between the
+    Sub-Algorithms, along with conversions to and from the DataFrames exposed by WaveList.
+
+    A list of peaks and troughs is a NumPy structured array with the fields location, prominence, y_position and
+    peak_ind, sorted by location.
+
+FUNCTIONS
+    empty
+    make
+    sort
+    from_frame
+    to_frame
+"""
+
+import numpy as np
+from pandas import DataFrame
+
+EXTREMA_DTYPE = np.dtype([('location', np.float64),
+                          ('prominence', np.float64),
+                          ('y_position', np.float64),
+                          ('peak_ind', np.int64)])
+
+COLUMNS = list(EXTREMA_DTYPE.names)
+
+
+def empty(n: int = 0) -> np.ndarray:
+    """ Creates a list of n peaks and troughs with nan prominence """
+    extrema = np.zeros(n, dtype=EXTREMA_DTYPE)
+    extrema['prominence'] = np.nan
+    return extrema
+
+
+def make(location, prominence, y_position, peak_ind) -> np.ndarray:
+    """ Creates a list of peaks and troughs from its fields, which may be arrays or scalars """
+    location = np.atleast_1d(np.asarray(location, dtype=np.float64))
+    extrema = empty(len(location))
+    extrema['location'] = location
+    extrema['prominence'] = prominence
+    extrema['y_position'] = y_position
+    extrema['peak_ind'] = peak_ind
+    return extrema
+
+
+def sort(extrema: np.ndarray) -> np.ndarray:
+    """ Sorts a list of peaks and troughs by location """
+    return extrema[np.argsort(extrema['location'], kind='stable')]
+
+
+def from_frame(df: DataFrame) -> np.ndarray:
+    """ Converts a DataFrame of peaks and troughs, as held by WaveList, into an array sorted by location """
+    extrema = empty(len(df))
+    for column in COLUMNS:
+        if column in df.columns:
+            # rows without a peak_ind are treated as troughs
+            extrema[column] = df[column].fillna(0).values if column == 'peak_ind' else df[column].values
+    return sort(extrema)
+
+
+def to_frame(extrema: np.ndarray) -> DataFrame:
+    """ Converts an array of peaks and troughs into a DataFrame with a RangeIndex """
+    return DataFrame({column: extrema[column] for column in COLUMNS})
@@ -0,0 +1,277 @@
+"""
+NAME
+    prominence_engine
+
+DESCRIPTION
+    This module provides the ProminenceEngine, which maintains the prominence of a list of alternating peaks and
+    troughs as pairs of them are deleted, without recalculating the prominence of the entire list.
+
+CLASSES
+    ProminenceEngine
+"""
+
+import numpy as np
+
+import wavefinder.utils.extrema as extrema_utils
+from wavefinder.utils.prominence_updater import ProminenceUpdater
+
+
+class _SegmentTree:
+    """ A segment tree over a fixed number of positions, aggregating values with min or max. """
+
+    def __init__(self, values: list, op, identity: float):
+        self.n = len(values)
+        self.op = op
+        self.identity = identity
+        self.size = 1
+        while self.size < max(self.n, 1):
+            self.size *= 2
+        self.tree = [identity] * (2 * self.size)
+        self.tree[self.size:self.size + self.n] = values
+        for node in range(self.size - 1, 0, -1):
+            self.tree[node] = op(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def update(self, i: int, value: float):
+        """ Sets the value at position i """
+        tree, op = self.tree, self.op
+        node = i + self.size
+        tree[node] = value
+        node //= 2
+        while node:
+            tree[node] = op(tree[2 * node], tree[2 * node + 1])
+            node //= 2
+
+    def query(self, left: int, right: int) -> float:
+        """ Aggregates the values at positions left to right inclusive """
+        tree, op = self.tree, self.op
+        result = self.identity
+        left += self.size
+        right += self.size + 1
+        while left < right:
+            if left & 1:
+                result = op(result, tree[left])
+                left += 1
+            if right & 1:
+                right -= 1
+                result = op(result, tree[right])
+            left //= 2
+            right //= 2
+        return result
+
+    def find_prev(self, i: int, predicate) -> int:
+        """
+        Returns the largest position below i whose value satisfies predicate, or -1. The predicate must hold for
+        an aggregate whenever it holds for one of the values aggregated.
+        """
+        if i <= 0:
+            return -1
+        tree = self.tree
+        node = i + self.size
+        while True:
+            node -= 1
+            while node > 1 and node & 1:
+                node //= 2
+            if predicate(tree[node]):
+                while node < self.size:
+                    node = 2 * node + 1
+                    if not predicate(tree[node]):
+                        node -= 1
+                return node - self.size
+            if node & (node - 1) == 0:
+                return -1
+
+    def find_next(self, i: int, predicate) -> int:
+        """ Returns the smallest position above i whose value satisfies predicate, or n """
+        if i + 1 >= self.n:
+            return self.n
+        tree = self.tree
+        node = i + 1 + self.size
+        while True:
+            while node % 2 == 0:
+                node //= 2
+            if predicate(tree[node]):
+                while node < self.size:
+                    node = 2 * node
+                    if not predicate(tree[node]):
+                        node += 1
+                return node - self.size
+            node += 1
+            if node & (node - 1) == 0:
+                return self.n
+
+
+class ProminenceEngine:
+    """
+    NAME
+        ProminenceEngine
+
+    DESCRIPTION
+        A ProminenceEngine object holds a list of alternating peaks and troughs, bounded by the endpoints of the time
+        series, as a doubly linked list. When a peak and an adjacent trough are deleted, only the extrema whose
+        prominence window reaches the deleted pair are recalculated, using segment trees over the list. The prominences
+        agree with those calculated by ProminenceUpdater.run on the remaining peaks and troughs.
+
+    ATTRIBUTES
+        location (Lst): The location of each node, with the endpoints as the first and last nodes.
+        y_position (Lst): The value of each node.
+        peak_ind (Lst): 1 for a peak, 0 for a trough and -1 for an endpoint.
+        prominence (Lst): The current prominence of each peak and trough.
+        prev (Lst): The previous remaining node for each node.
+        next (Lst): The next remaining node for each node.
+        alive (Lst): Whether each node remains in the list.
+
+    METHODS
+        __init__: Builds the linked list and segment trees from a list of peaks and troughs.
+        calculate_prominence: Calculates the prominence of a single node from the remaining nodes.
+        delete_pair: Deletes two adjacent nodes and updates the prominence of the affected extrema.
+        duration: The distance between the neighbours of a node.
+        nodes: The remaining peaks and troughs in order of location.
+        to_extrema: Formats the remaining peaks and troughs as an extrema array.
+    """
+
+    def __init__(self, extrema: np.ndarray, prominence_updater: ProminenceUpdater):
+        """
+        Builds the linked list from an extrema array, which must be sorted by location, with the endpoints taken from
+        prominence_updater.
+        """
+        data = np.concatenate([prominence_updater.endpoints[:1], extrema, prominence_updater.endpoints[1:]])
+        self.location = data['location'].tolist()
+        self.y_position = data['y_position'].tolist()
+        self.peak_ind = data['peak_ind'].tolist()
+        self.prominence = data['prominence'].tolist()
+
+        n = len(self.location)
+        self.first = 0
+        self.last = n - 1
+        self.prev = list(range(-1, n - 1))
+        self.next = list(range(1, n + 1))
+        self.alive = [True] * n
+        self.size = n - 2
+        # the extreme values either side of each node found when its prominence was last calculated
+        self._bases = [(np.inf, np.inf) if peak_ind == 1 else (-np.inf, -np.inf) for peak_ind in self.peak_ind]
+
+        y = self.y_position
+        self._max_tree = _SegmentTree(y, max, -np.inf)
+        self._min_tree = _SegmentTree(y, min, np.inf)
+        self._peak_tree = _SegmentTree([y[i] if self.peak_ind[i] == 1 else -np.inf for i in range(n)],
+                                       max, -np.inf)
+        self._trough_tree = _SegmentTree([y[i] if self.peak_ind[i] == 0 else np.inf for i in range(n)],
+                                         min, np.inf)
+
+    def nodes(self) -> list:
+        """ The remaining peaks and troughs in order of location """
+        result = []
+        node = self.next[self.first]
+        while node != self.last:
+            result.append(node)
+            node = self.next[node]
+        return result
+
+    def duration(self, node: int) -> float:
+        """ The distance between the neighbours of node, or nan if either neighbour is an endpoint """
+        prev_node, next_node = self.prev[node], self.next[node]
+        if prev_node == self.first or next_node == self.last:
+            return np.nan
+        location = self.location[node]
+        return (location - self.location[prev_node]) - (location - self.location[next_node])
+
+    def calculate_prominence(self, node: int) -> float:
+        """ Calculates the prominence of node in the same way as scipy.signal.find_peaks on the remaining nodes """
+        y = self.y_position[node]
+        if self.peak_ind[node] == 1:
+            left = self._max_tree.find_prev(node, lambda v: v > y)
+            right = self._max_tree.find_next(node, lambda v: v > y)
+            left_min = self._min_tree.query(left + 1, node)
+            right_min = self._min_tree.query(node, right - 1)
+            self._bases[node] = (left_min, right_min)
+            return y - max(left_min, right_min)
+        left = self._min_tree.find_prev(node, lambda v: v < y)
+        right = self._min_tree.find_next(node, lambda v: v < y)
+        left_max = self._max_tree.query(left + 1, node)
+        right_max = self._max_tree.query(node, right - 1)
+        self._bases[node] = (left_max, right_max)
+        return min(left_max, right_max) - y
+
+    def recalculate_all(self) -> list:
+        """ Recalculates the prominence of every remaining peak and trough and returns them """
+        nodes = self.nodes()
+        for node in nodes:
+            self.prominence[node] = self.calculate_prominence(node)
+        return nodes
+
+    def _remove(self, node: int):
+        self.alive[node] = False
+        self.size -= 1
+        prev_node, next_node = self.prev[node], self.next[node]
+        self.next[prev_node] = next_node
+        self.prev[next_node] = prev_node
+        self._max_tree.update(node, -np.inf)
+        self._min_tree.update(node, np.inf)
+        self._peak_tree.update(node, -np.inf)
+        self._trough_tree.update(node, np.inf)
+
+    def _affected(self, left: int, right: int) -> list:
+        """
+        Finds the extrema whose prominence window reaches the gap between left and right. Walking outwards from the
+        gap, these are the peaks at least as high as any peak passed, and the troughs at least as low as any trough
+        passed. Returns a list of the extrema, with 1 for those to the left of the gap and 0 for those to the right.
+        """
+        affected = []
+        searches = ((self._peak_tree, lambda v, record: -np.inf < v >= record, -np.inf),
+                    (self._trough_tree, lambda v, record: np.inf > v <= record, np.inf))
+        for tree, is_record, initial in searches:
+            record = initial
+            node = left + 1
+            while True:
+                node = tree.find_prev(node, lambda v: is_record(v, record))
+                if node == -1:
+                    break
+                affected.append((node, 1))
+                record = self.y_position[node]
+            record = initial
+            node = right - 1
+            while True:
+                node = tree.find_next(node, lambda v: is_record(v, record))
+                if node == tree.n:
+                    break
+                affected.append((node, 0))
+                record = self.y_position[node]
+        return affected
+
+    def delete_pair(self, node_1: int, node_2: int) -> set:
+        """
+        Deletes two adjacent nodes and recalculates the prominence of the affected peaks and troughs.
+
+        Parameters:
+            node_1 (int): The earlier of the two nodes.
+            node_2 (int): The later of the two nodes, which must follow node_1.
+
+        Returns:
+            delete_pair(node_1, node_2): The set of nodes whose prominence or duration may have changed.
+        """
+        left, right = self.prev[node_1], self.next[node_2]
+        deleted_max = max(self.y_position[node_1], self.y_position[node_2])
+        deleted_min = min(self.y_position[node_1], self.y_position[node_2])
+        self._remove(node_1)
+        self._remove(node_2)
+        changed = set()
+        for node, side in self._affected(left, right):
+            y = self.y_position[node]
+            base = self._bases[node][side]
+            # the prominence is unchanged unless the deleted pair bounded the window or held its extreme value
+            if self.peak_ind[node] == 1:
+                stale = deleted_max > y or deleted_min <= base
+            else:
+                stale = deleted_min < y or deleted_max >= base
+            if stale:
+                self.prominence[node] = self.calculate_prominence(node)
+                changed.add(node)
+        # the durations of the nodes either side of the gap have also changed
+        changed.update(node for node in (left, right) if node not in (self.first, self.last))
+        return changed
+
+    def to_extrema(self) -> np.ndarray:
+        """ Formats the remaining peaks and troughs in the same way as ProminenceUpdater.run_extrema """
+        nodes = self.nodes()
+        return extrema_utils.make([self.location[i] for i in nodes], [self.prominence[i] for i in nodes],
+                                  [self.y_position[i] for i in nodes], [self.peak_ind[i] for i in nodes])
@@ -8,10 +8,94 @@ DESCRIPTION
 
 FUNCTIONS
     run
+    run_extrema
 """
 
+import numpy as np
 from pandas import DataFrame, Series
 
+import wavefinder.utils.extrema as extrema_utils
+
+
+def _segment_argmin(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Finds the position of the first minimum of values in each non-empty segment [starts[i], ends[i]).
+
+    Each value is replaced by its rank in a stable sort, so that the ranks are unique and the smallest rank in a
+    segment identifies its earliest minimum. The minimum rank of every segment is then found in one call to
+    np.minimum.reduceat.
+    """
+    if len(starts) == 0:
+        return np.empty(0, dtype=np.int64)
+    order = np.argsort(values, kind='stable')
+    ranks = np.empty(len(values) + 1, dtype=np.int64)
+    ranks[order] = np.arange(len(values))
+    # sentinel so that a segment may end at the last value
+    ranks[-1] = len(values)
+    boundaries = np.column_stack([starts, ends]).ravel()
+    return order[np.minimum.reduceat(ranks, boundaries)[::2]]
+
+
+def run_extrema(peak_list: np.ndarray, trough_list: np.ndarray, raw_data: Series, prominence_threshold: float,
+                prominence_height_threshold: float) -> np.ndarray:
+    """
+    Locates the deepest troughs in raw_data between and possibly after the peaks in peak_list from candidates in
+    trough_list.
+
+    Parameters:
+        peak_list (ndarray): The extrema array of peaks in the time series.
+        trough_list (ndarray): An extrema array of troughs in the time series, one of which is to be retained between
+        each consecutive pair of peaks.
+        raw_data (Series): The time series
+        prominence_threshold (float): The minimum prominence which a wave must have. Used for adding a final trough.
+        proportional_prominence_threshold (float): The minimum prominence which a peak must have, as a ratio of the
+        value at the peak. Used for adding a final trough.
+
+    Returns:
+        run_extrema(peak_list, trough_list, raw_data, prominence_threshold, proportional_prominence_threshold): An
+        extrema array containing the final list of peaks and troughs.
+    """
+
+    peak_list = extrema_utils.sort(peak_list)
+    trough_list = extrema_utils.sort(trough_list)
+    trough_locations = trough_list['location']
+    trough_values = trough_list['y_position']
+    raw_values = raw_data.values.astype(np.float64)
+
+    # the candidate troughs between each consecutive pair of peaks form a contiguous slice of trough_list
+    wave_starts = peak_list['location'][:-1].astype(np.int64)
+    wave_ends = peak_list['location'][1:].astype(np.int64)
+    first_candidate = np.searchsorted(trough_locations, wave_starts, side='left')
+    last_candidate = np.searchsorted(trough_locations, wave_ends, side='right')
+    has_candidate = last_candidate > first_candidate
+
+    # retain the deepest candidate trough in each wave
+    troughs = trough_list[_segment_argmin(trough_values, first_candidate[has_candidate],
+                                          last_candidate[has_candidate])]
+    # where there are no candidates, fall back to the minimum of raw_data between the peaks
+    fallback_starts, fallback_ends = wave_starts[~has_candidate], wave_ends[~has_candidate]
+    fallback_locations = _segment_argmin(raw_values, fallback_starts, fallback_ends)
+    fallback_troughs = extrema_utils.make(fallback_locations, np.nan, raw_values[fallback_locations], 0)
+
+    results = extrema_utils.sort(np.concatenate([peak_list, troughs, fallback_troughs]))
+
+    # add final trough after final peak
+    if len(peak_list) > 0:
+        first_candidate = np.searchsorted(trough_locations, peak_list['location'][-1], side='left')
+        if first_candidate < len(trough_list):
+            candidate_trough = trough_list[_segment_argmin(trough_values, np.array([first_candidate]),
+                                                           np.array([len(trough_list)]))]
+            trough_value = candidate_trough['y_position'][0]
+            final_peak = peak_list['y_position'][-1]
+            final_maximum = np.max(raw_values[raw_data.index.values > candidate_trough['location'][0]])
+            if (trough_value <= (1 - prominence_height_threshold) * final_peak) and (
+                    final_peak - trough_value >= prominence_threshold):
+                if (trough_value <= (1 - prominence_height_threshold) * final_maximum) and (
+                        final_maximum - trough_value >= prominence_threshold):
+                    results = np.concatenate([results, candidate_trough])
+
+    return results
+
 
 def run(peak_list: DataFrame, trough_list: DataFrame, raw_data: Series, prominence_threshold: float,
         prominence_height_threshold: float) -> DataFrame:
@@ -33,36 +117,6 @@ def run(peak_list: DataFrame, trough_list: DataFrame, raw_data: Series, prominen
         containing the final list of peaks and troughs.
     """
 
-    peak_list = peak_list.sort_values(by='location').reset_index(drop=True)
-    results = peak_list
-    for i in peak_list.index:
-        if i < max(peak_list.index):
-            wave_start = int(peak_list.loc[i, 'location'])
-            wave_end = int(peak_list.loc[i + 1, 'location'])
-            candidate_troughs = trough_list[(trough_list['location'] >= wave_start) &
-                                            (trough_list['location'] <= wave_end)]
-            if len(candidate_troughs) > 0:
-                candidate_troughs = candidate_troughs.loc[candidate_troughs.idxmin()['y_position']]
-                results = results.append(candidate_troughs, ignore_index=True)
-            else:
-                trough_idx = raw_data.iloc[wave_start:wave_end].idxmin()['y_position']
-                candidate_troughs = DataFrame([[trough_idx], [raw_data.iloc[trough_idx]]],
-                                              columns=['location', 'y_position'])
-                results = results.append(candidate_troughs, ignore_index=True)
-    results = results.sort_values(by='location').reset_index(drop=True)
-
-    # add final trough after final peak
-    if len(peak_list) > 0:
-        candidate_troughs = trough_list[trough_list.location >= peak_list.location.iloc[-1]]
-        if len(candidate_troughs) > 0:
-            candidate_troughs = candidate_troughs.loc[candidate_troughs.idxmin()['y_position']]
-            final_maximum = max(raw_data[(raw_data.index > candidate_troughs.location)])
-            if (candidate_troughs.y_position <= (1 - prominence_height_threshold) *
-                peak_list.y_position.iloc[-1]) and (
-                    peak_list.y_position.iloc[-1] - candidate_troughs.y_position >= prominence_threshold):
-                if (candidate_troughs.y_position <= (
-                        1 - prominence_height_threshold) * final_maximum) and (
-                        final_maximum - candidate_troughs.y_position >= prominence_threshold):
-                    results = results.append(candidate_troughs, ignore_index=True)
-
-    return results
+    results = run_extrema(extrema_utils.from_frame(peak_list), extrema_utils.from_frame(trough_list), raw_data,
+                          prominence_threshold, prominence_height_threshold)
+    return extrema_utils.to_frame(results)
@@ -0,0 +1,206 @@
+from __future__ import annotations
+from collections.abc import Mapping
+from pandas import DataFrame, Index, Series
+import numpy as np
+
+import wavefinder.subalgorithms.algorithm_e as algorithm_e
+import wavefinder.utils.extrema as extrema_utils
+from wavefinder.wavelist import run_extrema
+
+
+class WaveBatch:
+    """
+    NAME
+        WaveBatch
+
+    DESCRIPTION
+        A WaveBatch object runs the algorithm of WaveList on each of many time series in turn, each with its own
+        parameters, and holds the peaks and troughs of every series in a single columnar DataFrame. No WaveList object
+        or intermediate DataFrame is built for the individual series.
+
+    ATTRIBUTES
+        keys (list): The key identifying each series, in the order the series were given.
+        key_name (str): The name of the column holding the keys in the DataFrames below.
+        raw_data (list): The time series, each a Series with a RangeIndex.
+        t_sep_a (ndarray): Threshold specifying minimum wave duration, for each series.
+        prominence_threshold (ndarray): The minimum prominence which a wave must have, for each series.
+        prominence_height_threshold (ndarray): The minimum prominence which a peak must have, as a ratio of the value
+        at the peak, for each series.
+        extrema_initial (list): The extrema arrays of peaks and troughs in each series.
+        extrema_sub_a (list): The extrema arrays after Sub-Algorithm A.
+        extrema_sub_b (list): The extrema arrays after Sub-Algorithm B.
+        extrema_sub_c (list): The extrema arrays after Sub-Algorithms C and D.
+        extrema_cross_validated (list): The extrema arrays after cross-validation, None for series which have not been
+        cross-validated.
+
+    PROPERTIES
+        peaks_initial (DataFrame): The peaks and troughs in every series.
+        peaks_sub_a (DataFrame): The peaks and troughs in every series after Sub-Algorithm A.
+        peaks_sub_b (DataFrame): The peaks and troughs in every series after Sub-Algorithm B.
+        peaks_sub_c (DataFrame): The peaks and troughs in every series after Sub-Algorithms C and D.
+        waves (DataFrame): For each series, the peaks and troughs after cross-validation if calculated, else after
+        Sub-Algorithms C and D.
+            Index: RangeIndex
+            Columns:
+                key_name: The key of the series.
+                location, prominence, y_position, peak_ind: As in WaveList.waves.
+
+    METHODS
+        __init__: After setting the parameters, this runs the algorithm on every series.
+        from_frame: Creates a WaveBatch from a long-format DataFrame.
+        cross_validate: Imputes the presence of additional waves in each series from the series with the same key in a
+        reference WaveBatch.
+    """
+
+    def __init__(self, series: list, keys: list = None, t_sep_a=None, prominence_threshold=None,
+                 prominence_height_threshold=None, key_name: str = 'series'):
+        """
+        Creates the WaveBatch object and runs the algorithm on every series
+
+        Parameters:
+            series (list): The time series, each a Series with a RangeIndex or a one-dimensional array.
+            keys (list): The key identifying each series. Defaults to the position of the series in series.
+            t_sep_a (int, list or Mapping): Threshold specifying minimum wave duration.
+            prominence_threshold (float, list or Mapping): The minimum prominence which a wave must have.
+            prominence_height_threshold (float, list or Mapping): The minimum prominence which a peak must have, as a
+            ratio of the value at the peak.
+            key_name (str): The name of the column holding the keys in the results.
+
+        Each parameter may be given as a single value for all of the series, a list with a value for each series, or
+        a Mapping from key to value.
+        """
+
+        self.keys = list(range(len(series))) if keys is None else list(keys)
+        if len(self.keys) != len(series):
+            raise ValueError('keys must have the same length as series')
+        self.key_name = key_name
+        self.raw_data = [data if isinstance(data, Series) else Series(np.asarray(data, dtype=np.float64))
+                         for data in series]
+
+        # configuration parameters
+        self.t_sep_a = self._broadcast(t_sep_a, 't_sep_a')
+        self.prominence_threshold = self._broadcast(prominence_threshold, 'prominence_threshold')
+        self.prominence_height_threshold = self._broadcast(prominence_height_threshold, 'prominence_height_threshold')
+
+        self.extrema_initial, self.extrema_sub_a, self.extrema_sub_b, self.extrema_sub_c = [], [], [], []
+        for i, data in enumerate(self.raw_data):
+            stages = run_extrema(data, self.t_sep_a[i], self.prominence_threshold[i],
+                                 self.prominence_height_threshold[i])
+            for stage, extrema in zip(['initial', 'sub_a', 'sub_b', 'sub_c'], stages):
+                getattr(self, 'extrema_' + stage).append(extrema)
+        self.extrema_cross_validated = [None] * len(self.keys)
+
+    @classmethod
+    def from_frame(cls, df: DataFrame, value: str, by: str, t_sep_a=None, prominence_threshold=None,
+                   prominence_height_threshold=None, order_by: str = None) -> WaveBatch:
+        """
+        Creates a WaveBatch from a long-format DataFrame with one row for each observation of each series
+
+        Parameters:
+            df (DataFrame): The observations.
+            value (str): The column of df holding the values of the series. Missing values are dropped, as in
+            DataProvider.get_series.
+            by (str): The column of df holding the key of each series. The series are kept in order of appearance.
+            t_sep_a, prominence_threshold, prominence_height_threshold: As for __init__, or the name of a column of df
+            holding the value for each series.
+            order_by (str): The column of df by which the observations in each series are ordered, e.g. 'date'. If
+            None, the observations are taken in the order of df.
+
+        Returns:
+            from_frame(df, value, by, t_sep_a, prominence_threshold, prominence_height_threshold, order_by): The
+            WaveBatch of the series in df.
+        """
+
+        if order_by is not None:
+            df = df.sort_values([order_by], kind='stable')
+        df = df[df[value].notna()]
+        groups = df.groupby(by, sort=False)
+        series = [(key, group.reset_index(drop=True)) for key, group in groups[value]]
+        keys = [key for key, _ in series]
+
+        def per_series(parameter):
+            if isinstance(parameter, str) and parameter in df.columns:
+                return groups[parameter].first().reindex(keys).values
+            return parameter
+
+        return cls([group for _, group in series], keys,
+                   t_sep_a=per_series(t_sep_a),
+                   prominence_threshold=per_series(prominence_threshold),
+                   prominence_height_threshold=per_series(prominence_height_threshold),
+                   key_name=by)
+
+    def _broadcast(self, parameter, name: str) -> np.ndarray:
+        """ Expands a parameter given as a single value, a list or a Mapping into an array with a value per series """
+        if parameter is None:
+            raise ValueError(f'{name} must be set')
+        if isinstance(parameter, Mapping):
+            return np.array([parameter[key] for key in self.keys])
+        if isinstance(parameter, str):
+            # from_frame has already replaced the names of columns by their values
+            raise ValueError(f'{name} is the string {parameter!r}, which is not a column')
+        if np.ndim(parameter) == 0:
+            return np.full(len(self.keys), parameter)
+        parameter = np.asarray(parameter)
+        if len(parameter) != len(self.keys):
+            raise ValueError(f'{name} must have a value for each series')
+        return parameter
+
+    def _frame(self, extrema_list: list) -> DataFrame:
+        """ Concatenates extrema arrays into a single DataFrame with a column holding the key of each series """
+        extrema = np.concatenate([extrema_utils.empty()] + extrema_list)
+        results = extrema_utils.to_frame(extrema)
+        results.insert(0, self.key_name, Index(self.keys).repeat([len(e) for e in extrema_list]))
+        return results
+
+    @property
+    def peaks_initial(self) -> DataFrame:
+        """ The peaks and troughs in every series """
+        return self._frame(self.extrema_initial)
+
+    @property
+    def peaks_sub_a(self) -> DataFrame:
+        """ The peaks and troughs in every series after Sub-Algorithm A """
+        return self._frame(self.extrema_sub_a)
+
+    @property
+    def peaks_sub_b(self) -> DataFrame:
+        """ The peaks and troughs in every series after Sub-Algorithm B """
+        return self._frame(self.extrema_sub_b)
+
+    @property
+    def peaks_sub_c(self) -> DataFrame:
+        """ The peaks and troughs in every series after Sub-Algorithms C and D """
+        return self._frame(self.extrema_sub_c)
+
+    @property
+    def waves(self) -> DataFrame:
+        """ The peaks and troughs in every series after cross-validation if calculated, else after C and D """
+        return self._frame([sub_c if cross_validated is None else cross_validated
+                            for sub_c, cross_validated in zip(self.extrema_sub_c, self.extrema_cross_validated)])
+
+    def cross_validate(self, reference_batch: WaveBatch) -> DataFrame:
+        """
+        Imputes the presence of additional waves in each series from the series with the same key in reference_batch.
+        Series without a counterpart in reference_batch are left unchanged.
+
+        Parameters:
+            reference_batch (WaveBatch): The WaveBatch object which will be used to impute the additional waves.
+
+        Returns:
+            cross_validate(reference_batch): The DataFrame of peaks and troughs in every series after
+            cross-validation, as returned by waves.
+        """
+
+        reference_positions = {key: i for i, key in enumerate(reference_batch.keys)}
+        for i, key in enumerate(self.keys):
+            j = reference_positions.get(key)
+            if j is None or len(self.raw_data[i]) == 0:
+                continue
+            self.extrema_cross_validated[i] = algorithm_e.run_extrema(
+                raw_data=self.raw_data[i],
+                input_sub_b=self.extrema_sub_b[i],
+                input_sub_c=self.extrema_sub_c[i],
+                reference_sub_c=reference_batch.extrema_sub_c[j],
+                prominence_threshold=self.prominence_threshold[i],
+                proportional_prominence_threshold=self.prominence_height_threshold[i])
+        return self.waves
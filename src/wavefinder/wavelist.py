@@ -6,7 +6,69 @@ import wavefinder.subalgorithms.algorithm_init as algorithm_init
 import wavefinder.subalgorithms.algorithm_a as algorithm_a
 import wavefinder.subalgorithms.algorithm_b as algorithm_b
 import wavefinder.subalgorithms.algorithm_c_and_d as algorithm_c_and_d
-import wavefinder.utils.trough_finder as trough_finder
+import wavefinder.subalgorithms.algorithm_e as algorithm_e
+import wavefinder.utils.extrema as extrema_utils
+
+
+def run_extrema_to_sub_b(raw_data: Series, t_sep_a: int) -> (np.ndarray, np.ndarray, np.ndarray):
+    """
+    Finds the initial list of peaks and troughs in raw_data, then calls the Sub-Algorithms A and B, which do not depend
+    on the prominence thresholds.
+
+    Parameters:
+        raw_data (Series): The original data from which the peaks and troughs are identified.
+        t_sep_a (int): Threshold specifying minimum wave duration.
+
+    Returns:
+        run_extrema_to_sub_b(raw_data, t_sep_a): The extrema arrays of peaks and troughs initially and after
+        Sub-Algorithms A and B.
+    """
+
+    extrema_initial, prominence_updater = algorithm_init.run(raw_data)
+    if prominence_updater is None:
+        # an empty series has no waves
+        return extrema_initial, extrema_utils.empty(), extrema_utils.empty()
+
+    extrema_sub_a = algorithm_a.run_extrema(
+        extrema=extrema_initial,
+        prominence_updater=prominence_updater,
+        t_sep_a=t_sep_a)
+
+    extrema_sub_b = algorithm_b.run_extrema(
+        raw_data=raw_data,
+        extrema=extrema_sub_a,
+        prominence_updater=prominence_updater,
+        t_sep_a=t_sep_a)
+
+    return extrema_initial, extrema_sub_a, extrema_sub_b
+
+
+def run_extrema(raw_data: Series, t_sep_a: int, prominence_threshold: float,
+                prominence_height_threshold: float) -> (np.ndarray, np.ndarray, np.ndarray, np.ndarray):
+    """
+    Finds the initial list of peaks and troughs in raw_data, then calls the Sub-Algorithms A through D.
+
+    Parameters:
+        raw_data (Series): The original data from which the peaks and troughs are identified.
+        t_sep_a (int): Threshold specifying minimum wave duration.
+        prominence_threshold (float): The minimum prominence which a wave must have.
+        prominence_height_threshold (float): The minimum prominence which a peak must have, as a ratio of the
+        value at the peak.
+
+    Returns:
+        run_extrema(raw_data, t_sep_a, prominence_threshold, prominence_height_threshold): The extrema arrays of
+        peaks and troughs initially and after Sub-Algorithms A, B, and C and D.
+    """
+
+    extrema_initial, extrema_sub_a, extrema_sub_b = run_extrema_to_sub_b(raw_data, t_sep_a)
+
+    extrema_sub_c = algorithm_c_and_d.run_extrema(
+        raw_data=raw_data,
+        extrema=extrema_sub_b,
+        prominence_threshold=prominence_threshold,
+        proportional_prominence_threshold=prominence_height_threshold)
+
+    return extrema_initial, extrema_sub_a, extrema_sub_b, extrema_sub_c
 
 
 class WaveList:
@@ -25,13 +87,18 @@ class WaveList:
         prominence_threshold (float): The minimum prominence which a wave must have.
         proportional_prominence_threshold (float): The minimum prominence which a peak must have, as a ratio of the
         value at the peak.
+        extrema_initial (ndarray): The extrema array of peaks and troughs in raw_data.
+        extrema_sub_a (ndarray): The extrema array of peaks and troughs after Sub-Algorithm A has merged short waves.
+        extrema_sub_b (ndarray): The extrema array of peaks and troughs after Sub-Algorithm B has merged short transient features.
+        extrema_sub_c (ndarray): The extrema array of peaks and troughs after Sub-Algorithms C and D have merged less prominent waves.
+        extrema_cross_validated (ndarray): The extrema array of peaks and troughs after cross-validation.
+
+    PROPERTIES
         peaks_initial (DataFrame): The list of peaks and troughs in raw_data.
         peaks_sub_a (DataFrame): The list of peaks and troughs after Sub-Algorithm A has merged short waves.
         peaks_sub_b (DataFrame): The list of peaks and troughs after Sub-Algorithm B has merged short transient features.
         peaks_sub_c (DataFrame): The list of peaks and troughs after Sub-Algorithms C and D have merged less prominent waves.
         peaks_cross_validated (DataFrame): The list of peaks and troughs after cross-validation.
-
-    PROPERTIES
         waves (DataFrame): An alias for peaks_cross_validated if calculated, else peaks_sub_c, for better access to the final results.
             Index: RangeIndex
             Columns:
@@ -71,41 +138,62 @@ class WaveList:
         self.prominence_threshold = prominence_threshold
         self.prominence_height_threshold = prominence_height_threshold
 
+        # DataFrames of the peaks and troughs are only built when first requested
+        self._frames = dict()
+
         # peaks and troughs of waves are calculated by run()
-        self.peaks_initial, self.peaks_sub_a, self.peaks_sub_b, self.peaks_sub_c = self.run()
-        self.peaks_cross_validated = None
+        self.extrema_initial, self.extrema_sub_a, self.extrema_sub_b, self.extrema_sub_c = self.run()
+        self.extrema_cross_validated = None
+
+    def _frame(self, stage: str) -> DataFrame:
+        """ Builds the DataFrame for the extrema array held in the attribute extrema_<stage>, caching the result """
+        extrema = getattr(self, 'extrema_' + stage)
+        if extrema is None:
+            return None
+        cached = self._frames.get(stage)
+        if cached is None or cached[0] is not extrema:
+            # the peaks and troughs after Sub-Algorithm A also hold their durations
+            to_frame = algorithm_a.to_frame if stage == 'sub_a' else extrema_utils.to_frame
+            cached = (extrema, to_frame(extrema))
+            self._frames[stage] = cached
+        return cached[1]
 
     @property
-    def waves(self):
-        """ Provides the list of waves, peaks_sub_c or peaks_cross_validated"""
-        if isinstance(self.peaks_cross_validated, DataFrame):
-            return self.peaks_cross_validated
-        else:
-            return self.peaks_sub_c
+    def peaks_initial(self) -> DataFrame:
+        """ The list of peaks and troughs in raw_data """
+        return self._frame('initial')
 
-    def run(self) -> (DataFrame, DataFrame, DataFrame, DataFrame):
-        """ Executes the algorithm by finding the initial list of peaks and troughs, then calling A through D. """
+    @property
+    def peaks_sub_a(self) -> DataFrame:
+        """ The list of peaks and troughs after Sub-Algorithm A """
+        return self._frame('sub_a')
 
-        peaks_initial, prominence_updater = algorithm_init.run(self.raw_data)
+    @property
+    def peaks_sub_b(self) -> DataFrame:
+        """ The list of peaks and troughs after Sub-Algorithm B """
+        return self._frame('sub_b')
 
-        peaks_sub_a = algorithm_a.run(
-            input_data_df=peaks_initial,
-            prominence_updater=prominence_updater,
-            t_sep_a=self.t_sep_a)
+    @property
+    def peaks_sub_c(self) -> DataFrame:
+        """ The list of peaks and troughs after Sub-Algorithms C and D """
+        return self._frame('sub_c')
 
-        peaks_sub_b = algorithm_b.run(
-            raw_data=self.raw_data,
-            input_data_df=peaks_sub_a,
-            prominence_updater=prominence_updater,
-            t_sep_a=self.t_sep_a)
+    @property
+    def peaks_cross_validated(self) -> DataFrame:
+        """ The list of peaks and troughs after cross-validation, or None if cross_validate has not been called """
+        return self._frame('cross_validated')
 
-        peaks_sub_c = algorithm_c_and_d.run(
-            raw_data=self.raw_data,
-            input_data_df=peaks_sub_b,
-            prominence_threshold=self.prominence_threshold,
-            proportional_prominence_threshold=self.prominence_height_threshold)
+    @property
+    def waves(self) -> DataFrame:
+        """ Provides the list of waves, peaks_sub_c or peaks_cross_validated"""
+        if self.extrema_cross_validated is not None:
+            return self.peaks_cross_validated
+        else:
+            return self.peaks_sub_c
 
-        return peaks_initial, peaks_sub_a, peaks_sub_b, peaks_sub_c
+    def run(self) -> (np.ndarray, np.ndarray, np.ndarray, np.ndarray):
+        """ Executes the algorithm by finding the initial list of peaks and troughs, then calling A through D. """
+        return run_extrema(self.raw_data, self.t_sep_a, self.prominence_threshold, self.prominence_height_threshold)
 
     def cross_validate(self, reference_wavelist: WaveList, plot: bool = False,
             plot_path: str = '', title: str = '') -> DataFrame:
@@ -126,48 +214,17 @@ class WaveList:
         # use the plotting tools - import now to avoid circularity
         import wavefinder.waveplotter as waveplotter
 
-        # extract relevant data and parameters from the WaveList objects
-        prominence_threshold = self.prominence_threshold
-        proportional_prominence_threshold = self.prominence_height_threshold
-
-        input_data = self.raw_data
-        input_sub_b = self.peaks_sub_b
-        input_sub_c = self.peaks_sub_c
-
-        reference_sub_c = reference_wavelist.peaks_sub_c
-        reference_peaks = reference_sub_c[reference_sub_c.peak_ind == 1].location
-        reference_troughs = reference_sub_c[reference_sub_c.peak_ind == 0].location
-
-        results = input_sub_c.copy()
-
-        # iterate through the waves in the reference time series
-        for i, reference_peak in enumerate(reference_peaks):
-            # identify the start and end of the wave
-            window_start = reference_troughs.iloc[i - 1] if i > 0 else 0
-            window_end = reference_troughs.iloc[i] if i < len(reference_troughs) else input_data.index[-1]
-            # check if a peak in the first series already exists during the wave - if it does then continue
-            if np.any([True if (x >= window_start) and (x <= window_end)
-                       else False for x in input_sub_c.loc[input_sub_c['peak_ind'] == 1, 'location']]):
-                continue
-            # if there is peak in input_sub_b during the wave, use the highest one
-            candidates = input_sub_b[(input_sub_b['peak_ind'] == 1) &
-                                     (input_sub_b['location'] >= window_start) & (
-                                             input_sub_b['location'] <= window_end)]
-            if len(candidates) > 0:
-                new_peak = candidates.loc[candidates.idxmax()['y_position']]
-                results = results.append(new_peak)
-
-        # next add back any troughs between peaks
-        result_troughs = input_sub_b[input_sub_b.peak_ind == 0]
-        results = results[results.peak_ind == 1]
-        results = trough_finder.run(results, result_troughs, input_data, prominence_threshold,
-                                    proportional_prominence_threshold)
-
+        self.extrema_cross_validated = algorithm_e.run_extrema(
+            raw_data=self.raw_data,
+            input_sub_b=self.extrema_sub_b,
+            input_sub_c=self.extrema_sub_c,
+            reference_sub_c=reference_wavelist.extrema_sub_c,
+            prominence_threshold=self.prominence_threshold,
+            proportional_prominence_threshold=self.prominence_height_threshold)
+        results = self.peaks_cross_validated
 
         # plot the results if required
         if plot:
             waveplotter.plot_cross_validator(self, reference_wavelist, results, title, plot_path)
 
-        self.peaks_cross_validated = results
-
-        return results
\ No newline at end of file
+        return results
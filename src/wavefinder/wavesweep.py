@@ -0,0 +1,129 @@
+"""
+NAME
+    wavesweep
+
+DESCRIPTION
+    This module evaluates the algorithm of WaveList over a grid of parameter sets for many time series.
+
+    The peaks and troughs after Sub-Algorithms A and B depend only on the time series and t_sep_a, so they are found
+    once for each series and value of t_sep_a, and only Sub-Algorithms C and D and the cross-validation are re-run for
+    each parameter set. The series are distributed across a pool of processes.
+
+FUNCTIONS
+    sweep
+"""
+
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+
+from pandas import DataFrame, Series
+
+import wavefinder.subalgorithms.algorithm_c_and_d as algorithm_c_and_d
+import wavefinder.subalgorithms.algorithm_e as algorithm_e
+from wavefinder.wavelist import run_extrema_to_sub_b
+
+PARAMETERS = ['t_sep_a', 'prominence_threshold', 'prominence_height_threshold']
+REFERENCE_PARAMETERS = ['reference_prominence_threshold', 'reference_prominence_height_threshold']
+
+
+def _resolve(parameter_set: dict, key) -> dict:
+    """ Replaces any value of parameter_set given as a Mapping from series key to value by the value for key """
+    return {name: value[key] if isinstance(value, Mapping) else value for name, value in parameter_set.items()}
+
+
+def _count_waves(extrema) -> int:
+    """ The number of waves is the number of peaks """
+    return int((extrema['peak_ind'] == 1).sum())
+
+
+def _sweep_series(task: tuple) -> list:
+    """ Evaluates every parameter set for a single series and its reference series, if any """
+    key, raw_data, reference_data, parameter_sets = task
+    # the stages before C and D are shared between the parameter sets with the same t_sep_a
+    sub_b, reference_sub_b, reference_sub_c = dict(), dict(), dict()
+
+    rows = []
+    for i, parameters in enumerate(parameter_sets):
+        t_sep_a = parameters['t_sep_a']
+        if t_sep_a not in sub_b:
+            sub_b[t_sep_a] = run_extrema_to_sub_b(raw_data, t_sep_a)[2]
+        extrema_sub_c = algorithm_c_and_d.run_extrema(raw_data, sub_b[t_sep_a], parameters['prominence_threshold'],
+                                                      parameters['prominence_height_threshold'])
+        row = {'key': key, 'parameter_set': i, **parameters, 'waves': _count_waves(extrema_sub_c)}
+
+        if reference_data is not None:
+            if t_sep_a not in reference_sub_b:
+                reference_sub_b[t_sep_a] = run_extrema_to_sub_b(reference_data, t_sep_a)[2]
+            reference_key = (t_sep_a, parameters['reference_prominence_threshold'],
+                             parameters['reference_prominence_height_threshold'])
+            if reference_key not in reference_sub_c:
+                reference_sub_c[reference_key] = algorithm_c_and_d.run_extrema(
+                    reference_data, reference_sub_b[t_sep_a], *reference_key[1:])
+            row['reference_waves'] = _count_waves(reference_sub_c[reference_key])
+            if len(raw_data) > 0:
+                extrema_cross_validated = algorithm_e.run_extrema(
+                    raw_data=raw_data,
+                    input_sub_b=sub_b[t_sep_a],
+                    input_sub_c=extrema_sub_c,
+                    reference_sub_c=reference_sub_c[reference_key],
+                    prominence_threshold=parameters['prominence_threshold'],
+                    proportional_prominence_threshold=parameters['prominence_height_threshold'])
+                row['waves_cross_validated'] = _count_waves(extrema_cross_validated)
+            else:
+                row['waves_cross_validated'] = 0
+        rows.append(row)
+    return rows
+
+
+def sweep(series: Mapping, parameter_sets: list, reference_series: Mapping = None, workers: int = 1,
+          chunksize: int = 1, key_name: str = 'series') -> DataFrame:
+    """
+    Counts the waves found in each time series for each parameter set.
+
+    Parameters:
+        series (Mapping): The time series, each a Series with a RangeIndex, by key.
+        parameter_sets (list): A dict for each parameter set, with the keys t_sep_a, prominence_threshold and
+        prominence_height_threshold as for WaveList. If reference_series is given, each dict also needs the keys
+        reference_prominence_threshold and reference_prominence_height_threshold for the reference series. Any
+        threshold may be a Mapping from series key to value, e.g. for thresholds relative to population.
+        reference_series (Mapping): The time series against which each series with the same key is cross-validated.
+        Series without a reference are not cross-validated.
+        workers (int): The number of processes across which the series are distributed. If 1, the sweep runs in the
+        calling process.
+        chunksize (int): The number of series sent to a process at a time.
+        key_name (str): The name of the column holding the keys in the result.
+
+    Returns:
+        sweep(series, parameter_sets, reference_series, workers, chunksize, key_name): A DataFrame with a row for each
+        series and parameter set, in the order given, with the columns key_name, parameter_set (the position of the
+        parameter set in parameter_sets), the parameters used for the series, and waves, the number of waves after
+        Sub-Algorithms C and D. With reference_series, it also has the columns reference_waves and
+        waves_cross_validated.
+    """
+
+    required = PARAMETERS + (REFERENCE_PARAMETERS if reference_series is not None else [])
+    for parameters in parameter_sets:
+        missing = [name for name in required if name not in parameters]
+        if missing:
+            raise ValueError(f'parameter set is missing {missing}')
+
+    def as_series(data):
+        return data if data is None or isinstance(data, Series) else Series(data, dtype=float)
+
+    reference_series = dict() if reference_series is None else reference_series
+    tasks = [(key, as_series(data), as_series(reference_series.get(key)),
+              [_resolve(parameters, key) for parameters in parameter_sets])
+             for key, data in series.items()]
+
+    if workers == 1:
+        results = list(map(_sweep_series, tasks))
+    else:
+        # executor.map returns the results in the order of tasks, so the output does not depend on scheduling
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_sweep_series, tasks, chunksize=chunksize))
+
+    columns = ['key', 'parameter_set'] + PARAMETERS + ['waves']
+    if any(task[2] is not None for task in tasks):
+        columns = columns[:-1] + REFERENCE_PARAMETERS + ['waves', 'reference_waves', 'waves_cross_validated']
+    results = DataFrame([row for result in results for row in result], columns=columns)
+    return results.rename(columns={'key': key_name})
@@ -1,3 +1,6 @@
+import numpy as np
+import pandas as pd
+
 from config import Config
 from data_provider import ListDataProvider
 from wavefinder.utils.prominence_updater import ProminenceUpdater
@@ -7,6 +10,54 @@ import wavefinder.subalgorithms.algorithm_b as algorithm_b
 from plot_helper import plot_results
 
 
+def sort_values_run(raw_data, input_data_df, prominence_updater, t_sep_a):
+    # Sub-Algorithm B as it was before the priority queue, re-sorting all pairs after every merge. The sort is made
+    # stable so that pairs with equal vertical distance are taken in order of location
+    sub_b_flag = True
+    df = input_data_df.copy()
+    original_data = dict()
+    while sub_b_flag:
+        if len(df) < 2:
+            break
+        df.loc[0:len(df) - 2, 'separation'] = np.diff(df['location'])
+        df.loc[0:len(df) - 2, 'y_distance'] = [abs(x) for x in np.diff(df['y_position'])]
+        df = df.sort_values(by='y_distance', kind='stable').reset_index(drop=False)
+        sub_b_flag = False
+        for x in df.index:
+            if df.loc[x, 'separation'] < t_sep_a / 2:
+                sub_b_flag = True
+                i = df.loc[x, 'index']
+                original_t_0 = df.loc[df['index'] == i, 'location'].values[0]
+                original_t_1 = df.loc[df['index'] == i + 1, 'location'].values[0]
+                y_0 = df.loc[df['index'] == i, 'y_position'].values[0]
+                y_1 = df.loc[df['index'] == i + 1, 'y_position'].values[0]
+                t_0 = max(np.floor((original_t_0 + original_t_1 - t_sep_a) / 2), 0)
+                t_1 = min(np.floor((original_t_0 + original_t_1 + t_sep_a) / 2), raw_data.index[-1])
+                original_data[t_0] = {'location': original_t_0, 'y_position': y_0}
+                original_data[t_1] = {'location': original_t_1, 'y_position': y_1}
+                df.loc[df['index'] == i, 'location'] = t_0
+                df.loc[df['index'] == i + 1, 'location'] = t_1
+                df.loc[df['index'] == i, 'y_position'] = raw_data.iloc[int(t_0)]
+                df.loc[df['index'] == i + 1, 'y_position'] = raw_data.values[int(t_1)]
+                df = prominence_updater.run(df)
+                break
+    for key, val in original_data.items():
+        df.loc[df['location'] == key, ['y_position', 'location']] = [val['y_position'], val['location']]
+    return prominence_updater.run(df)
+
+
+def run_both(input_data: list, t_sep_a: int):
+    # runs Sub-Algorithm B and the sort_values version directly on the initial peaks and troughs, so that every
+    # transient feature is merged by Sub-Algorithm B
+    data = pd.Series(input_data, dtype=float)
+    peaks_initial = algorithm_init.init_peaks_and_troughs(data)
+    prominence_updater = ProminenceUpdater(data)
+    result = algorithm_b.run(raw_data=data, input_data_df=peaks_initial, prominence_updater=prominence_updater,
+                             t_sep_a=t_sep_a)
+    expected = sort_values_run(data, peaks_initial, prominence_updater, t_sep_a)
+    return peaks_initial, result, expected
+
+
 class TestAlgorithmB:
 
     @classmethod
@@ -41,3 +92,39 @@ class TestAlgorithmB:
 
         expected_result = [20]
         assert y_positions == expected_result
+
+    def test_2(self):
+        # a run of transient features which are merged one after another
+        input_data = [0, 10, 8, 9, 7, 8, 6, 7, 5, 30, 28, 29, 27, 50, 20, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
+        peaks_initial, result, expected = run_both(input_data, t_sep_a=6)
+
+        assert len(peaks_initial) == 13
+        assert result[['location', 'y_position']].values.tolist() == [[4, 7], [8, 5], [9, 30]]
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_3(self):
+        # pairs with equal vertical distance are merged in order of location
+        input_data = [0, 0, 0, 0, 10, 20, 15, 20, 15, 20, 15, 20, 30, 40, 40, 40, 40, 40, 30, 20, 10, 0, 0, 0, 0, 0]
+        peaks_initial, result, expected = run_both(input_data, t_sep_a=6)
+
+        assert len(peaks_initial) == 7
+        assert result[['location', 'y_position']].values.tolist() == [[15, 40]]
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_4(self):
+        # transient features next to the ends of the series, whose boundaries are clipped to the series
+        input_data = [5, 8, 6, 9, 7, 20, 30, 40, 50, 60, 70, 60, 50, 40, 30, 20, 10, 12, 9, 11, 8]
+        peaks_initial, result, expected = run_both(input_data, t_sep_a=6)
+
+        assert peaks_initial['location'].min() < 3 and peaks_initial['location'].max() > len(input_data) - 4
+        assert result[['location', 'y_position']].values.tolist() == [[10, 70]]
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_5(self):
+        # agrees with the sort_values version on random series, including series with many equal values
+        rng = np.random.default_rng(0)
+        for _ in range(50):
+            for input_data in [rng.integers(0, 5, size=rng.integers(5, 40)),
+                               rng.normal(size=rng.integers(5, 40)).cumsum()]:
+                _, result, expected = run_both(list(input_data), t_sep_a=int(rng.integers(2, 12)))
+                pd.testing.assert_frame_equal(result, expected)
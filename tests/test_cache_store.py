@@ -0,0 +1,42 @@
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from cache_store import CacheStore
+
+
+class TestCacheStore:
+
+    @classmethod
+    def setup_class(cls):
+        cls.df = pd.DataFrame({'countrycode': ['AAA'] * 100, 'value': range(100)})
+
+    def test_1(self):
+        # versions are kept side by side until the size limit, then the least recently used are removed first
+        store = CacheStore(tempfile.mkdtemp(), max_bytes=None)
+        for key in ['a', 'b', 'c']:
+            store.write(self.df, 'table', key, 'csv', {'digest': key})
+            # modification times are compared, so the versions must be used at distinct times
+            time.sleep(0.05)
+        size = sum(entry.stat().st_size for entry in os.scandir(store.path) if entry.name.startswith('table-a'))
+
+        store.read('table', 'a', ['csv'])
+        time.sleep(0.05)
+        store.max_bytes = 2 * size
+        store.write(self.df, 'table', 'd', 'csv', {'digest': 'd'})
+
+        assert store.read('table', 'a', ['csv'])[1] == {'digest': 'a'}
+        assert store.read('table', 'b', ['csv'])[0] is None
+        assert store.read('table', 'c', ['csv'])[0] is None
+        pd.testing.assert_frame_equal(store.read('table', 'd', ['csv'])[0].drop(columns=['Unnamed: 0']), self.df)
+
+    def test_2(self):
+        # writes go through a temporary file, and a version without metadata is not read
+        store = CacheStore(tempfile.mkdtemp())
+        store.write(self.df, 'table', 'a', 'csv', {'digest': 'a'})
+        assert not [name for name in os.listdir(store.path) if name.endswith('.tmp')]
+
+        os.remove(store.metadata_file('table', 'a'))
+        assert store.read('table', 'a', ['csv']) == (None, None)
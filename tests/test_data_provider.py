@@ -0,0 +1,454 @@
+import datetime
+import sqlite3
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import psycopg2.pool
+from csaps import csaps
+
+from config import Config
+from data_provider import DataProvider, first_crossings, read_owid_csv
+
+
+class TestDataProvider:
+
+    @classmethod
+    def setup_class(cls):
+        cls.df = pd.DataFrame({'countrycode': pd.Categorical(['AAA', 'AAA', 'BBB']),
+                               'date': [datetime.date(2020, 1, 1), datetime.date(2020, 1, 2),
+                                        datetime.date(2020, 1, 1)],
+                               'timestamp': pd.to_datetime(['2020-01-01', '2020-01-02', '2020-01-01']),
+                               'new_per_day_smooth': [1.0, np.nan, 3.0]})
+
+    def make_data_provider(self, cache_format: str) -> DataProvider:
+        config = Config()
+        config.cache_path = tempfile.mkdtemp()
+        config.cache_format = cache_format
+        data_provider = DataProvider(config)
+        data_provider.use_cache = True
+        return data_provider
+
+    def test_1(self):
+        # the columnar formats preserve dtypes and load only the requested columns
+        for cache_format in ['parquet', 'feather']:
+            data_provider = self.make_data_provider(cache_format)
+            data_provider.save_to_cache(self.df, 'epidemiology_series')
+
+            result = data_provider.load_from_cache('epidemiology_series')
+            pd.testing.assert_frame_equal(result, self.df)
+
+            result = data_provider.load_from_cache('epidemiology_series', columns=['date', 'new_per_day_smooth'])
+            assert result.columns.to_list() == ['date', 'new_per_day_smooth']
+
+    def test_2(self):
+        # csv caches parse the dates back into datetime.date
+        data_provider = self.make_data_provider('csv')
+        data_provider.save_to_cache(self.df, 'epidemiology_series')
+
+        result = data_provider.load_from_cache('epidemiology_series', columns=['countrycode', 'date'])
+        assert result.columns.to_list() == ['countrycode', 'date']
+        assert result['date'].to_list() == self.df['date'].to_list()
+
+    def test_3(self):
+        # the per-country index gives the same series as filtering, even if a country's rows are not contiguous
+        data_provider = self.make_data_provider('csv')
+        data_provider.epidemiology_series = pd.DataFrame({'countrycode': ['BBB', 'AAA', 'AAA', 'BBB'],
+                                                          'date': [0, 0, 1, 1],
+                                                          'new_per_day_smooth': [1.0, 2.0, np.nan, 4.0]})
+        data_provider.wbi_table = pd.DataFrame({'countrycode': ['AAA'], 'value': [100.0]})
+        data_provider.build_index()
+
+        assert data_provider.get_series('BBB', 'new_per_day_smooth')['new_per_day_smooth'].to_list() == [1.0, 4.0]
+        assert data_provider.get_series('AAA', 'new_per_day_smooth')['date'].to_list() == [0]
+        assert len(data_provider.get_series('CCC', 'new_per_day_smooth')) == 0
+        assert data_provider.get_population('AAA') == 100.0
+        assert np.isnan(data_provider.get_population('BBB'))
+
+    def test_4(self):
+        # gaps are filled by interpolation within each country and negative daily changes take the previous value
+        epi_table = pd.DataFrame({'countrycode': ['AAA', 'AAA', 'AAA', 'BBB', 'BBB'],
+                                  'country': ['A', 'A', 'A', 'B', 'B'],
+                                  'date': [datetime.date(2020, 1, 1), datetime.date(2020, 1, 3),
+                                           datetime.date(2020, 1, 4), datetime.date(2020, 1, 1),
+                                           datetime.date(2020, 1, 2)],
+                                  'confirmed': [1.0, 5.0, 4.0, 10.0, 12.0],
+                                  'dead': [0.0, 0.0, 1.0, np.nan, 1.0]})
+
+        result = DataProvider.preprocess_epi_table(epi_table)
+
+        assert result['countrycode'].to_list() == ['AAA', 'AAA', 'AAA', 'AAA', 'BBB', 'BBB']
+        assert result['date'].to_list()[1] == datetime.date(2020, 1, 2)
+        assert result['confirmed'].to_list()[:4] == [1.0, 3.0, 5.0, 4.0]
+        assert result['new_per_day'].to_list() == [2.0, 2.0, 2.0, 2.0, 2.0, 2.0]
+        assert result['dead_per_day'].to_list()[:4] == [0.0, 0.0, 0.0, 1.0]
+        assert np.isnan(result['dead'].to_list()[4])
+
+    def test_5(self):
+        # the first crossing of each threshold in each group, where counts may be revised down or missing
+        values = np.array([0, 3, 2, 6, np.nan, 1, 5, 4, 10])
+        result = first_crossings(values, np.array([0, 4]), [5, 1, 20])
+
+        assert result.tolist() == [[3, 1, -1], [6, 5, -1]]
+
+    def test_6(self):
+        # an incremental sync pulls only recent rows, and gives the same tables as pulling everything again
+        conn = sqlite3.connect(':memory:')
+        conn.execute('CREATE TABLE epidemiology (countrycode TEXT, country TEXT, date TEXT, confirmed REAL, dead REAL, '
+                     'adm_area_1 TEXT, source TEXT, gid TEXT)')
+        conn.execute('CREATE TABLE government_response (countrycode TEXT, country TEXT, date TEXT, '
+                     'stringency_index REAL, c1_school_closing REAL)')
+        dates = [str(date.date()) for date in pd.date_range('2020-03-01', periods=20)]
+        for code in ['AAA', 'BBB']:
+            conn.executemany('INSERT INTO epidemiology VALUES (?, ?, ?, ?, ?, NULL, ?, ?)',
+                             [(code, code, date, 10.0 * i, i, 'WRD_WHO', code) for i, date in enumerate(dates[:15])])
+            conn.executemany('INSERT INTO government_response VALUES (?, ?, ?, ?, ?)',
+                             [(code, code, date, 50.0, 1.0) for date in dates[:15]])
+
+        data_provider = self.make_data_provider('csv')
+        data_provider.conn = conn
+        data_provider.flags = {'c1_school_closing': 3}
+        data_provider.incremental = True
+        data_provider.get_epi_table()
+        data_provider.get_gsi_table()
+        series_key = data_provider.cache_key('epidemiology_series')
+
+        # revise a recent value of AAA, add a day to AAA and add a new country
+        conn.execute("UPDATE epidemiology SET confirmed = 125 WHERE countrycode = 'AAA' AND date = ?", (dates[12],))
+        conn.executemany('INSERT INTO epidemiology VALUES (?, ?, ?, ?, ?, NULL, ?, ?)',
+                         [('AAA', 'AAA', dates[15], 150.0, 15, 'WRD_WHO', 'AAA'),
+                          ('CCC', 'CCC', dates[0], 1.0, 0, 'WRD_WHO', 'CCC')])
+        conn.execute("INSERT INTO government_response VALUES ('AAA', 'AAA', ?, 60, 2)", (dates[15],))
+
+        epi_table, changed = data_provider.sync_table(data_provider.load_from_cache('epidemiology_raw_table'),
+                                                      'SELECT countrycode, country, date, confirmed, dead '
+                                                      'FROM epidemiology')
+        assert changed == ['AAA', 'CCC']
+        epidemiology = data_provider.get_epi_table()
+        government_response = data_provider.get_gsi_table()
+        # the series built from the previous epidemiology table are no longer loaded
+        assert data_provider.cache_key('epidemiology_series') != series_key
+
+        data_provider.use_cache = False
+        pd.testing.assert_frame_equal(epidemiology, data_provider.get_epi_table())
+        pd.testing.assert_frame_equal(government_response.reset_index(drop=True),
+                                      data_provider.get_gsi_table().reset_index(drop=True))
+
+    def test_7(self):
+        # the COPY loader binds the parameters into the query and parses the csv stream into typed columns
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                return False
+
+            def mogrify(self, sql_command, params):
+                return (sql_command % {name: repr(str(value)) for name, value in params.items()}).encode('utf-8')
+
+            def copy_expert(self, sql_command, buffer):
+                assert sql_command == "COPY (SELECT * FROM epidemiology WHERE date <= '2021-07-01') " \
+                                      "TO STDOUT WITH (FORMAT csv, HEADER)"
+                buffer.write('countrycode,date,confirmed\nAAA,2020-01-01,1\nAAA,2020-01-02,\n')
+
+        class Connection:
+            def cursor(self):
+                return Cursor()
+
+        data_provider = self.make_data_provider('csv')
+        data_provider.conn = Connection()
+        result = data_provider.read_sql('SELECT * FROM epidemiology WHERE date <= %(end_date)s',
+                                        params={'end_date': datetime.date(2021, 7, 1)},
+                                        dtypes={'confirmed': np.float64})
+
+        assert result['date'].to_list() == [datetime.date(2020, 1, 1), datetime.date(2020, 1, 2)]
+        assert result['confirmed'].dtype == np.float64
+        assert np.isnan(result['confirmed'].to_list()[1])
+
+    @staticmethod
+    def make_database() -> sqlite3.Connection:
+        conn = sqlite3.connect(':memory:', check_same_thread=False)
+        conn.execute('CREATE TABLE epidemiology (countrycode TEXT, country TEXT, date TEXT, confirmed REAL, dead REAL, '
+                     'adm_area_1 TEXT, source TEXT, gid TEXT)')
+        conn.execute('CREATE TABLE government_response (countrycode TEXT, country TEXT, date TEXT, '
+                     'stringency_index REAL, c1_school_closing REAL)')
+        conn.execute('CREATE TABLE world_bank (countrycode TEXT, indicator_code TEXT, value REAL, adm_area_1 TEXT)')
+        dates = [str(date.date()) for date in pd.date_range('2020-03-01', periods=30)]
+        conn.executemany('INSERT INTO epidemiology VALUES (?, ?, ?, ?, ?, NULL, ?, ?)',
+                         [('AAA', 'A', date, 100.0 * i, i, 'WRD_WHO', 'AAA') for i, date in enumerate(dates)])
+        conn.executemany('INSERT INTO government_response VALUES (?, ?, ?, ?, ?)',
+                         [('AAA', 'A', date, 50.0, 1.0) for date in dates])
+        conn.executemany('INSERT INTO world_bank VALUES (?, ?, ?, NULL)',
+                         [('AAA', 'SP.POP.TOTL', 1e6), ('AAA', 'EN.POP.DNST', 10.0),
+                          ('AAA', 'NY.GNP.PCAP.PP.KD', 1e4), ('AAA', 'SM.POP.NETM', -100.0)])
+        return conn
+
+    def make_fetching_data_provider(self) -> DataProvider:
+        data_provider = self.make_data_provider('csv')
+        data_provider.flags = {'c1_school_closing': 3}
+        # the testing data is downloaded unless it is cached
+        data_provider.save_to_cache(pd.DataFrame({'countrycode': ['AAA'], 'date': [datetime.date(2020, 3, 1)],
+                                                  'total_tests': [np.nan], 'new_tests': [np.nan],
+                                                  'new_tests_smoothed': [np.nan], 'positive_rate': [np.nan]}),
+                                    'testing_table')
+        return data_provider
+
+    def test_8(self):
+        # the sources are loaded concurrently and joined to build the series, with the time taken for each recorded
+        data_provider = self.make_fetching_data_provider()
+        data_provider.conn = self.make_database()
+        t0_tables = []
+        get_t0_table = data_provider.get_t0_table
+        data_provider.get_t0_table = lambda *args: t0_tables.append(get_t0_table(*args)) or t0_tables[-1]
+        data_provider.fetch_data(use_cache=True)
+
+        # the t0 table is built once and shared with the series
+        assert len(t0_tables) == 1
+        assert set(data_provider.timings) == {'epidemiology', 'testing', 'wbi_table', 'gsi_table', 't0_table',
+                                              'epidemiology_series'}
+        assert len(data_provider.gsi_table) == 30
+        assert data_provider.get_population('AAA') == 1e6
+        assert data_provider.get_wbi_data('AAA', 'net_migration') == 100.0
+        assert data_provider.get_series('AAA', 'new_per_day')['new_per_day'].to_list() == [100.0] * 30
+
+    def test_9(self):
+        # the testing columns are read in chunks, keeping only countries with a 3 letter code up to end_date
+        path = tempfile.mkdtemp() + '/owid-covid-data.csv'
+        pd.DataFrame({'iso_code': ['AAA', 'AAA', 'OWID_WRL', None, 'BBB'],
+                      'continent': ['X', 'X', None, None, 'Y'],
+                      'date': ['2021-06-30', '2021-07-02', '2021-06-30', '2021-06-30', '2021-07-01'],
+                      'total_tests': [1.0, 2.0, 3.0, 4.0, np.nan], 'new_tests': [1, 1, 1, 1, 1],
+                      'new_tests_smoothed': [1.0, 1.0, 1.0, 1.0, 1.0],
+                      'positive_rate': [0.1, 0.1, 0.1, 0.1, 0.1]}).to_csv(path, index=False)
+
+        result = read_owid_csv(path, datetime.date(2021, 7, 1), chunksize=2)
+
+        assert result.columns.to_list() == ['countrycode', 'date', 'total_tests', 'new_tests', 'new_tests_smoothed',
+                                            'positive_rate']
+        assert result['countrycode'].to_list() == ['AAA', 'BBB']
+        assert result['date'].to_list() == [datetime.date(2021, 6, 30), datetime.date(2021, 7, 1)]
+        assert result['new_tests'].dtype == np.float64
+
+    def test_10(self):
+        # a change of parameter only changes the keys of the tables which depend on it, so the tables pulled from the
+        # database are still loaded, and the cache keeps a version for each parameter set
+        data_provider = self.make_data_provider('csv')
+        data_provider.save_to_cache(self.df, 'epidemiology_raw_table')
+        data_provider.save_to_cache(self.df, 'epidemiology_table')
+        data_provider.save_to_cache(self.df, 'epidemiology_series')
+        keys = {name: data_provider.cache_key(name) for name in data_provider.cache_dependencies}
+
+        data_provider.ma_window = 7
+        assert data_provider.cache_key('epidemiology_raw_table') == keys['epidemiology_raw_table']
+        assert data_provider.cache_key('epidemiology_table') == keys['epidemiology_table']
+        assert data_provider.cache_key('epidemiology_series') != keys['epidemiology_series']
+        assert data_provider.load_from_cache('epidemiology_table') is not None
+        assert data_provider.load_from_cache('epidemiology_series') is None
+
+        data_provider.ma_window = 14
+        assert data_provider.load_from_cache('epidemiology_series') is not None
+
+    def test_11(self):
+        # the tables built from a cached table follow a change of parameter on the same provider
+        conn = sqlite3.connect(':memory:')
+        conn.execute('CREATE TABLE epidemiology (countrycode TEXT, country TEXT, date TEXT, confirmed REAL, dead REAL, '
+                     'adm_area_1 TEXT, source TEXT, gid TEXT)')
+        dates = [str(date.date()) for date in pd.date_range('2020-03-01', periods=20)]
+        conn.executemany('INSERT INTO epidemiology VALUES (?, ?, ?, ?, ?, NULL, ?, ?)',
+                         [('AAA', 'AAA', date, 10.0 * i, i, 'WRD_WHO', 'AAA') for i, date in enumerate(dates)])
+
+        data_provider = self.make_data_provider('csv')
+        data_provider.conn = conn
+        assert data_provider.get_epi_table()['date'].max() == datetime.date(2020, 3, 20)
+        data_provider.end_date = datetime.date(2020, 3, 10)
+        epidemiology = data_provider.get_epi_table()
+        assert epidemiology['date'].max() == datetime.date(2020, 3, 10)
+
+        fresh_provider = self.make_data_provider('csv')
+        fresh_provider.conn = conn
+        fresh_provider.end_date = datetime.date(2020, 3, 10)
+        pd.testing.assert_frame_equal(epidemiology, fresh_provider.get_epi_table())
+
+    def test_12(self):
+        # each country is pulled again from its own cutoff, so a country which stopped reporting early does not pull
+        # the earlier rows of the others
+        conn = sqlite3.connect(':memory:')
+        conn.execute('CREATE TABLE government_response (countrycode TEXT, country TEXT, date TEXT, '
+                     'stringency_index REAL)')
+        dates = [str(date.date()) for date in pd.date_range('2020-03-01', periods=20)]
+        conn.executemany('INSERT INTO government_response VALUES (?, ?, ?, ?)',
+                         [('AAA', 'AAA', date, 50.0) for date in dates[:15]] +
+                         [('BBB', 'BBB', date, 50.0) for date in dates[:5]])
+        sql_command = 'SELECT countrycode, country, date, stringency_index FROM government_response'
+
+        data_provider = self.make_data_provider('csv')
+        data_provider.conn = conn
+        table, _ = data_provider.sync_table(None, sql_command)
+        conn.execute("INSERT INTO government_response VALUES ('AAA', 'AAA', ?, 60)", (dates[15],))
+
+        pulled = []
+        read_sql = data_provider.read_sql
+        data_provider.read_sql = lambda *args, **kwargs: pulled.append(read_sql(*args, **kwargs)) or pulled[-1]
+        table, changed = data_provider.sync_table(table, sql_command)
+        assert changed == ['AAA']
+        # the last 8 days of AAA and the new day, and all of BBB, whose cutoff is before its first day
+        assert len(pulled[0]) == 9 + 5
+        assert len(table) == 21
+
+    def test_13(self):
+        # the concurrent loaders wait for a connection when there are fewer connections than loaders
+        class Pool:
+            # raises when exhausted, as psycopg2.pool.ThreadedConnectionPool does
+            def __init__(self, conn, maxconn):
+                self.conn, self.maxconn, self.used = conn, maxconn, 0
+                self.lock = threading.Lock()
+
+            def getconn(self):
+                with self.lock:
+                    if self.used == self.maxconn:
+                        raise psycopg2.pool.PoolError('connection pool exhausted')
+                    self.used += 1
+                # hold the connection long enough for the loaders to overlap
+                time.sleep(0.05)
+                return self.conn
+
+            def putconn(self, conn):
+                with self.lock:
+                    self.used -= 1
+
+        conn = self.make_database()
+        data_provider = self.make_fetching_data_provider()
+        data_provider.db_connections = 1
+        data_provider.open_db_connection = \
+            lambda: setattr(data_provider, 'pool', Pool(conn, data_provider.db_connections))
+        data_provider.fetch_data(use_cache=True)
+
+        assert data_provider.pool.used == 0
+        assert len(data_provider.gsi_table) == 30
+        assert data_provider.get_population('AAA') == 1e6
+
+
+def epi_series_loop(data_provider: DataProvider, epidemiology: pd.DataFrame, testing: pd.DataFrame,
+                    wbi_table: pd.DataFrame) -> pd.DataFrame:
+    # the per-country loop which build_epi_series replaced, as the reference for its output
+    config = data_provider.config
+    columns = dict()
+    for country in np.sort(epidemiology['countrycode'].unique()):
+        epi_data = epidemiology[epidemiology['countrycode'] == country]
+        tst_data = testing[testing['countrycode'] == country]
+        tests = np.repeat(np.nan, len(epi_data))
+        new_tests = np.repeat(np.nan, len(epi_data))
+        new_tests_smooth = np.repeat(np.nan, len(epi_data))
+        positive_rate = np.repeat(np.nan, len(epi_data))
+        positive_rate_smooth = np.repeat(np.nan, len(epi_data))
+        if data_provider.use_splines:
+            x = np.arange(len(epi_data['date']))
+            ys = csaps(x, epi_data['new_per_day'].values, x, smooth=data_provider.smooth)
+            zs = csaps(x, epi_data['dead_per_day'].values, x, smooth=data_provider.smooth)
+        else:
+            ys = epi_data[['new_per_day', 'date']].rolling(window=data_provider.ma_window, on='date').mean()[
+                'new_per_day']
+            zs = epi_data[['dead_per_day', 'date']].rolling(window=data_provider.ma_window, on='date').mean()[
+                'dead_per_day']
+        if len(tst_data) > 1:
+            tests = epi_data[['date']].merge(
+                tst_data[['date', 'total_tests']], how='left', on='date')['total_tests'].values
+            if sum(~pd.isnull(tst_data['new_tests_smoothed'])) > 0:
+                new_tests_smooth = epi_data[['date']].merge(
+                    tst_data[['date', 'new_tests_smoothed']], how='left', on='date')['new_tests_smoothed'].values
+            if sum(~pd.isnull(tst_data['new_tests'])) > 0:
+                new_tests = epi_data[['date']].merge(
+                    tst_data[['date', 'new_tests']], how='left', on='date')['new_tests'].values
+            else:
+                new_tests = new_tests_smooth
+            if sum(~pd.isnull(tst_data['new_tests_smoothed'])) == 0 and sum(~pd.isnull(tst_data['new_tests'])) > 0:
+                new_tests_smooth = epi_data[['date']] \
+                    .merge(tst_data[['date', 'new_tests']], how='left', on='date')[['new_tests', 'date']] \
+                    .rolling(window=7, on='date').mean()['new_tests']
+            positive_rate[~np.isnan(new_tests)] = epi_data['new_per_day'][~np.isnan(new_tests)] / new_tests[
+                ~np.isnan(new_tests)]
+            positive_rate[positive_rate > 1] = np.nan
+            positive_rate_smooth = np.array(pd.Series(positive_rate).rolling(window=7).mean())
+        population = np.nan if len(wbi_table[wbi_table['countrycode'] == country]['value']) == 0 else \
+            wbi_table[wbi_table['countrycode'] == country]['value'].iloc[0]
+
+        def first_date(mask):
+            return np.nan if len(epi_data[mask]['date']) == 0 else epi_data[mask]['date'].iloc[0]
+
+        def days_since(t0):
+            return np.repeat(np.nan, len(epi_data)) if pd.isnull(t0) else \
+                np.array([(date - t0).days for date in epi_data['date'].values])
+
+        relative = (epi_data['confirmed'] / population) * config.rel_to_constant >= config.rel_t0_threshold
+        country_columns = {
+            'countrycode': epi_data['countrycode'].values,
+            'country': epi_data['country'].values,
+            'date': epi_data['date'].values,
+            'confirmed': epi_data['confirmed'].values,
+            'new_per_day': epi_data['new_per_day'].values,
+            'new_per_day_smooth': ys,
+            'dead': epi_data['dead'].values,
+            'days_since_t0': days_since(first_date(epi_data['confirmed'] >= config.abs_t0_threshold)),
+            'new_cases_per_rel_constant': config.rel_to_constant * (ys / population),
+            'dead_per_day': epi_data['dead_per_day'].values,
+            'dead_per_day_smooth': zs,
+            'new_deaths_per_rel_constant': config.rel_to_constant * (zs / population),
+            'tests': tests,
+            'new_tests': new_tests,
+            'new_tests_smooth': new_tests_smooth,
+            'positive_rate': positive_rate,
+            'positive_rate_smooth': positive_rate_smooth,
+            'days_since_t0_pop': days_since(first_date(relative)),
+            'days_since_t0_1_dead': days_since(first_date(epi_data['dead'] >= 1)),
+            'days_since_t0_5_dead': days_since(first_date(epi_data['dead'] >= 5)),
+            'days_since_t0_10_dead': days_since(first_date(epi_data['dead'] >= 10)),
+            'case_death_ascertainment': (epi_data['confirmed'].astype(int) /
+                                         epi_data['dead'].astype(int).shift(-9).replace(0, np.nan)).values}
+        for name, values in country_columns.items():
+            columns[name] = np.concatenate((columns.get(name, np.empty(0)), values))
+    return pd.DataFrame.from_dict(columns)
+
+
+class TestEpiSeries:
+
+    @classmethod
+    def setup_class(cls):
+        # the countries are interleaved, and cover each kind of testing data: new_tests and new_tests_smoothed (AAA),
+        # new_tests only (BBB), new_tests_smoothed only (CCC), a single day (DDD) and none (EEE, without population)
+        rng = np.random.default_rng(0)
+        dates = [datetime.date(2020, 3, 1) + datetime.timedelta(days=i) for i in range(40)]
+        countries = ['AAA', 'BBB', 'CCC', 'DDD', 'EEE']
+        epidemiology = []
+        for i, country in enumerate(countries):
+            new_per_day = rng.integers(0, 200 * (i + 1), size=len(dates)).astype(np.float64)
+            dead_per_day = rng.integers(0, 3, size=len(dates)).astype(np.float64)
+            epidemiology.append(pd.DataFrame({'countrycode': country, 'country': country.title(), 'date': dates,
+                                              'confirmed': new_per_day.cumsum(), 'dead': dead_per_day.cumsum(),
+                                              'new_per_day': new_per_day, 'dead_per_day': dead_per_day}))
+        cls.epidemiology = pd.concat(epidemiology).sort_values('date', kind='stable').reset_index(drop=True)
+
+        testing = []
+        for country, start, days in [('AAA', 5, 30), ('BBB', 0, 40), ('CCC', 10, 30), ('DDD', 3, 1)]:
+            new_tests = rng.integers(50, 2000, size=days).astype(np.float64)
+            testing.append(pd.DataFrame({'countrycode': country, 'date': dates[start:start + days],
+                                         'total_tests': new_tests.cumsum(),
+                                         'new_tests': new_tests if country != 'CCC' else np.nan,
+                                         'new_tests_smoothed': new_tests * 0.9 if country != 'BBB' else np.nan,
+                                         'positive_rate': np.nan}))
+        cls.testing = pd.concat(testing).reset_index(drop=True)
+        cls.wbi_table = pd.DataFrame({'countrycode': ['AAA', 'BBB', 'CCC', 'DDD'],
+                                      'value': [1e5, 5e5, 2e6, 1e7]})
+
+    def test_1(self):
+        # the series for all countries are the same as those of the per-country loop, with and without splines
+        config = Config()
+        config.cache_path = tempfile.mkdtemp()
+        for use_splines in [False, True]:
+            data_provider = DataProvider(config)
+            data_provider.use_splines = use_splines
+            result = data_provider.build_epi_series(self.epidemiology, self.testing, self.wbi_table)
+
+            expected = epi_series_loop(data_provider, self.epidemiology, self.testing, self.wbi_table)
+            pd.testing.assert_frame_equal(result, expected, check_exact=True)
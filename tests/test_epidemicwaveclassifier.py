@@ -0,0 +1,47 @@
+import datetime
+import tempfile
+
+import pandas as pd
+import pytest
+
+from config import Config
+from epidemicwaveclassifier import EpidemicWaveClassifier
+
+
+class TestEpidemicWaveClassifier:
+
+    @classmethod
+    def setup_class(cls):
+        cls.config = Config()
+        cls.config.plot_path = tempfile.mkdtemp()
+        dates = [datetime.date(2020, 3, 1) + datetime.timedelta(days=i) for i in range(11)]
+        cases = pd.DataFrame({'date': dates, 'new_per_day_smooth': [10, 80, 20, 60, 10, 80, 30, 110, 25, 40, 5]})
+        deaths = pd.DataFrame({'date': dates, 'dead_per_day_smooth': [1, 8, 2, 6, 1, 1, 1, 9, 2, 3, 1]})
+        # BBB has no cases, so finding its peaks raises ValueError in the worker
+        cls.tasks = {country: (country, cases if country != 'BBB' else cases.iloc[:0],
+                               deaths, 2, (20, 0.1), (2, 0.1), False, False, cls.config.plot_path)
+                     for country in ['AAA', 'BBB', 'CCC']}
+
+    def test_1(self):
+        # a country without data is skipped in the worker, and the other countries keep their summaries
+        for workers in [1, 2]:
+            classifier = EpidemicWaveClassifier(self.config, None)
+            classifier.country_task = lambda country, plot, save: self.tasks[country]
+
+            failed = classifier.epi_find_peaks_all(['AAA', 'BBB', 'CCC'], workers=workers)
+
+            assert failed == ['BBB']
+            assert list(classifier.summary_output.keys()) == ['AAA', 'CCC']
+            assert len(classifier.summary_output['AAA']) > 0
+            assert classifier.summary_output['AAA'] == classifier.summary_output['CCC']
+
+    def test_2(self):
+        # any other error is not skipped
+        tasks = dict(self.tasks, BBB=(self.tasks['BBB'][0], self.tasks['AAA'][1].drop(columns='new_per_day_smooth'),
+                                      *self.tasks['BBB'][2:]))
+        for workers in [1, 2]:
+            classifier = EpidemicWaveClassifier(self.config, None)
+            classifier.country_task = lambda country, plot, save: tasks[country]
+
+            with pytest.raises(KeyError):
+                classifier.epi_find_peaks_all(['AAA', 'BBB', 'CCC'], workers=workers)
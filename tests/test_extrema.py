@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+from scipy.signal import find_peaks
+
+import wavefinder as wf
+import wavefinder.utils.extrema as extrema_utils
+from wavefinder.utils.prominence_updater import ProminenceUpdater
+
+
+class TestExtrema:
+
+    @classmethod
+    def setup_class(cls):
+        cls.data = pd.Series([1, 10, 5, 15, 2, 20, 18, 19, 3, 12, 4], dtype=float)
+        cls.frame = pd.DataFrame({'location': [1.0, 2.0, 3.0, 4.0, 5.0], 'prominence': [9.0, 5.0, 13.0, 13.0, 17.0],
+                                  'y_position': [10.0, 5.0, 15.0, 2.0, 20.0], 'peak_ind': [1, 0, 1, 0, 1]})
+
+    def test_1(self):
+        # a frame survives the round trip through an extrema array, which is sorted by location
+        extrema = extrema_utils.from_frame(self.frame.iloc[::-1])
+        assert extrema.dtype == extrema_utils.EXTREMA_DTYPE
+        np.testing.assert_array_equal(extrema['location'], self.frame['location'])
+        pd.testing.assert_frame_equal(extrema_utils.to_frame(extrema), self.frame)
+
+    def test_2(self):
+        # makeframe combines the peaks and troughs found by scipy.signal.find_peaks into a frame sorted by location
+        y_vals = self.frame['y_position'].values
+        peak, peak_properties = find_peaks(y_vals, prominence=0, distance=1)
+        trough, trough_properties = find_peaks(-y_vals, prominence=0, distance=1)
+        result = ProminenceUpdater.makeframe(self.frame, peak, peak_properties, trough, trough_properties)
+
+        assert result['location'].to_list() == [2.0, 3.0, 4.0]
+        assert result['peak_ind'].to_list() == [0, 1, 0]
+        assert result['prominence'].to_list() == [5.0, 10.0, 13.0]
+
+    def test_3(self):
+        # the peaks and troughs after Sub-Algorithm A hold their durations
+        wavelist = wf.WaveList(self.data, 'Cases', 3, 0, 0)
+        peaks_sub_a = wavelist.peaks_sub_a
+
+        assert peaks_sub_a.columns.to_list() == extrema_utils.COLUMNS + ['duration']
+        pd.testing.assert_series_equal(peaks_sub_a['duration'], peaks_sub_a['location'].diff(periods=1) -
+                                       peaks_sub_a['location'].diff(periods=-1), check_names=False)
+        assert 'duration' not in wavelist.peaks_sub_b.columns
@@ -0,0 +1,38 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from prefix_sum_store import PrefixSumStore
+
+
+class TestPrefixSumStore:
+
+    @classmethod
+    def setup_class(cls):
+        day = datetime.date(2020, 3, 1)
+        # AAA has no row on day 2 and no value on day 4, BBB starts later and is given out of order
+        cls.table = pd.DataFrame({
+            'countrycode': ['BBB', 'AAA', 'AAA', 'AAA', 'AAA', 'AAA', 'BBB'],
+            'date': [day + datetime.timedelta(days=d) for d in [11, 0, 1, 3, 4, 5, 10]],
+            'value': [4.0, 1.0, 2.0, 4.0, np.nan, 6.0, 2.0]})
+        cls.store = PrefixSumStore(cls.table, ['value'])
+        cls.day = day
+
+    def test_1(self):
+        dates = [self.day + datetime.timedelta(days=d) for d in [0, 2, 4, 10, 10]]
+        values = self.store.value('value', ['AAA', 'AAA', 'AAA', 'BBB', 'CCC'], dates)
+        np.testing.assert_array_equal(values, [1.0, np.nan, np.nan, 2.0, np.nan])
+        delta = self.store.delta('value', ['AAA'], [self.day], [self.day + datetime.timedelta(days=5)])
+        np.testing.assert_array_equal(delta, [5.0])
+
+    def test_2(self):
+        # matches np.trapz over the days with values, for the whole series and for windows
+        aaa = self.table[(self.table['countrycode'] == 'AAA') & self.table['value'].notna()]
+        days = [(date - self.day).days for date in aaa['date']]
+        np.testing.assert_allclose(self.store.integral('value', ['AAA', 'BBB', 'CCC']),
+                                   [np.trapz(aaa['value'], days), 3.0, np.nan])
+        start = [self.day + datetime.timedelta(days=d) for d in [1, 2, -5, 20]]
+        end = [self.day + datetime.timedelta(days=d) for d in [4, 3, 0, 30]]
+        np.testing.assert_allclose(self.store.integral('value', ['AAA'] * 4, start, end), [6.0, 0.0, 0.0, np.nan])
+        np.testing.assert_allclose(self.store.window_sum('value', ['AAA'] * 4, start, end), [6.0, 4.0, 1.0, np.nan])
@@ -0,0 +1,36 @@
+import numpy as np
+
+from data_provider import ListDataProvider
+import wavefinder.subalgorithms.algorithm_init as algorithm_init
+from wavefinder.utils.prominence_updater import ProminenceUpdater
+from wavefinder.utils.prominence_engine import ProminenceEngine
+
+
+class TestProminenceEngine:
+
+    @classmethod
+    def setup_class(cls):
+        cls.country = 'TEST'
+        cls.field = 'new_per_day_smooth'
+
+    def test_1(self):
+        input_data = [10, 80, 20, 60, 10, 80, 30, 110, 25, 40, 5]
+
+        data_provider = ListDataProvider(input_data, self.country, self.field, x_scaling_factor=7)
+
+        data = data_provider.get_series(self.country, self.field)[self.field]
+        extrema_initial = algorithm_init.find_extrema(data)
+        prominence_updater = ProminenceUpdater(data)
+
+        engine = ProminenceEngine(extrema_initial, prominence_updater)
+        # delete the peak at 60 and the trough at 10 which follows it
+        engine.delete_pair(3, 4)
+        engine.recalculate_all()
+        # delete the trough at 25 and the peak at 40
+        engine.delete_pair(8, 9)
+
+        result = engine.to_extrema()
+        expected_result = prominence_updater.run_extrema(np.delete(extrema_initial, [2, 3, 7, 8]))
+
+        assert result['location'].tolist() == expected_result['location'].tolist()
+        assert result['prominence'].tolist() == expected_result['prominence'].tolist()
@@ -0,0 +1,62 @@
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from config import Config
+
+pytest.importorskip('pingouin')
+from table_1 import TABLE_1_METRICS, Table1  # noqa: E402
+
+
+class TestTable1:
+
+    @classmethod
+    def setup_class(cls):
+        rng = np.random.default_rng(1)
+        cls.panel = pd.DataFrame({'class_coarse': np.repeat([1, 2, 3], [30, 20, 10])})
+        for metric in TABLE_1_METRICS:
+            values = rng.normal(size=len(cls.panel)) * 100
+            values[rng.random(len(cls.panel)) < 0.2] = np.nan
+            cls.panel[metric] = values
+        # class 3 has no values for one of the metrics
+        cls.panel.loc[cls.panel['class_coarse'] == 3, 'testing_response_time'] = np.nan
+
+    def test_1(self):
+        # every quantile of every metric for each class, as from DataFrame.quantile
+        quantiles = [0.1, 0.25, 0.5, 0.75]
+        summary = Table1._quantiles(self.panel, quantiles)
+
+        assert summary.index.to_list() == TABLE_1_METRICS
+        assert summary.columns.get_level_values(0).unique().to_list() == \
+            ['quantile_0.1', 'quartile_1', 'median', 'quartile_3']
+        for class_coarse, group in self.panel.groupby('class_coarse'):
+            for q, name in zip(quantiles, ['quantile_0.1', 'quartile_1', 'median', 'quartile_3']):
+                pd.testing.assert_series_equal(summary[(name, class_coarse)], group[TABLE_1_METRICS].quantile(q),
+                                               check_names=False)
+
+    def test_2(self):
+        # the intervals are reproducible for a seed and contain the median of each class
+        intervals = Table1._bootstrap_medians(self.panel, 500, 0.95, seed=3)
+        pd.testing.assert_frame_equal(intervals, Table1._bootstrap_medians(self.panel, 500, 0.95, seed=3))
+        assert not intervals.equals(Table1._bootstrap_medians(self.panel, 500, 0.95, seed=4))
+
+        medians = self.panel.groupby('class_coarse')[TABLE_1_METRICS].median().T
+        for class_coarse in [1, 2, 3]:
+            lower, upper = intervals[('median_ci_lower', class_coarse)], intervals[('median_ci_upper', class_coarse)]
+            has_values = medians[class_coarse].notna()
+            assert (lower[has_values] <= medians[class_coarse][has_values]).all()
+            assert (medians[class_coarse][has_values] <= upper[has_values]).all()
+        assert np.isnan(intervals.loc['testing_response_time', ('median_ci_lower', 3)])
+
+    def test_3(self):
+        # the statistics of each class are in the order of the quantiles, followed by the confidence intervals
+        config = Config()
+        config.data_path = tempfile.mkdtemp()
+        config.bootstrap_samples = 100
+        data = Table1(config, self.panel).table_1()
+
+        assert data.columns.to_list()[:5] == [('quartile_1', 1), ('median', 1), ('quartile_3', 1),
+                                              ('median_ci_lower', 1), ('median_ci_upper', 1)]
+        assert data.columns.get_level_values('class_coarse').to_list() == [1] * 5 + [2] * 5 + [3] * 5
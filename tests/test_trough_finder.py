@@ -0,0 +1,32 @@
+from pandas import DataFrame, Series
+import wavefinder.utils.trough_finder as trough_finder
+
+
+class TestTroughFinder:
+
+    @classmethod
+    def setup_class(cls):
+        cls.raw_data = Series([0, 5, 2, 8, 3, 1, 4, 9, 6, 7, 2, 0, 1])
+        cls.peak_list = DataFrame({'location': [1, 7, 9], 'prominence': [5, 8, 1], 'y_position': [5, 9, 7],
+                                   'peak_ind': [1, 1, 1]})
+
+    def test_1(self):
+        # the deepest candidate is retained between the first two peaks, the raw minimum is used between the last two
+        trough_list = DataFrame({'location': [2, 5, 11], 'prominence': [3, 7, 7], 'y_position': [2, 1, 0],
+                                 'peak_ind': [0, 0, 0]})
+
+        result = trough_finder.run(self.peak_list, trough_list, self.raw_data, prominence_threshold=1,
+                                   prominence_height_threshold=0.5)
+
+        assert result['location'].to_list() == [1, 5, 7, 8, 9, 11]
+        assert result['peak_ind'].to_list() == [1, 0, 1, 0, 1, 0]
+
+    def test_2(self):
+        # the final trough is only added if the final peak is prominent enough above it
+        trough_list = DataFrame({'location': [2, 5, 11], 'prominence': [3, 7, 7], 'y_position': [2, 1, 0],
+                                 'peak_ind': [0, 0, 0]})
+
+        result = trough_finder.run(self.peak_list, trough_list, self.raw_data, prominence_threshold=8,
+                                   prominence_height_threshold=0.5)
+
+        assert result['location'].to_list() == [1, 5, 7, 8, 9]
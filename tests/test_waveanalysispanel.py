@@ -0,0 +1,104 @@
+import datetime
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from data_provider import DataProvider
+from waveanalysispanel import WAVE_DTYPES, WaveAnalysisPanel, wide_waves
+
+
+class TestWaveAnalysisPanel:
+
+    @classmethod
+    def setup_class(cls):
+        cls.config = Config()
+        cls.config.cache_path = tempfile.mkdtemp()
+        cls.config.data_path = tempfile.mkdtemp()
+        cls.config.t_sep_a = 10
+        dates = [datetime.date(2020, 3, 1) + datetime.timedelta(days=i) for i in range(60)]
+
+        data_provider = DataProvider(cls.config)
+        epidemiology = pd.DataFrame({'countrycode': ['AAA'] * 60 + ['BBB'] * 60,
+                                     'country': ['A'] * 60 + ['B'] * 60,
+                                     'date': dates * 2,
+                                     'confirmed': np.arange(120) % 60 * 100.0,
+                                     'dead': np.arange(120) % 60 * 2.0})
+        data_provider.epidemiology = data_provider.preprocess_epi_table(epidemiology)
+        data_provider.testing = pd.DataFrame({'countrycode': ['AAA'] * 60, 'date': dates,
+                                              'total_tests': np.arange(60) * 1000.0, 'new_tests': 1000.0,
+                                              'new_tests_smoothed': np.nan, 'positive_rate': np.nan})
+        data_provider.wbi_table = pd.DataFrame({'countrycode': ['AAA', 'BBB'], 'value': [1e6, 2e6],
+                                                'population_density': [10.0, 20.0],
+                                                'gni_per_capita': [1e4, 2e4], 'net_migration': [0.0, 0.0]})
+        data_provider.gsi_table = pd.DataFrame({'countrycode': ['AAA'] * 60, 'country': ['A'] * 60, 'date': dates,
+                                                'stringency_index': 10.0,
+                                                **{flag: 0.0 for flag in data_provider.flags}})
+        data_provider.gsi_table['c3_cancel_public_events'] = [0] * 20 + [2] * 40
+        data_provider.gsi_table['h2_testing_policy'] = [np.nan] * 10 + [3] * 50
+        data_provider.t0_table = data_provider.get_t0_table(data_provider.epidemiology, data_provider.wbi_table)
+        data_provider.epidemiology_series = data_provider.build_epi_series(
+            data_provider.epidemiology, data_provider.testing, data_provider.wbi_table)
+        data_provider.build_index()
+        cls.data_provider = data_provider
+        # AAA has two waves, BBB none
+        cls.peaks_and_troughs = {'AAA': [
+            {'index': 0, 'location': 20, 'date': dates[20], 'peak_ind': 1, 'y_position': 100.0},
+            {'index': 1, 'location': 30, 'date': dates[30], 'peak_ind': 0, 'y_position': 50.0},
+            {'index': 2, 'location': 40, 'date': dates[40], 'peak_ind': 1, 'y_position': 80.0}]}
+
+    def test_1(self):
+        panel = WaveAnalysisPanel(self.config, self.data_provider, self.peaks_and_troughs).get_epi_panel()
+
+        assert panel['countrycode'].to_list() == ['AAA', 'BBB']
+        assert panel.columns.to_list()[-7:] == ['peak_2', 'peak_2_per_rel_to', 'date_peak_2', 'wave_start_2',
+                                                'wave_end_2', 'wave_duration_2', 'wave_cfr_2']
+        assert panel['wave_duration_1'].dtype == np.float64
+        aaa = panel.iloc[0]
+        assert aaa['class'] == 4 and aaa['class_coarse'] == 2
+        assert aaa['total_stringency'] == 590.0
+        # c3 reaches 2 on day 20, t0_10_dead (5 dead per day) on day 5
+        assert aaa['stringency_response_time'] == 15
+        # the first wave starts with the first case and the second ends on the last day with cases
+        assert aaa['wave_start_1'] == datetime.date(2020, 3, 2)
+        assert aaa['wave_end_2'] == datetime.date(2020, 4, 29)
+        assert aaa['wave_duration_1'] == 29
+        assert aaa['wave_cfr_1'] == 0.02
+        # the first wave runs from day 1 to day 30
+        assert np.isnan(panel.iloc[1]['wave_cfr_1'])
+        assert np.isnan(panel.iloc[1]['total_stringency'])
+
+    def test_2(self):
+        response_times = WaveAnalysisPanel(self.config, self.data_provider, self.peaks_and_troughs) \
+            .get_response_times(long=True)
+
+        assert len(response_times) == 2 * len(self.data_provider.flags)
+        aaa = response_times[response_times['countrycode'] == 'AAA'].set_index('flag')
+        assert aaa.loc['c3_cancel_public_events', 'first_date'] == datetime.date(2020, 3, 21)
+        assert aaa.loc['h2_testing_policy', 'response_time'] == 5
+        assert aaa.loc['h2_testing_policy', 'threshold'] == 3
+        assert aaa['response_time'].isna().sum() == len(self.data_provider.flags) - 2
+        assert response_times.loc[response_times['countrycode'] == 'BBB', 'response_time'].isna().all()
+
+    def test_3(self):
+        wave_analysis_panel = WaveAnalysisPanel(self.config, self.data_provider, self.peaks_and_troughs)
+        panel = wave_analysis_panel.get_epi_panel()
+        waves = wave_analysis_panel.waves
+
+        assert waves.columns.to_list() == list(WAVE_DTYPES.keys())
+        assert waves[['countrycode', 'wave_no']].values.tolist() == [['AAA', 1], ['AAA', 2]]
+        assert waves['wave_start'].dtype == 'datetime64[ns]' and waves['wave_duration'].dtype == 'Int64'
+        assert waves['wave_end'].iloc[0] == pd.Timestamp(2020, 3, 31)
+        # the first wave runs from day 1 to day 30
+        assert waves[['dead_during_wave', 'tests_during_wave', 'si_integral_during_wave']].iloc[0].to_list() == \
+            [58.0, 29000.0, 290.0]
+        # the response times to every flag are kept out of the results table
+        response_times = wave_analysis_panel.response_times
+        assert response_times.loc['AAA', 'c3_response_time'] == 15
+        assert np.isnan(response_times.loc['AAA', 'c1_response_time'])
+        assert 'c3_response_time' not in panel.columns
+        # the wide view has the columns of the results table, with a row for each country given
+        wide = wide_waves(waves, pd.Index(['AAA', 'BBB']))
+        pd.testing.assert_frame_equal(wide.reset_index(), panel[['countrycode'] + wide.columns.to_list()],
+                                      check_dtype=False)
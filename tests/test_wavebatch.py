@@ -0,0 +1,37 @@
+import pytest
+from pandas import DataFrame, concat
+
+from wavefinder import WaveBatch, WaveList
+
+
+class TestWaveBatch:
+
+    @classmethod
+    def setup_class(cls):
+        cls.inputs = {'A': [10, 80, 20, 60, 10, 80, 30, 110, 25, 40, 5],
+                      'B': [5, 40, 10, 90, 20, 10, 70, 60, 100, 15]}
+        cls.thresholds = {'A': 20, 'B': 50}
+
+    def test_1(self):
+        # the waves for each series in a long-format DataFrame match those of a WaveList on that series alone
+        df = concat([DataFrame({'countrycode': key, 'date': range(len(values)), 'value': values,
+                                'prominence_threshold': self.thresholds[key]})
+                     for key, values in self.inputs.items()]).iloc[::-1]
+
+        batch = WaveBatch.from_frame(df, 'value', 'countrycode', t_sep_a=2,
+                                     prominence_threshold='prominence_threshold', prominence_height_threshold=0.1,
+                                     order_by='date')
+
+        assert sorted(batch.keys) == ['A', 'B']
+        for key, values in self.inputs.items():
+            wavelist = WaveList(df[df['countrycode'] == key].sort_values('date')['value'].reset_index(drop=True),
+                                key, 2, self.thresholds[key], 0.1)
+            result = batch.waves[batch.waves['countrycode'] == key].drop(columns='countrycode')
+            assert result.reset_index(drop=True).equals(wavelist.waves)
+
+    def test_2(self):
+        # a parameter given as a string which is not a column is rejected, naming the parameter
+        df = DataFrame({'countrycode': 'A', 'value': self.inputs['A']})
+        with pytest.raises(ValueError, match='prominence_threshold'):
+            WaveBatch.from_frame(df, 'value', 'countrycode', t_sep_a=2, prominence_threshold='prominence_treshold',
+                                 prominence_height_threshold=0.1)
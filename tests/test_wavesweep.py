@@ -0,0 +1,31 @@
+from pandas import Series
+
+from wavefinder import WaveList, sweep
+
+
+class TestWaveSweep:
+
+    @classmethod
+    def setup_class(cls):
+        cls.series = {'A': Series([10, 80, 20, 60, 10, 80, 30, 110, 25, 40, 5]),
+                      'B': Series([5, 40, 10, 90, 20, 10, 70, 60, 100, 15])}
+        cls.reference_series = {'A': Series([1, 8, 2, 6, 1, 1, 1, 9, 2, 3, 1]),
+                                'B': Series([1, 4, 1, 5, 1, 1, 6, 5, 7, 1])}
+
+    def test_1(self):
+        # the wave counts for each parameter set match those of WaveList
+        parameter_sets = [{'t_sep_a': t_sep_a, 'prominence_threshold': {'A': 20, 'B': prominence_threshold},
+                           'prominence_height_threshold': 0.1, 'reference_prominence_threshold': 2,
+                           'reference_prominence_height_threshold': 0.1}
+                          for t_sep_a in [2, 4] for prominence_threshold in [20, 50]]
+
+        result = sweep(self.series, parameter_sets, self.reference_series)
+
+        assert len(result) == 8
+        for _, row in result.iterrows():
+            wavelist = WaveList(self.series[row['series']], '', row['t_sep_a'], row['prominence_threshold'], 0.1)
+            reference_wavelist = WaveList(self.reference_series[row['series']], '', row['t_sep_a'], 2, 0.1)
+            assert row['waves'] == wavelist.waves['peak_ind'].sum()
+            assert row['reference_waves'] == reference_wavelist.waves['peak_ind'].sum()
+            wavelist.cross_validate(reference_wavelist)
+            assert row['waves_cross_validated'] == wavelist.waves['peak_ind'].sum()